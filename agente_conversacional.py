@@ -12,9 +12,10 @@
 """
 
 import os
-import re
 from typing import List, Dict
 
+from extractor_valores import extraer
+
 # Intentar importar Anthropic
 try:
     from anthropic import Anthropic
@@ -192,7 +193,7 @@ Siempre sé conciso, claro y profesional."""
             elif 'estado' in ultimo_mensaje_lower:
                 estados = base_conocimiento.conocimiento.get('estados_sistema', {})
                 if estados:
-                    numeros = re.findall(r'\d+', ultimo_mensaje)
+                    numeros = extraer(ultimo_mensaje).numeros()
                     
                     if numeros:
                         # Estado específico
@@ -215,7 +216,7 @@ Siempre sé conciso, claro y profesional."""
         # ============================================================
         
         # Si el mensaje parece completo (tiene crédito + descripción), BUSCAR SOLUCIÓN
-        tiene_credito = bool(re.findall(r'\d{10,}', ultimo_mensaje))
+        tiene_credito = bool(extraer(ultimo_mensaje).numeros(minimo_digitos=10))
         tiene_descripcion = len(ultimo_mensaje.split()) > 15
         
         if (tiene_credito or tiene_descripcion) and self.sistema_pqrs:
@@ -223,7 +224,7 @@ Siempre sé conciso, claro y profesional."""
             print(f"🔍 Buscando solución para: {ultimo_mensaje[:100]}...")
             
             try:
-                ranking = self.sistema_pqrs.buscar_similar_ia(ultimo_mensaje)
+                ranking = self.sistema_pqrs.buscar_similar_ia(ultimo_mensaje, top_k=1)
                 
                 if ranking and len(ranking) > 0:
                     mejor_caso = ranking[0]
@@ -284,7 +285,7 @@ Siempre sé conciso, claro y profesional."""
             respuesta = "¡Hola! Soy tu asistente de PQRS. ¿En qué caso necesitas ayuda hoy?"
         
         elif 'crédito' in ultimo_mensaje_lower or 'credito' in ultimo_mensaje_lower:
-            if not re.findall(r'\d{10,}', ultimo_mensaje):
+            if not extraer(ultimo_mensaje).numeros(minimo_digitos=10):
                 respuesta = "Entiendo que necesitas ayuda con un crédito. ¿Cuál es el número del crédito?"
             else:
                 respuesta = "Perfecto, veo el número de crédito. ¿Qué necesitas hacer exactamente? (cambiar estado, actualizar vendedor, corregir valores, etc.)"
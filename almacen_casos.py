@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  ALMACÉN COLUMNAR DE CASOS - Sistema PQRS
+
+  Guarda en memoria, por columnas y alineado por fila, solo lo que
+  necesita el ranking:
+  - ids y códigos de categoría
+  - complejidad
+  - embedding normalizado de cada caso (matriz contigua)
+  - conceptos clave como bitset y números (5+ dígitos) en índice invertido
+
+  Los textos (problema, sql, respuesta) se quedan en SQLite y se
+  hidratan solo para los casos ganadores.
+
+  Las columnas se pueden exportar y cargar desde un snapshot
+  (snapshot_pqrs.py); cargadas así son vistas de solo lectura sobre
+  el archivo mapeado y se copian recién en la primera modificación.
+
+  congelar() entrega una versión de solo lectura para usar sin lock
+  (búsquedas, snapshot): comparte todo y la próxima modificación del
+  almacén copia antes lo que iba a tocar.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import re
+import sys
+import copy
+import numpy as np
+
+
+class AlmacenCasos:
+    """
+    Columnas en memoria de todos los casos
+
+    Cada columna vive en un buffer que crece duplicando capacidad, así que
+    agregar es O(1) amortizado. Quitar mueve la última fila al hueco.
+    """
+
+    def __init__(self, embeddings, terminos_conceptos=()):
+        self.embeddings = embeddings        # AlmacenEmbeddings (de donde se copian los vectores)
+        self.n = 0
+        self.posicion = {}                  # caso_id -> fila
+
+        # Columnas (vistas de los buffers hasta la fila n)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.codigos_categoria = np.zeros(0, dtype=np.int32)
+        self.complejidades = np.zeros(0, dtype=np.int8)
+        self.matriz_embeddings = np.zeros((0, embeddings.dimension or 0), dtype=np.float32)
+        self.claves_texto = np.zeros(0, dtype=np.int64)
+        self.bits_conceptos = np.zeros((0, 0), dtype=np.uint8)
+        self.tamanos_conceptos = np.zeros(0, dtype=np.int32)
+        self._buffers = None
+        self._solo_lectura = False          # buffers mapeados desde un snapshot
+        self._congelado = None              # versión entregada por congelar() que comparte todo con esta
+        self._filas_compartidas = False     # alguna versión congelada ve las filas actuales de los buffers
+        self._particiones = None            # (filas por categoría, códigos, centroides); ver particiones()
+
+        # Diccionarios de códigos
+        self.categorias = []                # código -> categoría
+        self.codigo_categoria = {}          # categoría -> código
+        self.vocabulario_conceptos = {}     # concepto -> columna del bitset
+
+        # Números por caso e índice invertido número -> casos (frozenset: se reemplazan, no se modifican)
+        self.numeros_caso = {}
+        self.casos_por_numero = {}
+
+        for termino in terminos_conceptos:
+            self.columna_concepto(termino)
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, caso_id):
+        return caso_id in self.posicion
+
+    @property
+    def dimension(self):
+        return self.matriz_embeddings.shape[1] if self._buffers is not None else self.embeddings.dimension
+
+    # ─────────────────────────────────────────────
+    # Códigos
+    # ─────────────────────────────────────────────
+
+    def codificar_categoria(self, categoria):
+        categoria = sys.intern(categoria or "General")
+        if categoria not in self.codigo_categoria:
+            self._separar()
+            self.codigo_categoria[categoria] = len(self.categorias)
+            self.categorias.append(categoria)
+        return self.codigo_categoria[categoria]
+
+    def columna_concepto(self, concepto):
+        """Retorna la columna del bitset para un concepto (la crea si es nuevo)"""
+        concepto = sys.intern(concepto)
+        if concepto not in self.vocabulario_conceptos:
+            self._separar()
+            self.vocabulario_conceptos[concepto] = len(self.vocabulario_conceptos)
+
+            # Ensanchar el bitset si el vocabulario ya no cabe
+            if self._buffers is not None and len(self.vocabulario_conceptos) > self._buffers['conceptos'].shape[1]:
+                viejo = self._buffers['conceptos']
+                nuevo = np.zeros((viejo.shape[0], len(self.vocabulario_conceptos) * 2), dtype=np.uint8)
+                nuevo[:, :viejo.shape[1]] = viejo
+                self._buffers['conceptos'] = nuevo
+                self._actualizar_vistas()
+
+        return self.vocabulario_conceptos[concepto]
+
+    # ─────────────────────────────────────────────
+    # Escritura
+    # ─────────────────────────────────────────────
+
+    def _crecer(self, dimension):
+        capacidad = max(64, self.n * 2)
+        ancho = max(64, len(self.vocabulario_conceptos))
+        nuevos = {
+            'ids': np.zeros(capacidad, dtype=np.int64),
+            'categorias': np.zeros(capacidad, dtype=np.int32),
+            'complejidades': np.zeros(capacidad, dtype=np.int8),
+            'embeddings': np.zeros((capacidad, dimension), dtype=np.float32),
+            'claves_texto': np.zeros(capacidad, dtype=np.int64),
+            'conceptos': np.zeros((capacidad, ancho), dtype=np.uint8),
+            'tamanos': np.zeros(capacidad, dtype=np.int32),
+        }
+        if self._buffers is not None and self.n:
+            for nombre, buffer in self._buffers.items():
+                if buffer.ndim == 2:
+                    nuevos[nombre][:self.n, :buffer.shape[1]] = buffer[:self.n]
+                else:
+                    nuevos[nombre][:self.n] = buffer[:self.n]
+        self._buffers = nuevos
+        self._solo_lectura = False
+        self._filas_compartidas = False
+
+    def _separar(self):
+        """
+        Copy-on-write: la primera modificación después de congelar() deja de
+        compartir los diccionarios con la versión congelada
+
+        Los buffers se siguen compartiendo: agregar escribe después de la
+        última fila que ve esa versión; quitar los copia (ver quitar).
+        """
+        if self._congelado is None:
+            return
+        self._congelado = None
+        self.posicion = dict(self.posicion)
+        self.numeros_caso = dict(self.numeros_caso)
+        self.casos_por_numero = dict(self.casos_por_numero)
+        self.categorias = list(self.categorias)
+        self.codigo_categoria = dict(self.codigo_categoria)
+        self.vocabulario_conceptos = dict(self.vocabulario_conceptos)
+        if self._buffers is not None:
+            self._buffers = dict(self._buffers)
+            self._filas_compartidas = True
+
+    def congelar(self):
+        """
+        Versión de solo lectura del almacén tal como está ahora
+
+        No copia nada (ver _separar): tomarla cuesta lo mismo que leer un
+        atributo, y después se puede buscar o exportar sobre ella sin lock
+        aunque otro hilo siga agregando o quitando casos. Llamar con el
+        lock del sistema tomado.
+        """
+        if self._congelado is None:
+            self._congelado = copy.copy(self)
+        return self._congelado
+
+    def _preparar_escritura(self, dimension, filas_nuevas=0):
+        """Asegura buffers escribibles con lugar para `filas_nuevas` filas más"""
+        self._separar()
+        if (self._buffers is None or self._solo_lectura
+                or self.n + filas_nuevas > self._buffers['ids'].shape[0]):
+            self._crecer(dimension)
+
+    def _actualizar_vistas(self):
+        n = self.n
+        self.ids = self._buffers['ids'][:n]
+        self.codigos_categoria = self._buffers['categorias'][:n]
+        self.complejidades = self._buffers['complejidades'][:n]
+        self.matriz_embeddings = self._buffers['embeddings'][:n]
+        self.claves_texto = self._buffers['claves_texto'][:n]
+        self.bits_conceptos = self._buffers['conceptos'][:n]
+        self.tamanos_conceptos = self._buffers['tamanos'][:n]
+        self._particiones = None
+
+    def agregar(self, caso_id, categoria, complejidad, clave, problema, conceptos):
+        """
+        Agrega (o reemplaza) un caso
+
+        Args:
+            caso_id: ID del caso en SQLite
+            categoria: Categoría del caso
+            complejidad: Nivel de complejidad (1-3)
+            clave: Clave del texto del problema (su embedding ya debe estar en el almacén)
+            problema: Texto del problema (solo se usa para extraer números)
+            conceptos: Conceptos clave en formato CSV
+        """
+        if caso_id in self.posicion:
+            self.quitar(caso_id)
+
+        vector = self.embeddings.vector(clave)
+        self._preparar_escritura(vector.shape[0], filas_nuevas=1)
+
+        fila = self.n
+
+        # Conceptos clave como bitset (columna_concepto puede ensanchar el buffer)
+        conceptos_bd = set(conceptos.split(',')) if conceptos else set()
+        columnas = [self.columna_concepto(concepto) for concepto in conceptos_bd]
+        b = self._buffers
+        b['conceptos'][fila] = 0
+        b['conceptos'][fila, columnas] = 1
+        b['tamanos'][fila] = len(columnas)
+
+        b['ids'][fila] = caso_id
+        b['categorias'][fila] = self.codificar_categoria(categoria)
+        b['complejidades'][fila] = complejidad or 1
+        b['embeddings'][fila] = vector
+        b['claves_texto'][fila] = clave
+
+        # Números del caso en el índice invertido número -> casos
+        numeros = frozenset(sys.intern(numero) for numero in re.findall(r'\d{5,}', problema or ''))
+        self.numeros_caso[caso_id] = numeros
+        for numero in numeros:
+            self.casos_por_numero[numero] = self.casos_por_numero.get(numero, frozenset()) | {caso_id}
+
+        self.posicion[caso_id] = fila
+        self.n += 1
+        self._actualizar_vistas()
+
+    def quitar(self, caso_id):
+        """Quita un caso moviendo la última fila a su lugar"""
+        if caso_id not in self.posicion:
+            return False
+        self._preparar_escritura(self.dimension)
+        if self._filas_compartidas:
+            # Se reescriben filas que una versión congelada todavía lee
+            self._buffers = {nombre: buffer.copy() for nombre, buffer in self._buffers.items()}
+            self._filas_compartidas = False
+
+        for numero in self.numeros_caso.pop(caso_id, ()):
+            casos = self.casos_por_numero.get(numero, frozenset()) - {caso_id}
+            if casos:
+                self.casos_por_numero[numero] = casos
+            else:
+                self.casos_por_numero.pop(numero, None)
+
+        fila = self.posicion.pop(caso_id)
+        ultima = self.n - 1
+
+        if fila != ultima:
+            for buffer in self._buffers.values():
+                buffer[fila] = buffer[ultima]
+            self.posicion[int(self._buffers['ids'][fila])] = fila
+
+        self.n -= 1
+        self._actualizar_vistas()
+        return True
+
+    # ─────────────────────────────────────────────
+    # Lectura
+    # ─────────────────────────────────────────────
+
+    def filas(self, ids):
+        """Filas de los ids dados (los ids que no están se omiten)"""
+        return np.array([self.posicion[caso_id] for caso_id in ids if caso_id in self.posicion], dtype=np.int64)
+
+    def clave(self, caso_id):
+        """Clave del texto con que se calculó el embedding del caso"""
+        return int(self.claves_texto[self.posicion[caso_id]])
+
+    def embedding(self, caso_id):
+        return self.matriz_embeddings[self.posicion[caso_id]]
+
+    def similitudes(self, vector):
+        """Similitud coseno de todos los casos en un solo producto matriz-vector"""
+        return self.matriz_embeddings @ vector
+
+    # ─────────────────────────────────────────────
+    # Particiones por categoría
+    # ─────────────────────────────────────────────
+
+    def _calcular_particiones(self):
+        if self._particiones is None:
+            if not self.n:
+                self._particiones = ({}, np.zeros(0, dtype=np.int32), np.zeros((0, self.dimension), dtype=np.float32))
+                return self._particiones
+
+            # Un solo ordenamiento estable de la columna de códigos: cada grupo queda con sus filas en orden
+            orden = np.argsort(self.codigos_categoria, kind='stable')
+            codigos, inicios = np.unique(self.codigos_categoria[orden], return_index=True)
+            grupos = np.split(orden, inicios[1:])
+
+            centroides = np.stack([self.matriz_embeddings[filas].mean(axis=0) for filas in grupos])
+            centroides /= np.maximum(np.linalg.norm(centroides, axis=1, keepdims=True), 1e-12)
+            self._particiones = (dict(zip(codigos.tolist(), grupos)), codigos, centroides.astype(np.float32))
+        return self._particiones
+
+    def particiones(self):
+        """
+        Filas de cada categoría: {código: filas ordenadas}
+
+        Se calculan al primer uso y valen hasta la próxima modificación del almacén.
+        """
+        return self._calcular_particiones()[0]
+
+    def centroides(self):
+        """(códigos, centroide normalizado de cada categoría) para enrutar consultas"""
+        _, codigos, centroides = self._calcular_particiones()
+        return codigos, centroides
+
+    def filas_categoria(self, categoria):
+        """Filas de una categoría (vacío si no hay casos con esa categoría)"""
+        codigo = self.codigo_categoria.get(categoria or "General")
+        return self.particiones().get(codigo, np.zeros(0, dtype=np.int64))
+
+    def similitudes_filas(self, vector, filas):
+        """Similitud coseno de solo las filas dadas (candidatos fuera del índice ANN)"""
+        return self.matriz_embeddings[filas] @ vector
+
+    def similitudes_filas_lote(self, matriz, filas):
+        """Similitudes (consultas x filas) de varias consultas contra solo las filas dadas"""
+        return matriz @ self.matriz_embeddings[filas].T
+
+    def similitudes_lote(self, matriz):
+        """Similitudes (consultas x casos) de varias consultas en un solo producto matriz-matriz"""
+        return matriz @ self.matriz_embeddings.T
+
+    def calcular_bonus_conceptos(self, conceptos_nuevo, filas):
+        """Bonus Jaccard de conceptos (máximo 0.15) para las filas dadas, vectorizado sobre el bitset"""
+        if not conceptos_nuevo:
+            return np.zeros(len(filas), dtype=np.float32)
+
+        columnas = [self.vocabulario_conceptos[c] for c in conceptos_nuevo if c in self.vocabulario_conceptos]
+        comunes = self.bits_conceptos[np.ix_(filas, columnas)].sum(axis=1, dtype=np.int32)
+        tamanos = self.tamanos_conceptos[filas]
+        total = tamanos + len(conceptos_nuevo) - comunes
+
+        bonus = np.zeros(len(filas), dtype=np.float32)
+        con_conceptos = tamanos > 0
+        bonus[con_conceptos] = comunes[con_conceptos] / total[con_conceptos] * 0.15
+        return bonus
+
+    def filas_con_numeros(self, numeros):
+        """Filas (ordenadas) de los casos que contienen alguno de los números dados"""
+        filas = {self.posicion[caso_id] for numero in numeros for caso_id in self.casos_por_numero.get(numero, ())}
+        return np.array(sorted(filas), dtype=np.int64)
+
+    def calcular_bonus_numeros(self, numeros_nuevo, filas):
+        """Bonus de 0.05 para las filas que comparten algún número (crédito, ID, cédula)"""
+        bonus = np.zeros(len(filas), dtype=np.float32)
+        con_numero = self.filas_con_numeros(numeros_nuevo)
+        if len(con_numero):
+            bonus[np.isin(filas, con_numero)] = 0.05
+        return bonus
+
+    # ─────────────────────────────────────────────
+    # Snapshot
+    # ─────────────────────────────────────────────
+
+    def exportar(self):
+        """
+        Columnas y diccionarios para guardar en un snapshot
+
+        Returns:
+            (meta, arrays): meta es serializable a JSON; arrays son las
+            columnas hasta la fila n (con los nombres de los buffers)
+        """
+        arrays = {nombre: buffer[:self.n] for nombre, buffer in self._buffers.items()} if self._buffers else {}
+
+        # Números de cada fila: "n1,n2" por línea
+        numeros = '\n'.join(','.join(sorted(self.numeros_caso.get(caso_id, ()))) for caso_id in self.ids.tolist())
+        arrays['numeros'] = np.frombuffer(numeros.encode('utf-8'), dtype=np.uint8)
+
+        vocabulario = sorted(self.vocabulario_conceptos, key=self.vocabulario_conceptos.get)
+        return {'categorias': self.categorias, 'vocabulario': vocabulario}, arrays
+
+    @classmethod
+    def desde_snapshot(cls, embeddings, meta, arrays):
+        """Reconstruye el almacén sobre las columnas de un snapshot (sin copiarlas)"""
+        almacen = cls(embeddings, meta['vocabulario'])
+        for categoria in meta['categorias']:
+            almacen.codificar_categoria(categoria)
+
+        if len(arrays['ids']):
+            almacen._buffers = {nombre: arrays[nombre] for nombre in
+                                ('ids', 'categorias', 'complejidades', 'embeddings', 'claves_texto', 'conceptos', 'tamanos')}
+            almacen._solo_lectura = True
+            almacen.n = len(arrays['ids'])
+            almacen._actualizar_vistas()
+
+        ids = almacen.ids.tolist()
+        almacen.posicion = {caso_id: fila for fila, caso_id in enumerate(ids)}
+
+        lineas = bytes(arrays['numeros']).decode('utf-8').split('\n')
+        casos_por_numero = {}
+        for caso_id, linea in zip(ids, lineas):
+            numeros = frozenset(sys.intern(numero) for numero in linea.split(',') if numero)
+            almacen.numeros_caso[caso_id] = numeros
+            for numero in numeros:
+                casos_por_numero.setdefault(numero, []).append(caso_id)
+        almacen.casos_por_numero = {numero: frozenset(casos) for numero, casos in casos_por_numero.items()}
+
+        return almacen
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  ALMACÉN BINARIO DE EMBEDDINGS - Sistema PQRS
+
+  Reemplaza el pickle que se reescribía completo en cada caso nuevo:
+  - <base>-<huella>.f32    filas float32 de ancho fijo, solo se agregan al final
+  - <base>-<huella>.claves una clave int64 por fila (hash SHA-256 del texto)
+  - <base>-<huella>.json   huella del modelo, dimensión de los vectores y
+                           generación vigente de los dos archivos anteriores
+
+  La huella resume modelo + revisión + normalización: si cambia, se usa
+  otro juego de archivos y nunca se mezclan vectores de modelos distintos.
+  Cada vector se busca por el hash del texto, así un caso editado (o un
+  id reutilizado tras borrar la BD) nunca recibe un vector viejo.
+
+  El archivo de vectores se abre con memmap en modo lectura, así varios
+  procesos comparten las mismas páginas sin copiar. Los vectores se
+  guardan normalizados (norma 1).
+
+  Varios procesos (workers de gunicorn) pueden agregar a la vez: cada
+  escritura toma un lock de archivo y antes lee las filas que hayan
+  agregado los demás. La compactación escribe una generación nueva de
+  .f32 y .claves (<base>-<huella>.g<N>.*) y la publica reemplazando el
+  .json: los dos archivos cambian juntos con un solo os.replace.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+
+# fcntl no existe en Windows: ahí el almacén asume un solo proceso escritor
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def calcular_huella(configuracion):
+    """Huella corta (12 hex) de un diccionario de configuración del modelo"""
+    texto = json.dumps(configuracion, sort_keys=True)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:12]
+
+
+def clave_texto(texto):
+    """Clave int64 de un texto: primeros 8 bytes de su SHA-256"""
+    digest = hashlib.sha256(texto.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little', signed=True)
+
+
+class AlmacenEmbeddings:
+    """
+    Almacén append-only de embeddings con índice clave_texto -> fila
+
+    Cada escritura va al final de los archivos; el fsync se hace por lotes
+    (cada `lote_fsync` escrituras o al llamar sincronizar()).
+    """
+
+    def __init__(self, ruta_base='embeddings', configuracion=None, lote_fsync=64):
+        self.configuracion = configuracion or {}
+        self.huella = calcular_huella(self.configuracion)
+
+        self.ruta = f'{ruta_base}-{self.huella}'
+        self.ruta_meta = self.ruta + '.json'
+        self.ruta_lock = self.ruta + '.lock'
+        self.lote_fsync = lote_fsync
+
+        self.dimension = None
+        self.generacion = 0
+        self.ruta_vectores, self.ruta_claves = self._rutas_generacion(0)
+        self.n_filas = 0
+        self.fila_clave = {}                # clave_texto -> fila
+        self._matriz = None
+        self._archivo_vectores = None
+        self._archivo_claves = None
+        self._sin_fsync = 0
+        self._inodo = None
+
+        with self._bloqueo(exclusivo=False):
+            self.abrir()
+
+    def __len__(self):
+        return len(self.fila_clave)
+
+    def __contains__(self, clave):
+        return clave in self.fila_clave
+
+    # ─────────────────────────────────────────────
+    # Apertura
+    # ─────────────────────────────────────────────
+
+    def _rutas_generacion(self, generacion):
+        """Archivos de vectores y claves de una generación (la 0 conserva los nombres de siempre)"""
+        ruta = self.ruta if generacion == 0 else f'{self.ruta}.g{generacion}'
+        return ruta + '.f32', ruta + '.claves'
+
+    @contextmanager
+    def _bloqueo(self, exclusivo=True):
+        """
+        Lock de archivo entre procesos
+
+        Cada llamada abre su propio descriptor: flock bloquea por descripción
+        de archivo abierto, y un descriptor heredado por fork la comparte con
+        el padre (los dos "tendrían" el lock a la vez).
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self.ruta_lock, 'a') as archivo:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+            yield
+
+    def abrir(self):
+        """
+        Lee la metadata y el índice de claves; los vectores se mapean a memoria al usarlos
+
+        Llamar con el lock de archivo tomado (una compactación de otro
+        proceso podría borrar la generación que se está leyendo).
+        """
+        self.n_filas = 0
+        self.fila_clave = {}
+        self._matriz = None
+        if not os.path.exists(self.ruta_meta):
+            return
+
+        with open(self.ruta_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self._inodo = self._inodo_meta()
+
+        if meta.get('huella') != self.huella:
+            raise ValueError(f"{self.ruta_meta} no corresponde a la huella {self.huella}")
+        self.dimension = meta['dimension']
+        self.generacion = meta.get('generacion', 0)
+        self.ruta_vectores, self.ruta_claves = self._rutas_generacion(self.generacion)
+
+        # Filas completas en ambos archivos (una escritura cortada a la mitad se descarta)
+        n_vectores = os.path.getsize(self.ruta_vectores) // (4 * self.dimension) if os.path.exists(self.ruta_vectores) else 0
+        claves = np.fromfile(self.ruta_claves, dtype=np.int64) if os.path.exists(self.ruta_claves) else np.zeros(0, dtype=np.int64)
+        self.n_filas = min(n_vectores, len(claves))
+
+        self.fila_clave = {clave: fila for fila, clave in enumerate(claves[:self.n_filas].tolist())}
+
+    def _inodo_meta(self):
+        return os.stat(self.ruta_meta).st_ino if os.path.exists(self.ruta_meta) else None
+
+    def _escribir_meta(self):
+        """Publica dimensión y generación reemplazando el .json de una sola vez"""
+        temporal = self.ruta_meta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'huella': self.huella, 'dimension': self.dimension,
+                       'generacion': self.generacion, 'configuracion': self.configuracion}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta_meta)
+        self._inodo = self._inodo_meta()
+
+    def _filas_en_disco(self):
+        """Filas completas en ambos archivos"""
+        n_vectores = os.path.getsize(self.ruta_vectores) // (4 * self.dimension) if os.path.exists(self.ruta_vectores) else 0
+        n_claves = os.path.getsize(self.ruta_claves) // 8 if os.path.exists(self.ruta_claves) else 0
+        return min(n_vectores, n_claves)
+
+    def refrescar(self):
+        """
+        Lee las filas que otros procesos agregaron al final de los archivos
+
+        Si otro proceso compactó (el .json apunta a otra generación), se
+        vuelve a abrir todo. Retorna cuántas filas nuevas se leyeron.
+        """
+        with self._bloqueo(exclusivo=False):
+            return self._refrescar()
+
+    def _refrescar(self):
+        if self.dimension is None:
+            self.abrir()
+            return self.n_filas
+
+        if self._inodo_meta() != self._inodo:
+            self._cerrar_archivos()
+            self.abrir()
+            return self.n_filas
+
+        n = self._filas_en_disco()
+        if n <= self.n_filas:
+            return 0
+
+        with open(self.ruta_claves, 'rb') as f:
+            f.seek(self.n_filas * 8)
+            nuevas = np.frombuffer(f.read((n - self.n_filas) * 8), dtype=np.int64)
+        for fila, clave in enumerate(nuevas.tolist(), self.n_filas):
+            self.fila_clave[clave] = fila
+
+        leidas = n - self.n_filas
+        self.n_filas = n
+        return leidas
+
+    def _abrir_escritura(self, dimension):
+        if self.dimension is None:
+            self.dimension = dimension
+            self._escribir_meta()
+        elif dimension != self.dimension:
+            raise ValueError(f"Dimensión {dimension} distinta a la del almacén ({self.dimension})")
+
+        if self._archivo_vectores is None:
+            self._archivo_vectores = open(self.ruta_vectores, 'ab')
+            self._archivo_claves = open(self.ruta_claves, 'ab')
+
+    # ─────────────────────────────────────────────
+    # Lectura
+    # ─────────────────────────────────────────────
+
+    @property
+    def matriz(self):
+        """Todas las filas escritas (incluidas las huérfanas), mapeadas a memoria"""
+        if self._matriz is None or self._matriz.shape[0] != self.n_filas:
+            if self.n_filas == 0:
+                self._matriz = np.zeros((0, self.dimension or 0), dtype=np.float32)
+            else:
+                if self._archivo_vectores is not None:
+                    self._archivo_vectores.flush()
+                self._matriz = np.memmap(self.ruta_vectores, dtype=np.float32, mode='r',
+                                         shape=(self.n_filas, self.dimension))
+        return self._matriz
+
+    def fila(self, clave):
+        return self.fila_clave.get(clave)
+
+    def vector(self, clave):
+        return self.matriz[self.fila_clave[clave]]
+
+    # ─────────────────────────────────────────────
+    # Escritura
+    # ─────────────────────────────────────────────
+
+    def agregar_lote(self, claves, matriz):
+        """Agrega vectores ya normalizados. Retorna las filas asignadas"""
+        matriz = np.ascontiguousarray(matriz, dtype=np.float32).reshape(len(claves), -1)
+        if not len(claves):
+            return []
+
+        # Lock de archivo: nadie más escribe mientras se leen las filas ajenas y se agrega al final
+        with self._bloqueo():
+            self._refrescar()
+            self._abrir_escritura(matriz.shape[1])
+
+            # Recortar filas incompletas que hayan quedado de un cierre abrupto
+            for ruta, tamano in ((self.ruta_vectores, 4 * self.dimension), (self.ruta_claves, 8)):
+                if os.path.getsize(ruta) > self.n_filas * tamano:
+                    os.truncate(ruta, self.n_filas * tamano)
+
+            filas = list(range(self.n_filas, self.n_filas + len(claves)))
+            self._archivo_vectores.write(matriz.tobytes())
+            self._archivo_claves.write(np.array(claves, dtype=np.int64).tobytes())
+            self._archivo_vectores.flush()
+            self._archivo_claves.flush()
+
+        self.n_filas += len(claves)
+        for clave, fila in zip(claves, filas):
+            self.fila_clave[clave] = fila
+
+        self._sin_fsync += len(claves)
+        if self._sin_fsync >= self.lote_fsync:
+            self.sincronizar()
+
+        return filas
+
+    def agregar(self, clave, vector):
+        return self.agregar_lote([clave], vector)[0]
+
+    def sincronizar(self):
+        """Vacía los buffers y hace fsync de los archivos"""
+        for archivo in (self._archivo_vectores, self._archivo_claves):
+            if archivo is not None:
+                archivo.flush()
+                os.fsync(archivo.fileno())
+        self._sin_fsync = 0
+
+    def cerrar(self):
+        self.sincronizar()
+        self._cerrar_archivos()
+
+    def _cerrar_archivos(self):
+        for archivo in (self._archivo_vectores, self._archivo_claves):
+            if archivo is not None:
+                archivo.close()
+        self._archivo_vectores = None
+        self._archivo_claves = None
+
+    # ─────────────────────────────────────────────
+    # Compactación
+    # ─────────────────────────────────────────────
+
+    def necesita_compactar(self, n_vivas):
+        """True si más de la mitad de las filas ya no pertenecen a ningún caso"""
+        return self.n_filas > 1024 and self.n_filas > 2 * n_vivas
+
+    def compactar(self, claves_vivas):
+        """
+        Reescribe los archivos solo con las filas de las claves indicadas
+
+        Todo ocurre con el lock exclusivo tomado. Las filas van a archivos de
+        una generación nueva y se publican reemplazando el .json, así nadie
+        ve un .f32 nuevo con un .claves viejo; los procesos que tengan
+        mapeada la generación anterior no se ven afectados.
+        """
+        with self._bloqueo():
+            # Las filas que otros procesos agregaron después de leer la BD se conservan
+            vistas = self.n_filas
+            self._refrescar()
+            ajenas = [clave for clave, fila in self.fila_clave.items() if fila >= vistas]
+
+            claves = [clave for clave in dict.fromkeys(list(claves_vivas) + ajenas) if clave in self.fila_clave]
+            vivas = np.asarray(self.matriz[[self.fila_clave[clave] for clave in claves]], dtype=np.float32) \
+                if claves else np.zeros((0, self.dimension), dtype=np.float32)
+
+            self.cerrar()
+            self._matriz = None
+
+            anteriores = (self.ruta_vectores, self.ruta_claves)
+            generacion = self.generacion + 1
+            rutas = self._rutas_generacion(generacion)
+            for ruta, datos in zip(rutas, (vivas, np.array(claves, dtype=np.int64))):
+                with open(ruta, 'wb') as f:
+                    f.write(datos.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self.generacion = generacion
+            self.ruta_vectores, self.ruta_claves = rutas
+            self._escribir_meta()
+            for ruta in anteriores:
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+
+            self.n_filas = len(claves)
+            self.fila_clave = {clave: fila for fila, clave in enumerate(claves)}
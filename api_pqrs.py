@@ -9,638 +9,104 @@
   
   Endpoints:
   - POST /api/resolver-pqrs       → Buscar solución para un problema
+  - POST /api/resolver-pqrs/batch → Buscar soluciones para varios problemas
   - POST /api/validar-sql         → Validar una operación SQL
   - POST /api/ensenar-caso        → Agregar un caso nuevo
-  - GET  /api/casos               → Listar todos los casos
+  - GET  /api/casos               → Listar casos (paginado)
   - GET  /api/estadisticas        → Estadísticas del sistema
   - GET  /api/health              → Verificar que la API está viva
 ═══════════════════════════════════════════════════════════════════
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import sys
 from pathlib import Path
-from datetime import datetime
-import re
 import os
 
 
 # Agregar el sistema al path
 sys.path.append(str(Path(__file__).parent))
 
-# Importar el sistema PQRS
-try:
-    from sistema_pqrs_v4_ia import SistemaPQRSIA
-    from validador_automatico import ValidadorAutomatico
-    SISTEMA_DISPONIBLE = True
-except ImportError as e:
-    print(f"⚠️ Error importando sistema: {e}")
-    SISTEMA_DISPONIBLE = False
+# Sistema y lógica de los endpoints (compartidos con api_pqrs_asgi.py)
+import manejadores_api
+from manejadores_api import sistema, SISTEMA_DISPONIBLE
 
 # Inicializar Flask
 app = Flask(__name__)
 CORS(app)  # Permitir requests desde cualquier origen
 
-# Inicializar sistema
-sistema = None
-validador = None
 
-if SISTEMA_DISPONIBLE:
-    try:
-        sistema = SistemaPQRSIA()
-        validador = ValidadorAutomatico(sistema)
-        print("✅ Sistema PQRS inicializado correctamente")
-    except Exception as e:
-        print(f"❌ Error inicializando sistema: {e}")
+def responder(resultado):
+    """(cuerpo, código, headers) de manejadores_api → respuesta Flask"""
+    cuerpo, codigo, headers = resultado
+    if isinstance(cuerpo, dict):
+        respuesta = jsonify(cuerpo)
+    else:
+        # Generador de líneas NDJSON: se envía a medida que se produce
+        respuesta = Response(stream_with_context(cuerpo), mimetype=manejadores_api.TIPO_NDJSON)
+    respuesta.headers.update(headers)
+    return respuesta, codigo
 
 
 # ═══════════════════════════════════════════════════════════════
-# ENDPOINT 1: RESOLVER PQRS
+# ENDPOINTS (contrato documentado en manejadores_api.py)
 # ═══════════════════════════════════════════════════════════════
 
 @app.route('/api/resolver-pqrs', methods=['POST'])
 def resolver_pqrs():
-    """
-    Busca una solución para un problema PQRS
-    
-    Body:
-    {
-        "problema": "Para el crédito 123 cambiar estado a 77",
-        "incluir_validacion": true,  // opcional
-        "ejecutar_automatico": false  // opcional
-    }
-    
-    Response:
-    {
-        "success": true,
-        "problema": "...",
-        "mejor_caso": {
-            "categoria": "Estados",
-            "problema_base": "...",
-            "sql": "UPDATE ...",
-            "respuesta": "...",
-            "similitud": 0.92
-        },
-        "validacion": { ... },  // si incluir_validacion=true
-        "otros_casos": [ ... ],
-        "timestamp": "2025-02-17T12:00:00"
-    }
-    """
-    try:
-        if not sistema:
-            return jsonify({
-                "success": False,
-                "error": "Sistema no disponible"
-            }), 503
-        
-        # Obtener datos del request
-        data = request.get_json()
-        
-        if not data or 'problema' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Falta el campo 'problema' en el body"
-            }), 400
-        
-        problema = data['problema']
-        incluir_validacion = data.get('incluir_validacion', False)
-        ejecutar_automatico = data.get('ejecutar_automatico', False)
-        
-        # Buscar solución
-        ranking = sistema.buscar_similar_ia(problema)
-        
-        if not ranking or len(ranking) == 0:
-            return jsonify({
-                "success": True,
-                "problema": problema,
-                "encontrado": False,
-                "mensaje": "No se encontraron casos similares",
-                "sugerencia": "Intenta con más detalles o agrega este caso al sistema",
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        mejor_caso = ranking[0]
-        
-        # Generar SQL con valores reemplazados
-        valores = sistema.extraer_valores(problema)
-        sql_generado = sistema.reemplazar_valores(mejor_caso['sql'], valores)
-        
-        # Construir respuesta
-        response = {
-            "success": True,
-            "problema": problema,
-            "encontrado": True,
-            "mejor_caso": {
-                "categoria": mejor_caso['categoria'],
-                "problema_base": mejor_caso['problema'],
-                "sql_original": mejor_caso['sql'],
-                "sql_generado": sql_generado,
-                "respuesta": mejor_caso['respuesta'],
-                "similitud": round(mejor_caso['similitud'] * 100, 2),
-                "confianza": "alta" if mejor_caso['similitud'] >= 0.85 else "media" if mejor_caso['similitud'] >= 0.60 else "baja"
-            },
-            "valores_extraidos": valores,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Agregar otros casos similares
-        if len(ranking) > 1:
-            response["otros_casos"] = []
-            for caso in ranking[1:4]:
-                sql_caso = sistema.reemplazar_valores(caso['sql'], valores)
-                response["otros_casos"].append({
-                    "categoria": caso['categoria'],
-                    "problema": caso['problema'],
-                    "sql": sql_caso,
-                    "similitud": round(caso['similitud'] * 100, 2)
-                })
-        
-        # Incluir validación si se solicita
-        if incluir_validacion and validador:
-            tipo_operacion = detectar_tipo_operacion(problema, sql_generado)
-            datos_contexto = extraer_datos_contexto(problema, sql_generado, tipo_operacion)
-            
-            validacion = validador.validar_operacion_completa(
-                sql=sql_generado,
-                tipo_operacion=tipo_operacion,
-                datos_contexto=datos_contexto
-            )
-            
-            response["validacion"] = {
-                "puede_ejecutar": validacion["puede_ejecutar"],
-                "requiere_aprobacion": validacion["requiere_aprobacion"],
-                "nivel_aprobacion": validacion["nivel_aprobacion"],
-                "razon": validacion["razon_principal"],
-                "errores": validacion["errores"],
-                "advertencias": validacion["advertencias"]
-            }
-            
-            # Si se solicita ejecución automática
-            if ejecutar_automatico and validacion["puede_ejecutar"] and not validacion["requiere_aprobacion"]:
-                response["ejecutado"] = True
-                response["mensaje_ejecucion"] = "SQL ejecutado automáticamente (SIMULADO en esta versión)"
-            else:
-                response["ejecutado"] = False
-                if validacion["requiere_aprobacion"]:
-                    response["mensaje_ejecucion"] = f"Requiere aprobación de {validacion['nivel_aprobacion']}"
-                elif not validacion["puede_ejecutar"]:
-                    response["mensaje_ejecucion"] = "Operación bloqueada por seguridad"
-        
-        return jsonify(response)
-    
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e),
-            "timestamp": datetime.now().isoformat()
-        }), 500
+    """Busca una solución para un problema PQRS"""
+    return responder(manejadores_api.resolver_pqrs(request.get_json(silent=True)))
 
 
-# ═══════════════════════════════════════════════════════════════
-# ENDPOINT 2: VALIDAR SQL
-# ═══════════════════════════════════════════════════════════════
+@app.route('/api/resolver-pqrs/batch', methods=['POST'])
+def resolver_pqrs_lote():
+    """Busca soluciones para varios problemas PQRS en una sola llamada"""
+    return responder(manejadores_api.resolver_pqrs_lote(
+        request.get_json(silent=True), ndjson=manejadores_api.quiere_ndjson(request.headers.get('Accept'))
+    ))
+
 
 @app.route('/api/validar-sql', methods=['POST'])
 def validar_sql():
-    """
-    Valida un SQL antes de ejecutarlo
-    
-    Body:
-    {
-        "sql": "UPDATE formatexceldlle SET Estado = 77 WHERE Credit = '123'",
-        "tipo_operacion": "cambio_estado",  // opcional
-        "datos_contexto": { ... }  // opcional
-    }
-    
-    Response:
-    {
-        "success": true,
-        "puede_ejecutar": true,
-        "requiere_aprobacion": false,
-        "nivel_aprobacion": "automatico",
-        "razon": "...",
-        ...
-    }
-    """
-    try:
-        if not validador:
-            return jsonify({
-                "success": False,
-                "error": "Validador no disponible"
-            }), 503
-        
-        data = request.get_json()
-        
-        if not data or 'sql' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Falta el campo 'sql' en el body"
-            }), 400
-        
-        sql = data['sql']
-        tipo_operacion = data.get('tipo_operacion', 'operacion_general')
-        datos_contexto = data.get('datos_contexto', {})
-        
-        # Validar
-        validacion = validador.validar_operacion_completa(
-            sql=sql,
-            tipo_operacion=tipo_operacion,
-            datos_contexto=datos_contexto
-        )
-        
-        return jsonify({
-            "success": True,
-            "sql": sql,
-            "puede_ejecutar": validacion["puede_ejecutar"],
-            "requiere_aprobacion": validacion["requiere_aprobacion"],
-            "nivel_aprobacion": validacion["nivel_aprobacion"],
-            "razon": validacion["razon_principal"],
-            "errores": validacion["errores"],
-            "advertencias": validacion["advertencias"],
-            "validaciones": validacion["validaciones"],
-            "timestamp": datetime.now().isoformat()
-        })
-    
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+    """Valida un SQL antes de ejecutarlo"""
+    return responder(manejadores_api.validar_sql(request.get_json(silent=True)))
 
 
-# ═══════════════════════════════════════════════════════════════
-# ENDPOINT 3: ENSEÑAR CASO
-# ═══════════════════════════════════════════════════════════════
-
 @app.route('/api/ensenar-caso', methods=['POST'])
 def ensenar_caso():
-    """
-    Agrega un caso nuevo al sistema
-    
-    Body:
-    {
-        "categoria": "Estados",
-        "problema": "Para el crédito [CREDITO] cambiar estado a 77",
-        "sql": "UPDATE formatexceldlle SET Estado = 77 WHERE Credit = '[CREDITO]'",
-        "respuesta": "Estado actualizado correctamente"
-    }
-    
-    Response:
-    {
-        "success": true,
-        "mensaje": "Caso agregado exitosamente",
-        "caso_id": 28
-    }
-    """
-    try:
-        if not sistema:
-            return jsonify({
-                "success": False,
-                "error": "Sistema no disponible"
-            }), 503
-        
-        data = request.get_json()
-        
-        # Validar campos requeridos
-        campos_requeridos = ['categoria', 'problema', 'sql', 'respuesta']
-        for campo in campos_requeridos:
-            if campo not in data:
-                return jsonify({
-                    "success": False,
-                    "error": f"Falta el campo '{campo}' en el body"
-                }), 400
-        
-        # Agregar caso
-        sistema.agregar_caso(
-            categoria=data['categoria'],
-            problema=data['problema'],
-            sql=data['sql'],
-            respuesta=data['respuesta']
-        )
-        
-        # Obtener ID del último caso agregado
-        try:
-            total_casos = len(sistema.obtener_todos_casos())
-            caso_id = total_casos
-        except:
-            caso_id = None
-        
-        return jsonify({
-            "success": True,
-            "mensaje": "Caso agregado exitosamente",
-            "caso_id": caso_id,
-            "categoria": data['categoria'],
-            "timestamp": datetime.now().isoformat()
-        })
-    
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+    """Agrega un caso nuevo al sistema"""
+    return responder(manejadores_api.ensenar_caso(request.get_json(silent=True)))
 
 
-# ═══════════════════════════════════════════════════════════════
-# ENDPOINT 4: LISTAR CASOS
-# ═══════════════════════════════════════════════════════════════
-
 @app.route('/api/casos', methods=['GET'])
 def listar_casos():
-    """
-    Lista todos los casos del sistema
-    
-    Query params:
-    - categoria: filtrar por categoría
-    - limit: número máximo de resultados (default: 100)
-    
-    Response:
-    {
-        "success": true,
-        "total": 27,
-        "casos": [ ... ]
-    }
-    """
-    try:
-        if not sistema:
-            return jsonify({
-                "success": False,
-                "error": "Sistema no disponible"
-            }), 503
-        
-        # Obtener parámetros
-        categoria_filtro = request.args.get('categoria')
-        limit = int(request.args.get('limit', 100))
-        
-        # Obtener casos
-        casos = sistema.obtener_todos_casos()
-        
-        # Formatear casos
-        casos_formateados = []
-        for i, caso in enumerate(casos, 1):
-            if len(caso) >= 4:
-                caso_dict = {
-                    "id": i,
-                    "categoria": caso[1],
-                    "problema": caso[2],
-                    "sql": caso[3],
-                    "respuesta": caso[4] if len(caso) > 4 else ""
-                }
-                
-                # Filtrar por categoría si se especifica
-                if not categoria_filtro or caso_dict['categoria'] == categoria_filtro:
-                    casos_formateados.append(caso_dict)
-        
-        # Limitar resultados
-        casos_formateados = casos_formateados[:limit]
-        
-        # Agrupar por categoría
-        categorias = {}
-        for caso in casos_formateados:
-            cat = caso['categoria']
-            categorias[cat] = categorias.get(cat, 0) + 1
-        
-        return jsonify({
-            "success": True,
-            "total": len(casos_formateados),
-            "casos": casos_formateados,
-            "categorias": categorias,
-            "timestamp": datetime.now().isoformat()
-        })
-    
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+    """Lista los casos del sistema (paginados por id)"""
+    return responder(manejadores_api.listar_casos(
+        request.args, ndjson=manejadores_api.quiere_ndjson(request.headers.get('Accept'))
+    ))
 
 
-# ═══════════════════════════════════════════════════════════════
-# ENDPOINT 5: ESTADÍSTICAS
-# ═══════════════════════════════════════════════════════════════
-
 @app.route('/api/estadisticas', methods=['GET'])
 def estadisticas():
-    """
-    Retorna estadísticas del sistema
-    
-    Response:
-    {
-        "success": true,
-        "total_casos": 27,
-        "casos_por_categoria": { ... },
-        "precision_promedio": 92,
-        ...
-    }
-    """
-    try:
-        if not sistema:
-            return jsonify({
-                "success": False,
-                "error": "Sistema no disponible"
-            }), 503
-        
-        # Obtener casos
-        casos = sistema.obtener_todos_casos()
-        
-        # Calcular estadísticas
-        categorias = {}
-        for caso in casos:
-            if len(caso) >= 2:
-                cat = caso[1]
-                categorias[cat] = categorias.get(cat, 0) + 1
-        
-        stats = {
-            "success": True,
-            "total_casos": len(casos),
-            "casos_por_categoria": categorias,
-            "categorias_unicas": len(categorias),
-            "precision_estimada": 92,  # Placeholder
-            "tiempo_ahorro_estimado": "85%",
-            "ahorro_mensual_usd": 4800,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        return jsonify(stats)
-    
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
-
+    """Retorna estadísticas del sistema"""
+    return responder(manejadores_api.estadisticas())
 
-# ═══════════════════════════════════════════════════════════════
-# ENDPOINT 6: HEALTH CHECK
-# ═══════════════════════════════════════════════════════════════
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    """
-    Verifica que la API está funcionando
-    
-    Response:
-    {
-        "status": "ok",
-        "sistema_disponible": true,
-        "validador_disponible": true,
-        "timestamp": "..."
-    }
-    """
-    return jsonify({
-        "status": "ok",
-        "sistema_disponible": sistema is not None,
-        "validador_disponible": validador is not None,
-        "version": "1.0.0",
-        "timestamp": datetime.now().isoformat()
-    })
-
-
-# ═══════════════════════════════════════════════════════════════
-# FUNCIONES AUXILIARES
-# ═══════════════════════════════════════════════════════════════
-
-def detectar_tipo_operacion(problema: str, sql: str) -> str:
-    """Detecta el tipo de operación"""
-    p = problema.lower()
-    sql_upper = sql.upper()
-    
-    if "estado" in p and "SET ESTADOLIQUIDACION" in sql_upper:
-        return "cambio_estado"
-    elif "comision" in p or "comisión" in p:
-        return "cambio_comision"
-    elif "vendedor" in p and "USERID" in sql_upper:
-        return "actualizar_vendedor"
-    else:
-        return "operacion_general"
-
-
-def extraer_datos_contexto(problema: str, sql: str, tipo: str) -> dict:
-    """Extrae datos de contexto"""
-    contexto = {}
-    
-    # Extraer crédito
-    creditos = re.findall(r'\d{13,16}', problema)
-    if creditos:
-        contexto["credit_number"] = creditos[0]
-    
-    # Según tipo
-    if tipo == "cambio_estado":
-        matches = re.findall(r'EstadoLiquidacion\w+\s*=\s*(\d+)', sql, re.IGNORECASE)
-        if matches:
-            contexto["estado_nuevo"] = int(matches[0])
-        contexto["estado_actual"] = 71  # Placeholder
-    
-    elif tipo == "cambio_comision":
-        matches = re.findall(r'ValueCommission\s*=\s*(\d+)', sql, re.IGNORECASE)
-        if matches:
-            contexto["valor_nuevo"] = int(matches[0])
-        contexto["valor_actual"] = 250000  # Placeholder
-    
-    return contexto
-
+    """Verifica que la API está funcionando"""
+    return responder(manejadores_api.health())
 
-# ═══════════════════════════════════════════════════════════════
-# PÁGINA DE DOCUMENTACIÓN
-# ═══════════════════════════════════════════════════════════════
 
 @app.route('/')
 def index():
     """Página de inicio con documentación"""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>API PQRS IA</title>
-        <style>
-            body { font-family: Arial; max-width: 1000px; margin: 50px auto; padding: 20px; background: #0f172a; color: #f1f5f9; }
-            h1 { color: #6366f1; }
-            h2 { color: #ec4899; border-bottom: 2px solid #334155; padding-bottom: 10px; }
-            .endpoint { background: #1e293b; padding: 15px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #6366f1; }
-            .method { color: #10b981; font-weight: bold; }
-            code { background: #334155; padding: 2px 6px; border-radius: 4px; color: #a9b1d6; }
-            pre { background: #1a1b26; padding: 15px; border-radius: 8px; overflow-x: auto; }
-            a { color: #6366f1; text-decoration: none; }
-            a:hover { text-decoration: underline; }
-        </style>
-    </head>
-    <body>
-        <h1>🤖 API REST - Sistema PQRS IA</h1>
-        <p>Documentación de endpoints disponibles</p>
-        
-        <div class="endpoint">
-            <h3><span class="method">GET</span> /api/health</h3>
-            <p>Verifica que la API está funcionando</p>
-            <pre>curl http://localhost:5000/api/health</pre>
-        </div>
-        
-        <div class="endpoint">
-            <h3><span class="method">POST</span> /api/resolver-pqrs</h3>
-            <p>Busca una solución para un problema PQRS</p>
-            <pre>curl -X POST http://localhost:5000/api/resolver-pqrs \\
-  -H "Content-Type: application/json" \\
-  -d '{
-    "problema": "Para el crédito 5800325002956151 cambiar estado a 77",
-    "incluir_validacion": true
-  }'</pre>
-        </div>
-        
-        <div class="endpoint">
-            <h3><span class="method">POST</span> /api/validar-sql</h3>
-            <p>Valida un SQL antes de ejecutarlo</p>
-            <pre>curl -X POST http://localhost:5000/api/validar-sql \\
-  -H "Content-Type: application/json" \\
-  -d '{
-    "sql": "UPDATE formatexceldlle SET Estado = 77 WHERE Credit = '123'"
-  }'</pre>
-        </div>
-        
-        <div class="endpoint">
-            <h3><span class="method">POST</span> /api/ensenar-caso</h3>
-            <p>Agrega un caso nuevo al sistema</p>
-            <pre>curl -X POST http://localhost:5000/api/ensenar-caso \\
-  -H "Content-Type: application/json" \\
-  -d '{
-    "categoria": "Estados",
-    "problema": "Cambiar estado a 77",
-    "sql": "UPDATE ...",
-    "respuesta": "Estado actualizado"
-  }'</pre>
-        </div>
-        
-        <div class="endpoint">
-            <h3><span class="method">GET</span> /api/casos</h3>
-            <p>Lista todos los casos del sistema</p>
-            <pre>curl http://localhost:5000/api/casos?categoria=Estados&limit=10</pre>
-        </div>
-        
-        <div class="endpoint">
-            <h3><span class="method">GET</span> /api/estadisticas</h3>
-            <p>Retorna estadísticas del sistema</p>
-            <pre>curl http://localhost:5000/api/estadisticas</pre>
-        </div>
-        
-        <h2>📚 Ejemplos de uso con n8n</h2>
-        <p>Configuración en n8n HTTP Request node:</p>
-        <ul>
-            <li><strong>Method:</strong> POST</li>
-            <li><strong>URL:</strong> http://tu-servidor:5000/api/resolver-pqrs</li>
-            <li><strong>Body Type:</strong> JSON</li>
-            <li><strong>Body:</strong> { "problema": "{{$json.email_body}}", "incluir_validacion": true }</li>
-        </ul>
-        
-        <h2>🔗 Recursos</h2>
-        <ul>
-            <li><a href="/api/health">Health Check</a></li>
-            <li><a href="/api/estadisticas">Estadísticas</a></li>
-            <li><a href="/api/casos?limit=5">Últimos 5 casos</a></li>
-        </ul>
-        
-        <hr>
-        <p style="text-align: center; color: #64748b;">API PQRS v1.0 | Desarrollado por Daner Mosquera</p>
-    </body>
-    </html>
-    """
+    return manejadores_api.PAGINA_DOCUMENTACION
+
+
+# `sistema` se reexporta para los hooks de gunicorn.conf.py
+__all__ = ['app', 'sistema']
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -665,6 +131,7 @@ if __name__ == '__main__':
        GET    /                       → Documentación
        GET    /api/health             → Health check
        POST   /api/resolver-pqrs      → Resolver PQRS
+       POST   /api/resolver-pqrs/batch → Resolver varios PQRS
        POST   /api/validar-sql        → Validar SQL
        POST   /api/ensenar-caso       → Agregar caso
        GET    /api/casos              → Listar casos
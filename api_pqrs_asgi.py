@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  API REST PARA SISTEMA PQRS IA - VARIANTE ASGI (Starlette + uvicorn)
+
+  Mismas rutas y mismo contrato JSON que api_pqrs.py (la lógica está
+  en manejadores_api.py), pero las conexiones las atiende un event
+  loop: miles de webhooks de n8n esperando no ocupan un hilo cada uno.
+
+  - Leer el body y responder es async.
+  - Lo que bloquea (embeddings, SQLite, validación) corre en un pool
+    de hilos acotado (PQRS_ASGI_HILOS).
+  - Si hay más de PQRS_ASGI_MAX_PENDIENTES trabajos esperando el pool,
+    se responde 503 con Retry-After en vez de encolar sin límite.
+
+  Uso:
+      python api_pqrs_asgi.py
+      uvicorn api_pqrs_asgi:app --host 0.0.0.0 --port 5000
+
+  Requiere: pip install starlette uvicorn
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import json
+import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, HTMLResponse, StreamingResponse
+from starlette.routing import Route
+
+# Agregar el sistema al path
+sys.path.append(str(Path(__file__).parent))
+
+# Sistema y lógica de los endpoints (compartidos con api_pqrs.py)
+import manejadores_api
+from manejadores_api import sistema, SISTEMA_DISPONIBLE
+
+HILOS = int(os.environ.get('PQRS_ASGI_HILOS', 4))
+MAX_PENDIENTES = int(os.environ.get('PQRS_ASGI_MAX_PENDIENTES', 256))
+
+# Pool acotado para el trabajo bloqueante: la concurrencia de conexiones no se
+# traduce en hilos (el modelo y SQLite no escalan con más hilos de todos modos)
+ejecutor = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix='pqrs-asgi')
+pendientes = 0
+
+
+def responder(resultado):
+    """(cuerpo, código, headers) de manejadores_api → respuesta Starlette"""
+    cuerpo, codigo, headers = resultado
+    if isinstance(cuerpo, dict):
+        return JSONResponse(cuerpo, status_code=codigo, headers=headers)
+    return StreamingResponse(lineas_en_ejecutor(cuerpo), status_code=codigo, headers=headers,
+                             media_type=manejadores_api.TIPO_NDJSON)
+
+
+async def en_ejecutor(funcion, *args):
+    """
+    Corre un manejador bloqueante en el pool sin frenar el event loop
+
+    Si ya hay MAX_PENDIENTES trabajos en curso o en cola, responde 503
+    de inmediato (backpressure) en vez de acumular memoria y latencia.
+    """
+    global pendientes
+    if pendientes >= MAX_PENDIENTES:
+        return JSONResponse({
+            "success": False,
+            "error": "Servidor ocupado, intenta de nuevo en unos segundos"
+        }, status_code=503, headers={'Retry-After': '1'})
+
+    pendientes += 1
+    try:
+        return responder(await asyncio.get_running_loop().run_in_executor(ejecutor, funcion, *args))
+    finally:
+        pendientes -= 1
+
+
+async def lineas_en_ejecutor(lineas):
+    """
+    Consume un generador NDJSON bloqueante línea por línea en el pool
+
+    Cada línea se envía apenas está lista; mientras el stream sigue
+    abierto cuenta como un trabajo pendiente más.
+    """
+    global pendientes
+    loop = asyncio.get_running_loop()
+    fin = object()
+    pendientes += 1
+    try:
+        while True:
+            linea = await loop.run_in_executor(ejecutor, next, lineas, fin)
+            if linea is fin:
+                break
+            yield linea
+    finally:
+        pendientes -= 1
+
+
+async def leer_json(request):
+    """Body JSON del request, o None si no viene o no es JSON válido"""
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINTS (contrato documentado en manejadores_api.py)
+# ═══════════════════════════════════════════════════════════════
+
+async def resolver_pqrs(request):
+    """Busca una solución para un problema PQRS"""
+    # Sin modelo no hay nada que mandar al pool: 503 directo desde el event loop
+    if sistema and sistema.estado != 'ready':
+        return responder(manejadores_api.respuesta_modelo_no_listo())
+    return await en_ejecutor(manejadores_api.resolver_pqrs, await leer_json(request))
+
+
+async def resolver_pqrs_lote(request):
+    """Busca soluciones para varios problemas PQRS en una sola llamada"""
+    if sistema and sistema.estado != 'ready':
+        return responder(manejadores_api.respuesta_modelo_no_listo())
+    return await en_ejecutor(manejadores_api.resolver_pqrs_lote, await leer_json(request),
+                             manejadores_api.quiere_ndjson(request.headers.get('accept')))
+
+
+async def validar_sql(request):
+    """Valida un SQL antes de ejecutarlo"""
+    return await en_ejecutor(manejadores_api.validar_sql, await leer_json(request))
+
+
+async def ensenar_caso(request):
+    """Agrega un caso nuevo al sistema"""
+    if sistema and sistema.estado != 'ready':
+        return responder(manejadores_api.respuesta_modelo_no_listo())
+    return await en_ejecutor(manejadores_api.ensenar_caso, await leer_json(request))
+
+
+async def listar_casos(request):
+    """Lista los casos del sistema (paginados por id)"""
+    return await en_ejecutor(manejadores_api.listar_casos, dict(request.query_params),
+                             manejadores_api.quiere_ndjson(request.headers.get('accept')))
+
+
+async def estadisticas(request):
+    """Retorna estadísticas del sistema"""
+    return await en_ejecutor(manejadores_api.estadisticas)
+
+
+async def health(request):
+    """Verifica que la API está funcionando (no pasa por el pool: responde aunque esté saturado)"""
+    return responder(manejadores_api.health())
+
+
+async def index(request):
+    """Página de inicio con documentación"""
+    return HTMLResponse(manejadores_api.PAGINA_DOCUMENTACION)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    yield
+    ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/resolver-pqrs', resolver_pqrs, methods=['POST']),
+        Route('/api/resolver-pqrs/batch', resolver_pqrs_lote, methods=['POST']),
+        Route('/api/validar-sql', validar_sql, methods=['POST']),
+        Route('/api/ensenar-caso', ensenar_caso, methods=['POST']),
+        Route('/api/casos', listar_casos, methods=['GET']),
+        Route('/api/estadisticas', estadisticas, methods=['GET']),
+        Route('/api/health', health, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=ciclo_de_vida,
+)
+
+
+# ═══════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════
+
+if __name__ == '__main__':
+    import uvicorn
+
+    if not SISTEMA_DISPONIBLE:
+        print("⚠️ ADVERTENCIA: Sistema PQRS no disponible")
+        print("   La API funcionará con capacidades limitadas")
+
+    port = int(os.environ.get('PORT', 5000))
+    print(f"🚀 API PQRS IA (ASGI) en http://localhost:{port} - {HILOS} hilos para inferencia")
+
+    # Un solo proceso: el event loop atiende las conexiones y el modelo se carga una vez
+    uvicorn.run(app, host='0.0.0.0', port=port, backlog=4096, timeout_keep_alive=30)
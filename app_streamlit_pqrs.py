@@ -165,7 +165,7 @@ elif page == "🔍 Resolver PQRS":
 
     if buscar and problema and st.session_state.sistema:
         with st.spinner("🤔 Déjame revisar mis casos... un momento..."):
-            ranking = st.session_state.sistema.buscar_similar_ia(problema)
+            ranking = st.session_state.sistema.buscar_similar_ia(problema, top_k=5)
 
         if not ranking or len(ranking) == 0:
             st.markdown("""
@@ -436,22 +436,20 @@ Para validar si la comisión se pagó:
 elif page == "📊 Métricas":
     st.markdown("<div class='main-header'><h1>📊 Dashboard de Métricas</h1><p>Analíticas y estadísticas del sistema</p></div>", unsafe_allow_html=True)
     if st.session_state.sistema:
+        # Casos por categoría (las mismas particiones que usa la búsqueda), sin leer todos los casos
         try:
-            casos = st.session_state.sistema.obtener_todos_casos()
+            categorias = st.session_state.sistema.casos_por_categoria()
         except:
             try:
                 c = st.session_state.sistema.conn.cursor()
-                c.execute('SELECT * FROM casos')
-                casos = c.fetchall()
+                c.execute('SELECT categoria, COUNT(*) FROM casos GROUP BY categoria')
+                categorias = dict(c.fetchall())
             except:
-                casos = []
+                categorias = {}
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.markdown(f"<div class='metric-card'><p class='metric-label'>Total de Casos</p><p class='metric-value'>{len(casos)}</p></div>", unsafe_allow_html=True)
+            st.markdown(f"<div class='metric-card'><p class='metric-label'>Total de Casos</p><p class='metric-value'>{sum(categorias.values())}</p></div>", unsafe_allow_html=True)
         with col2:
-            categorias = {}
-            for caso in casos:
-                cat = caso[1]; categorias[cat] = categorias.get(cat, 0) + 1
             st.markdown(f"<div class='metric-card'><p class='metric-label'>Categorías</p><p class='metric-value'>{len(categorias)}</p></div>", unsafe_allow_html=True)
         with col3:
             st.markdown("<div class='metric-card'><p class='metric-label'>Ahorro Estimado</p><p class='metric-value'>$4.8K</p><p style='color:#94a3b8;font-size:0.85rem;'>USD/mes</p></div>", unsafe_allow_html=True)
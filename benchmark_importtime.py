@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  BENCHMARK DE TIEMPO DE IMPORTACIÓN - Sistema PQRS
+
+  Importa cada módulo en un proceso limpio con `python -X importtime`
+  y falla (código 1) si:
+  - el tiempo acumulado supera el presupuesto del módulo, o
+  - el módulo arrastra dependencias que no debería (torch,
+    sentence_transformers, sklearn, ...)
+
+  La ruta de validación (validador_automatico + reglas_negocio) no
+  debe cargar nada de ML; el sistema de IA solo carga el modelo al
+  calcular el primer embedding.
+
+  Uso:
+      python benchmark_importtime.py
+      PQRS_PRESUPUESTO_VALIDADOR_MS=30 python benchmark_importtime.py
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import subprocess
+
+PESADOS_ML = ['torch', 'sentence_transformers', 'transformers', 'sklearn', 'onnxruntime', 'hnswlib']
+
+# (módulo, presupuesto en ms, paquetes prohibidos)
+OBJETIVOS = [
+    ('validador_automatico', float(os.environ.get('PQRS_PRESUPUESTO_VALIDADOR_MS', 50)), PESADOS_ML + ['numpy']),
+    ('sistema_pqrs_v4_ia', float(os.environ.get('PQRS_PRESUPUESTO_SISTEMA_MS', 400)), PESADOS_ML),
+]
+
+REPETICIONES = 3
+
+
+def medir_importacion(modulo):
+    """
+    Importa el módulo con -X importtime
+
+    Returns:
+        (milisegundos acumulados del módulo, set de paquetes importados)
+    """
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{resultado.stderr[-2000:]}")
+
+    acumulado = None
+    paquetes = set()
+    for linea in resultado.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not linea.startswith('import time:') or '|' not in linea:
+            continue
+        partes = linea[len('import time:'):].split('|')
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        nombre = partes[2].strip()
+        paquetes.add(nombre.split('.')[0])
+        if nombre == modulo:
+            acumulado = int(partes[1]) / 1000
+
+    if acumulado is None:
+        raise RuntimeError(f"-X importtime no reportó {modulo}")
+    return acumulado, paquetes
+
+
+def main():
+    fallas = 0
+    print("📊 TIEMPO DE IMPORTACIÓN (mejor de %d)" % REPETICIONES)
+
+    for modulo, presupuesto, prohibidos in OBJETIVOS:
+        mediciones = [medir_importacion(modulo) for _ in range(REPETICIONES)]
+        milisegundos = min(m[0] for m in mediciones)
+        paquetes = mediciones[0][1]
+        cargados = [p for p in prohibidos if p in paquetes]
+
+        estado = "✅" if milisegundos <= presupuesto and not cargados else "❌"
+        print(f"{estado} {modulo:<24} {milisegundos:8.1f} ms  (presupuesto: {presupuesto:.0f} ms)")
+        if cargados:
+            print(f"   ❌ Importa dependencias pesadas: {', '.join(cargados)}")
+        if estado == "❌":
+            fallas += 1
+
+    return 1 if fallas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
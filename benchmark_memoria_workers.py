@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  BENCHMARK DE MEMORIA POR WORKER - API PQRS con gunicorn
+
+  Levanta la API con gunicorn.conf.py, espera a que esté lista, le
+  manda algunas consultas y mide en /proc/<pid>/smaps_rollup la
+  memoria del master y de cada worker:
+  - Privada (USS): lo que cuesta agregar un worker más
+  - PSS: memoria compartida repartida entre los procesos
+
+  Falla (código 1) si algún worker supera el presupuesto de memoria
+  privada (PQRS_MB_POR_WORKER, default 150 MB).
+
+  Uso (solo Linux):
+      python benchmark_memoria_workers.py
+      PQRS_WORKERS=4 PQRS_MB_POR_WORKER=120 python benchmark_memoria_workers.py
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import subprocess
+import urllib.request
+
+PRESUPUESTO_MB_POR_WORKER = float(os.environ.get('PQRS_MB_POR_WORKER', 150))
+
+CONSULTAS = [
+    "Para el crédito 5800325002956151 cambiar estado de liquidación a 77",
+    "Eliminar comisión duplicada del vendedor 1036789456",
+    "El concesionario no aparece asignado al crédito 5800325002311111",
+    "Actualizar la factura del crédito 5800325002999999 a pagada",
+]
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def memoria_proceso(pid):
+    """Rss, Pss y memoria privada (USS) en MB desde smaps_rollup"""
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[0].endswith(':') and partes[1].isdigit():
+                valores[partes[0][:-1]] = int(partes[1]) / 1024
+    return {
+        'rss': valores.get('Rss', 0),
+        'pss': valores.get('Pss', 0),
+        'privada': valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0),
+    }
+
+
+def hijos(pid):
+    ruta = f'/proc/{pid}/task/{pid}/children'
+    with open(ruta, 'r') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def esperar_api(url, timeout=600):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(url + '/api/health', timeout=5) as r:
+                if json.load(r).get('modelo') == 'ready':
+                    return True
+        except OSError:
+            pass
+        time.sleep(1)
+    return False
+
+
+def consultar(url, problema):
+    datos = json.dumps({'problema': problema}).encode('utf-8')
+    req = urllib.request.Request(url + '/api/resolver-pqrs', data=datos,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=60) as r:
+        return r.status
+
+
+def main():
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("⚠️ Este benchmark necesita Linux (/proc/<pid>/smaps_rollup)")
+        return 2
+
+    puerto = puerto_libre()
+    url = f'http://127.0.0.1:{puerto}'
+    entorno = dict(os.environ, PORT=str(puerto))
+    workers = int(entorno.setdefault('PQRS_WORKERS', '2'))
+
+    print(f"🔄 Levantando gunicorn con {workers} workers en el puerto {puerto}...")
+    inicio = time.perf_counter()
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'api_pqrs:app'],
+        env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        if not esperar_api(url):
+            print("❌ La API no quedó lista a tiempo")
+            return 1
+        print(f"✅ API lista en {time.perf_counter() - inicio:.1f}s")
+
+        # Tocar el modelo y la matriz en todos los workers
+        for _ in range(workers * 5):
+            for problema in CONSULTAS:
+                consultar(url, problema)
+
+        pids_workers = hijos(master.pid)
+        memoria_master = memoria_proceso(master.pid)
+        memorias = {pid: memoria_proceso(pid) for pid in pids_workers}
+
+        print("\n📊 MEMORIA (MB)")
+        print(f"{'proceso':<16}{'RSS':>10}{'PSS':>10}{'Privada':>10}")
+        print(f"{'master':<16}{memoria_master['rss']:>10.1f}{memoria_master['pss']:>10.1f}{memoria_master['privada']:>10.1f}")
+        for pid, memoria in memorias.items():
+            print(f"{'worker ' + str(pid):<16}{memoria['rss']:>10.1f}{memoria['pss']:>10.1f}{memoria['privada']:>10.1f}")
+
+        total_pss = memoria_master['pss'] + sum(m['pss'] for m in memorias.values())
+        maxima_privada = max((m['privada'] for m in memorias.values()), default=0)
+        print(f"\n   PSS total: {total_pss:.1f} MB")
+        print(f"   Memoria privada por worker (máx): {maxima_privada:.1f} MB "
+              f"(presupuesto: {PRESUPUESTO_MB_POR_WORKER:.0f} MB)")
+
+        if maxima_privada > PRESUPUESTO_MB_POR_WORKER:
+            print("❌ Un worker supera el presupuesto de memoria")
+            return 1
+        print("✅ Memoria por worker dentro del presupuesto")
+        return 0
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  CACHE LRU CON EXPIRACIÓN - Sistema PQRS
+
+  Evita recalcular el embedding de consultas repetidas (reintentos de
+  n8n, reenvíos de Slack, reruns de Streamlit).
+  - Tamaño máximo: al llenarse se descarta la entrada menos usada
+  - TTL: una entrada más vieja que `ttl` segundos se recalcula
+  - Contadores de aciertos y fallos
+═══════════════════════════════════════════════════════════════════
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Diccionario acotado con política LRU y expiración, seguro entre hilos"""
+
+    def __init__(self, maximo=1024, ttl=3600):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()         # clave -> (instante, valor)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def obtener(self, clave):
+        """Retorna el valor guardado o None (si no está o ya expiró)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                instante, valor = entrada
+                if not self.ttl or time.monotonic() - instante < self.ttl:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._datos[clave]
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave, valor):
+        if self.maximo <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (time.monotonic(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {
+            'tamano': len(self._datos),
+            'maximo': self.maximo,
+            'ttl': self.ttl,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / total, 4) if total else 0.0,
+        }
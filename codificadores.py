@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  CODIFICADORES DE EMBEDDINGS - Sistema PQRS
+
+  Backends intercambiables para convertir texto en embeddings:
+  - torch:     SentenceTransformer sobre PyTorch (por defecto)
+  - onnx:      el mismo modelo exportado a ONNX, en ONNX Runtime (fp32)
+  - onnx-int8: el modelo ONNX con cuantización dinámica int8
+
+  Todos exponen encode(textos, batch_size, convert_to_numpy) como
+  SentenceTransformer, así el resto del sistema no cambia.
+
+  Exportar una sola vez (requiere torch + onnxruntime):
+      python codificadores.py exportar
+
+  Medir la deriva contra PyTorch sobre los casos guardados:
+      python codificadores.py paridad --backend onnx-int8
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import re
+import json
+import sqlite3
+import importlib.util
+import numpy as np
+
+# onnxruntime es opcional (solo para los backends ONNX); se importa al crear el codificador
+ONNXRUNTIME_DISPONIBLE = importlib.util.find_spec('onnxruntime') is not None
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+ARCHIVOS_ONNX = {'onnx': 'modelo.onnx', 'onnx-int8': 'modelo_int8.onnx'}
+
+
+def directorio_modelo(directorio_base, nombre_modelo):
+    """Carpeta de la exportación ONNX de un modelo"""
+    return os.path.join(directorio_base, re.sub(r'[^\w.-]', '_', nombre_modelo))
+
+
+class CodificadorTorch:
+    """SentenceTransformer sobre PyTorch"""
+
+    backend = 'torch'
+
+    def __init__(self, nombre_modelo):
+        # Import diferido: torch solo se carga si se usa este backend
+        from sentence_transformers import SentenceTransformer
+        self.modelo = SentenceTransformer(nombre_modelo)
+
+    def encode(self, textos, batch_size=32, convert_to_numpy=True):
+        return self.modelo.encode(textos, batch_size=batch_size, convert_to_numpy=convert_to_numpy,
+                                  show_progress_bar=False)
+
+
+class CodificadorONNX:
+    """
+    Modelo exportado con exportar_onnx() corriendo en ONNX Runtime
+
+    Replica el pooling de SentenceTransformer (promedio de los tokens
+    según la máscara de atención) sobre la salida last_hidden_state.
+    """
+
+    def __init__(self, directorio, cuantizado=False, hilos=None):
+        if not ONNXRUNTIME_DISPONIBLE:
+            raise ImportError("onnxruntime no instalado. Instala con: pip install onnxruntime")
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.backend = 'onnx-int8' if cuantizado else 'onnx'
+        ruta = os.path.join(directorio, ARCHIVOS_ONNX[self.backend])
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"{ruta} no existe. Exporta con: python codificadores.py exportar")
+
+        with open(os.path.join(directorio, 'codificador.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        opciones = onnxruntime.SessionOptions()
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+        self.sesion = onnxruntime.InferenceSession(ruta, opciones, providers=['CPUExecutionProvider'])
+        self.entradas = [entrada.name for entrada in self.sesion.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(directorio)
+
+    def encode(self, textos, batch_size=32, convert_to_numpy=True):
+        unico = isinstance(textos, str)
+        if unico:
+            textos = [textos]
+
+        resultados = []
+        for inicio in range(0, len(textos), batch_size):
+            tokens = self.tokenizer(textos[inicio:inicio + batch_size], padding=True, truncation=True,
+                                    max_length=self.meta['max_seq_length'], return_tensors='np')
+            mascara = tokens['attention_mask'].astype(np.int64)
+            feed = {}
+            for nombre in self.entradas:
+                if nombre in tokens:
+                    feed[nombre] = tokens[nombre].astype(np.int64)
+                else:
+                    feed[nombre] = np.zeros_like(mascara)
+
+            ocultos = self.sesion.run(None, feed)[0]
+
+            # Mean pooling con la máscara de atención
+            peso = mascara[..., None].astype(np.float32)
+            suma = (ocultos * peso).sum(axis=1)
+            resultados.append(suma / np.clip(peso.sum(axis=1), 1e-9, None))
+
+        matriz = np.concatenate(resultados) if resultados else np.zeros((0, 0), dtype=np.float32)
+        return matriz[0] if unico else matriz
+
+
+def crear_codificador(backend, nombre_modelo, directorio_base='modelo_onnx'):
+    """
+    Crea el codificador del backend indicado
+
+    Args:
+        backend: 'torch', 'onnx' o 'onnx-int8'
+        nombre_modelo: Modelo de sentence-transformers
+        directorio_base: Carpeta donde exportar_onnx() dejó los modelos ONNX
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings desconocido: {backend}")
+
+    if backend == 'torch':
+        return CodificadorTorch(nombre_modelo)
+    return CodificadorONNX(directorio_modelo(directorio_base, nombre_modelo), cuantizado=backend == 'onnx-int8')
+
+
+class ReordenadorCruzado:
+    """
+    Cross-encoder de sentence-transformers para reordenar los mejores casos
+
+    Puntúa cada par (consulta, texto del caso) con una pasada del modelo:
+    se usa solo sobre los pocos candidatos que ya ganaron con embeddings.
+    """
+
+    def __init__(self, nombre_modelo):
+        # Import diferido: igual que CodificadorTorch
+        from sentence_transformers import CrossEncoder
+        self.modelo = CrossEncoder(nombre_modelo)
+
+    def puntuar(self, consulta, textos, batch_size=32):
+        if not textos:
+            return np.zeros(0, dtype=np.float32)
+        puntajes = self.modelo.predict([(consulta, texto) for texto in textos], batch_size=batch_size,
+                                       show_progress_bar=False)
+        return np.asarray(puntajes, dtype=np.float32)
+
+
+# ─────────────────────────────────────────────
+# Exportación
+# ─────────────────────────────────────────────
+
+def exportar_onnx(nombre_modelo, directorio_base='modelo_onnx', cuantizar=True):
+    """
+    Exporta el transformer del modelo a ONNX (y opcionalmente a int8)
+
+    Requiere torch, sentence-transformers y onnxruntime. Solo hace falta
+    correrlo una vez por modelo; el resultado se puede versionar o copiar.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    modelo = SentenceTransformer(nombre_modelo, device='cpu')
+    transformer, pooling = modelo[0], modelo[1]
+    if not pooling.pooling_mode_mean_tokens:
+        raise ValueError(f"{nombre_modelo} no usa mean pooling; el backend ONNX no lo soporta")
+
+    directorio = directorio_modelo(directorio_base, nombre_modelo)
+    os.makedirs(directorio, exist_ok=True)
+    ruta_fp32 = os.path.join(directorio, ARCHIVOS_ONNX['onnx'])
+
+    # Entradas en el orden del forward de BERT / XLM-R
+    ejemplo = transformer.tokenizer(['texto de ejemplo'], return_tensors='pt')
+    nombres = [nombre for nombre in ('input_ids', 'attention_mask', 'token_type_ids') if nombre in ejemplo]
+    ejes = {nombre: {0: 'lote', 1: 'secuencia'} for nombre in nombres}
+    ejes['last_hidden_state'] = {0: 'lote', 1: 'secuencia'}
+
+    print(f"🔄 Exportando {nombre_modelo} a ONNX...")
+    transformer.auto_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer.auto_model,
+            tuple(ejemplo[nombre] for nombre in nombres),
+            ruta_fp32,
+            input_names=nombres,
+            output_names=['last_hidden_state'],
+            dynamic_axes=ejes,
+            opset_version=14,
+        )
+    transformer.tokenizer.save_pretrained(directorio)
+
+    with open(os.path.join(directorio, 'codificador.json'), 'w', encoding='utf-8') as f:
+        json.dump({'modelo': nombre_modelo, 'max_seq_length': transformer.max_seq_length, 'pooling': 'mean'}, f)
+    print(f"✅ Modelo ONNX fp32: {ruta_fp32}")
+
+    if cuantizar:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        ruta_int8 = os.path.join(directorio, ARCHIVOS_ONNX['onnx-int8'])
+        quantize_dynamic(ruta_fp32, ruta_int8, weight_type=QuantType.QInt8)
+        print(f"✅ Modelo ONNX int8: {ruta_int8}")
+
+    return directorio
+
+
+# ─────────────────────────────────────────────
+# Paridad
+# ─────────────────────────────────────────────
+
+def verificar_paridad(nombre_modelo, backend, directorio_base='modelo_onnx', db='pqrs_sistema.db', limite=1000):
+    """
+    Compara los embeddings de un backend contra PyTorch sobre los casos guardados
+
+    Returns:
+        Dict con la deriva coseno (1 - coseno) promedio, p99 y máxima, y
+        cuántos casos cambian de vecino más cercano
+    """
+    conn = sqlite3.connect(db)
+    textos = [fila[0].strip() for fila in conn.execute('SELECT problema FROM casos ORDER BY id LIMIT ?', (limite,))]
+    conn.close()
+    if not textos:
+        raise ValueError(f"No hay casos en {db} para comparar")
+
+    def normalizar(matriz):
+        matriz = np.asarray(matriz, dtype=np.float32)
+        return matriz / np.clip(np.linalg.norm(matriz, axis=1, keepdims=True), 1e-12, None)
+
+    referencia = normalizar(crear_codificador('torch', nombre_modelo).encode(textos))
+    candidato = normalizar(crear_codificador(backend, nombre_modelo, directorio_base).encode(textos))
+
+    deriva = 1.0 - np.sum(referencia * candidato, axis=1)
+
+    # Vecino más cercano de cada caso (sin contarse a sí mismo) con ambos backends
+    similitudes_ref = referencia @ referencia.T
+    similitudes_cand = candidato @ candidato.T
+    np.fill_diagonal(similitudes_ref, -np.inf)
+    np.fill_diagonal(similitudes_cand, -np.inf)
+    vecinos_distintos = int(np.sum(similitudes_ref.argmax(axis=1) != similitudes_cand.argmax(axis=1))) if len(textos) > 1 else 0
+
+    return {
+        'backend': backend,
+        'casos': len(textos),
+        'deriva_promedio': float(deriva.mean()),
+        'deriva_p99': float(np.percentile(deriva, 99)),
+        'deriva_maxima': float(deriva.max()),
+        'vecino_distinto': vecinos_distintos,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backends de embeddings del sistema PQRS")
+    parser.add_argument('comando', choices=['exportar', 'paridad'])
+    parser.add_argument('--modelo', default=os.environ.get('PQRS_MODELO', 'paraphrase-multilingual-MiniLM-L12-v2'))
+    parser.add_argument('--directorio', default=os.environ.get('PQRS_DIRECTORIO_ONNX', 'modelo_onnx'))
+    parser.add_argument('--backend', default='onnx-int8', choices=['onnx', 'onnx-int8'])
+    parser.add_argument('--sin-int8', action='store_true', help="No generar el modelo cuantizado")
+    parser.add_argument('--db', default='pqrs_sistema.db')
+    parser.add_argument('--limite', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.comando == 'exportar':
+        exportar_onnx(args.modelo, args.directorio, cuantizar=not args.sin_int8)
+    else:
+        reporte = verificar_paridad(args.modelo, args.backend, args.directorio, args.db, args.limite)
+        print(f"📊 Paridad {reporte['backend']} vs torch sobre {reporte['casos']} casos:")
+        print(f"   Deriva coseno promedio: {reporte['deriva_promedio']:.6f}")
+        print(f"   Deriva coseno p99:      {reporte['deriva_p99']:.6f}")
+        print(f"   Deriva coseno máxima:   {reporte['deriva_maxima']:.6f}")
+        print(f"   Casos con otro vecino más cercano: {reporte['vecino_distinto']}")
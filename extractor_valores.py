@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  EXTRACTOR DE VALORES - Sistema PQRS
+
+  Una sola expresión regular compilada recorre el texto UNA vez y
+  devuelve todos los valores que interesan, con su posición:
+  - credito         toda corrida de 13+ dígitos (también si es el
+                    valor de otra coincidencia: "id 5800325002956151")
+  - cedula          después de CC, C.C., NIT, cédula
+  - id              después de ID, userid, CommissionID, vendedorID
+  - id_comision     después de "ID de comisión"
+  - comision        5+ dígitos después de "comisión"
+  - documento       después de "documento"
+  - monto           después de $ (texto original, ver montos())
+  - estado          código (estado de liquidación a 77)
+  - estado_texto    texto (estado: Aprobado), mayúsculas o minúsculas
+  - fecha           13-ene-2026, 13/ene/26
+  - fecha_numerica  13/01/2026
+  - factura         número de factura (FE-1234, 98765)
+  - nombre          después de "Nombre:"
+  - numero          cualquier otro número suelto
+
+  Cada tipo es un dato crudo: qué valor usar para qué (por ejemplo el
+  userid del SQL) lo decide quien llama, como antes hacía cada cascada
+  de regex. extraer() guarda los últimos resultados: el mismo correo
+  pegado pasa por la API, la validación y el agente sin volver a
+  escanearse.
+
+  Uso:
+      valores = extraer(texto)
+      valores.primero('credito')            # '5800325002956151'
+      valores.primero('id', 'id_comision')  # el primero de los dos tipos
+      valores.numeros(minimo_digitos=10)    # todas las corridas de dígitos
+═══════════════════════════════════════════════════════════════════
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, List, Optional
+
+# Las alternativas se prueban en orden en cada posición: las que tienen palabra clave
+# van antes que el número suelto, que se queda con lo que nadie reclamó. El lookahead
+# inicial descarta de una vez las posiciones donde no puede empezar ninguna.
+# Los textos de estado y nombre se capturan dentro de lookaheads (no consumen): las
+# palabras clave y números que contienen se siguen reconociendo por su cuenta.
+_PATRON = re.compile(r'''
+    (?=[\d$]|\b[cCnNiIuUdDfFeEvV])
+    (?:
+      (?P<fecha>\d{1,2}[-/]\w{3}[-/]\d{2,4})
+    | (?P<fecha_numerica>\d{2}/\d{2}/\d{4})
+    | \$\s*(?P<monto>[\d,.]+)
+    | (?i:\bc\.?c\.?|\bnit|\bc[ée]dula)[:\s]*(?P<cedula>\d+)
+    | (?i:\b(?:user|commission|comisi[óo]n|vendedor)?id\s*(?:de\s*)?comisi[óo]n)[:\s]*(?P<id_comision>\d+)
+    | (?i:\b(?:user|commission|comisi[óo]n|vendedor)?id)[:\s]*(?P<id>\d+)
+    | (?i:\bcomisi[óo]n)[:\s]+(?P<comision>\d{5,})
+    | (?i:\bdocumento)[:\s]+(?P<documento>\d+)
+    | (?i:\b(?:factura|fac)\b)\.?\s*(?:(?i:no|n[°º])\.?\s*)?[:#]?\s*(?P<factura>[A-Za-z0-9-]*\d[A-Za-z0-9-]*)
+    | (?i:\bestado)
+      (?=[^\d\n]{0,40}?(?P<estado>\d{1,3})\b)?
+      (?=[:\s]+(?P<estado_texto>(?i:[A-Z][a-záéíóúñ\s]+)))?
+    | \b[Nn]ombre(?=[:\s]+(?P<nombre>[A-Z][a-záéíóúñ]+(?:\s+[A-Z][a-záéíóúñ]+)*))
+    | (?P<numero>\d+)
+    )
+''', re.VERBOSE)
+
+# Asignaciones numéricas de un SQL: EstadoLiquidacionVendedor = 77, ValueCommission = 250000
+_PATRON_ASIGNACION = re.compile(r"\b(\w+)\s*=\s*(\d+)")
+
+_DIGITOS = re.compile(r'\d+')
+
+_GRUPOS_ESTADO = ('estado', 'estado_texto')
+
+# Corrida de dígitos que cuenta como número de crédito
+DIGITOS_CREDITO = 13
+
+
+class Coincidencia(NamedTuple):
+    """Un valor encontrado: tipo, texto y posición [inicio, fin) en el texto original"""
+    tipo: str
+    valor: str
+    inicio: int
+    fin: int
+
+
+class ValoresExtraidos:
+    """Todos los valores de un texto, en orden de aparición (solo lectura)"""
+
+    def __init__(self, coincidencias):
+        self.coincidencias = tuple(coincidencias)
+
+    def __iter__(self):
+        return iter(self.coincidencias)
+
+    def __len__(self):
+        return len(self.coincidencias)
+
+    def todos(self, *tipos) -> List[str]:
+        return [c.valor for c in self.coincidencias if c.tipo in tipos]
+
+    def primero(self, *tipos, defecto=None) -> Optional[str]:
+        return next((c.valor for c in self.coincidencias if c.tipo in tipos), defecto)
+
+    def numeros(self, minimo_digitos=1) -> List[str]:
+        """
+        Todas las corridas de dígitos del texto, en orden (también las que
+        están dentro de fechas, montos y facturas), sin repetir posiciones
+        """
+        vistos = set()
+        numeros = []
+        for c in self.coincidencias:
+            corridas = ([(c.inicio, c.valor)] if c.valor.isdigit() else
+                        [(c.inicio + m.start(), m.group()) for m in _DIGITOS.finditer(c.valor)])
+            for inicio, numero in corridas:
+                if inicio not in vistos:
+                    vistos.add(inicio)
+                    if len(numero) >= minimo_digitos:
+                        numeros.append(numero)
+        return numeros
+
+    def montos(self) -> List[str]:
+        """Montos sin separadores de miles ni decimales ($ 1.200.000 -> '1200000')"""
+        return [monto.replace(',', '').replace('.', '') for monto in self.todos('monto')]
+
+
+@lru_cache(maxsize=256)
+def extraer(texto) -> ValoresExtraidos:
+    """Recorre el texto una sola vez y retorna todos sus valores con su posición"""
+    coincidencias = []
+    agregar = coincidencias.append
+    con_estado = False
+    for match in _PATRON.finditer(texto or ''):
+        grupo = match.lastgroup
+        if grupo is None or grupo in _GRUPOS_ESTADO:
+            # "estado" es la única alternativa con dos grupos (opcionales los dos)
+            con_estado = True
+            grupos = _GRUPOS_ESTADO
+        else:
+            grupos = (grupo,)
+
+        for grupo in grupos:
+            valor = match.group(grupo)
+            if valor is None:
+                continue
+            inicio = match.start(grupo)
+            if grupo == 'estado_texto':
+                valor = valor.rstrip()
+            if len(valor) >= DIGITOS_CREDITO:
+                if grupo == 'numero':
+                    grupo = 'credito'
+                else:
+                    # El mismo número es además un crédito (id 5800325002956151)
+                    coincidencias.extend(
+                        Coincidencia('credito', m.group(), inicio + m.start(), inicio + m.end())
+                        for m in _DIGITOS.finditer(valor) if len(m.group()) >= DIGITOS_CREDITO
+                    )
+            agregar(Coincidencia(grupo, valor, inicio, inicio + len(valor)))
+
+    if con_estado:
+        # Los valores de los lookaheads de "estado" quedan antes de los números que contienen
+        coincidencias.sort(key=lambda c: c.inicio)
+    return ValoresExtraidos(coincidencias)
+
+
+def asignaciones_sql(sql) -> List[Coincidencia]:
+    """Asignaciones numéricas de un SQL en una pasada (tipo = nombre de la columna)"""
+    return [Coincidencia(match.group(1), match.group(2), *match.span(2))
+            for match in _PATRON_ASIGNACION.finditer(sql or '')]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  CONFIGURACIÓN GUNICORN (PRODUCCIÓN) - API PQRS
+
+  Uso:  gunicorn -c gunicorn.conf.py api_pqrs:app
+
+  El master abre el puerto de inmediato y carga el modelo en segundo
+  plano. Mientras tanto una primera tanda de workers responde el health
+  check ("modelo": "loading") y 503 en lo que necesita embeddings.
+  Cuando el modelo termina, el master se manda SIGHUP: gunicorn hace
+  fork de workers nuevos, que comparten el modelo y la matriz de
+  embeddings (memmap) copy-on-write, y retira los provisionales sin
+  cortar requests.
+
+  Variables de entorno:
+  - PORT             puerto (Railway lo define)
+  - PQRS_WORKERS     número de workers (default: 2)
+  - PQRS_THREADS     hilos por worker (default: 4)
+  - PQRS_TIMEOUT     timeout de un request en segundos (default: 120)
+
+  Memoria esperada: ver "Producción con gunicorn" en GUIA_API_Y_N8N.md
+  y benchmark_memoria_workers.py.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import signal
+import threading
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('PQRS_WORKERS', 2))
+threads = int(os.environ.get('PQRS_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('PQRS_TIMEOUT', 120))
+preload_app = True
+
+# api_pqrs carga el modelo dentro del master (sin proceso de embeddings) para
+# que los workers lo hereden en el fork
+os.environ['PQRS_PREFORK'] = '1'
+
+# Un pool de hilos de torch por worker: sin esto cada worker usa todos los núcleos
+os.environ.setdefault('OMP_NUM_THREADS', str(max(1, (os.cpu_count() or 1) // workers)))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """En el master, con el puerto ya abierto: reemplazar los workers cuando cargue el modelo"""
+    from api_pqrs import sistema
+    if sistema is None or sistema.listo.is_set():
+        return
+
+    def reemplazar_workers():
+        sistema.listo.wait()
+        server.log.info("Modelo cargado: reemplazando los workers provisionales")
+        os.kill(os.getpid(), signal.SIGHUP)
+
+    threading.Thread(target=reemplazar_workers, name='espera-modelo-pqrs', daemon=True).start()
+
+
+def pre_fork(server, worker):
+    """
+    En el master, antes de cada fork: nada de escrituras a medias ni hilos vivos
+
+    Mientras el modelo carga no se espera: el worker es provisional y
+    when_ready lo reemplaza al terminar. Los forks siguientes (el resto de
+    la tanda, workers reemplazados) no repiten el guardado si el master no
+    cambió nada (ver preparar_fork).
+    """
+    from api_pqrs import sistema
+    if sistema is not None and sistema.estado == 'ready':
+        sistema.preparar_fork()
+
+
+def post_fork(server, worker):
+    """En cada worker: conexión SQLite propia"""
+    from api_pqrs import sistema
+    if sistema is not None:
+        sistema.reabrir_tras_fork()
@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  ÍNDICES DE VECINOS MÁS CERCANOS APROXIMADOS (ANN) - Sistema PQRS
+
+  Índices para buscar embeddings sin recorrer todos los casos:
+  - IndiceIVF:  listas invertidas con k-means, NumPy puro
+  - IndiceHNSW: grafo HNSW (requiere: pip install hnswlib)
+
+  Todos los vectores deben llegar normalizados (norma 1), así el
+  producto punto es la similitud coseno.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import copy
+import pickle
+import threading
+import importlib.util
+import numpy as np
+
+# hnswlib es opcional; se importa al crear o cargar un IndiceHNSW
+HNSWLIB_DISPONIBLE = importlib.util.find_spec('hnswlib') is not None
+
+
+class _ListaInvertida:
+    """Vectores de una lista del IVF en un buffer contiguo que crece por duplicación"""
+
+    # True mientras un entrenamiento en segundo plano lee self.vectores: la próxima
+    # escritura dentro de esas filas copia el buffer antes (copy-on-write)
+    _compartido = False
+
+    def __init__(self, dimension, ids=None, vectores=None):
+        self.ids = list(ids) if ids is not None else []
+        self.vectores = vectores if vectores is not None else np.zeros((0, dimension), dtype=np.float32)
+        self._buffer = vectores
+
+    def agregar(self, caso_id, vector):
+        n = len(self.ids)
+        if self._buffer is None or n >= self._buffer.shape[0]:
+            buffer = np.zeros((max(16, n * 2), vector.shape[0]), dtype=np.float32)
+            if n:
+                buffer[:n] = self.vectores
+            self._buffer = buffer
+            self._compartido = False
+        self._buffer[n] = vector
+        self.ids.append(caso_id)
+        self.vectores = self._buffer[:n + 1]
+        return n
+
+    def quitar(self, posicion):
+        """Quita una fila moviendo la última a su lugar. Retorna el id movido (o None)"""
+        if self._compartido:
+            self._buffer = self._buffer.copy()
+            self._compartido = False
+        ultima = len(self.ids) - 1
+        movido = None
+        if posicion != ultima:
+            self._buffer[posicion] = self._buffer[ultima]
+            self.ids[posicion] = self.ids[ultima]
+            movido = self.ids[posicion]
+        self.ids.pop()
+        self.vectores = self._buffer[:ultima]
+        return movido
+
+    def congelar(self):
+        """(ids, vectores) que no cambian aunque la lista se siga modificando"""
+        self._compartido = True
+        return list(self.ids), self.vectores
+
+
+def _vecinos_exactos(ids, matriz, filas, k):
+    """
+    Los k vecinos exactos de cada vector matriz[fila], sin contarse a sí mismo
+
+    Un vector del índice siempre se encuentra a sí mismo en su propia lista:
+    medir con él tal cual infla el recall frente a una consulta nueva (el
+    texto de una PQRS que no está en la base). Dejándolo fuera de la
+    respuesta exacta y de la aproximada la medición se parece a la real.
+    """
+    exactos = []
+    for inicio in range(0, len(filas), 32):
+        bloque = filas[inicio:inicio + 32]
+        puntajes = matriz @ matriz[bloque].T
+        puntajes[bloque, np.arange(len(bloque))] = -np.inf
+        mejores = np.argpartition(-puntajes, k - 1, axis=0)[:k]
+        exactos.extend(set(ids[mejores[:, j]].tolist()) for j in range(len(bloque)))
+    return exactos
+
+
+class IndiceIVF:
+    """
+    Índice IVF (inverted file) en NumPy puro
+
+    Agrupa los vectores en `n_listas` con k-means esférico y en cada
+    búsqueda solo revisa las `n_sondeo` listas más cercanas a la consulta.
+    Más sondeo = más recall y más latencia.
+
+    Con `recall_objetivo` (por defecto 0.9), cada entrenamiento mide el
+    recall@10 contra la búsqueda exacta sobre una muestra del índice y
+    elige el menor n_sondeo que lo alcanza (ver recall_medido).
+
+    Cuando el índice crece 4x desde el último k-means se reentrena en un
+    hilo aparte sobre una copia congelada de las listas: agregar y buscar
+    siguen sobre las listas viejas, y el resultado se instala en la
+    primera llamada después de que termina, reaplicando los cambios
+    hechos mientras tanto.
+    """
+
+    tipo = 'ivf'
+
+    def __init__(self, dimension, n_sondeo=8, recall_objetivo=None, min_entrenamiento=1024,
+                 iteraciones_kmeans=10, en_segundo_plano=True):
+        self.dimension = dimension
+        self.n_sondeo = n_sondeo
+        self.recall_objetivo = recall_objetivo
+        self.recall_medido = None
+        self.min_entrenamiento = min_entrenamiento
+        self.iteraciones_kmeans = iteraciones_kmeans
+        self.en_segundo_plano = en_segundo_plano
+
+        self.centroides = None
+        self.listas = [_ListaInvertida(dimension)]
+        self.ubicacion = {}          # caso_id -> (lista, posición)
+        self.n_entrenado = 0
+
+        # Entrenamiento en segundo plano: hilo, cambios a reaplicar y resultado pendiente
+        self._hilo_entrenamiento = None
+        self._cambios = None
+        self._resultado = None
+
+    def __getstate__(self):
+        # Un entrenamiento en curso no se guarda: el índice cargado lo repite al crecer
+        estado = self.__dict__.copy()
+        estado.update(_hilo_entrenamiento=None, _cambios=None, _resultado=None)
+        return estado
+
+    def __setstate__(self, estado):
+        estado.setdefault('recall_objetivo', None)
+        estado.setdefault('recall_medido', None)
+        estado.setdefault('en_segundo_plano', True)
+        estado.setdefault('_hilo_entrenamiento', None)
+        estado.setdefault('_cambios', None)
+        estado.setdefault('_resultado', None)
+        self.__dict__.update(estado)
+
+    def __len__(self):
+        return len(self.ubicacion)
+
+    def ids(self):
+        return set(self.ubicacion)
+
+    def _lista_mas_cercana(self, vector):
+        if self.centroides is None:
+            return 0
+        return int(np.argmax(self.centroides @ vector))
+
+    def agregar(self, caso_id, vector, entrenar=True):
+        """Agrega (o reemplaza) el vector de un caso"""
+        self._instalar_entrenamiento()
+        vector = np.asarray(vector, dtype=np.float32)
+        if caso_id in self.ubicacion:
+            self._quitar(caso_id)
+
+        lista = self._lista_mas_cercana(vector)
+        posicion = self.listas[lista].agregar(caso_id, vector)
+        self.ubicacion[caso_id] = (lista, posicion)
+        if self._cambios is not None:
+            self._cambios.append((caso_id, vector))
+
+        # Reentrenar cuando el índice crece mucho desde el último k-means
+        if entrenar and self.necesita_entrenar():
+            if self.en_segundo_plano:
+                self.entrenar_en_segundo_plano()
+            else:
+                self.entrenar()
+
+    def agregar_lote(self, ids, matriz):
+        """Agrega varios vectores y entrena una sola vez al final (si hace falta)"""
+        for caso_id, vector in zip(ids, matriz):
+            self.agregar(caso_id, vector, entrenar=False)
+        if self.necesita_entrenar():
+            self.entrenar()
+
+    def eliminar(self, caso_id):
+        self._instalar_entrenamiento()
+        if caso_id not in self.ubicacion:
+            return
+        self._quitar(caso_id)
+        if self._cambios is not None:
+            self._cambios.append((caso_id, None))
+
+    def _quitar(self, caso_id):
+        lista, posicion = self.ubicacion.pop(caso_id)
+        movido = self.listas[lista].quitar(posicion)
+        if movido is not None:
+            self.ubicacion[movido] = (lista, posicion)
+
+    def necesita_entrenar(self):
+        n = len(self.ubicacion)
+        return (self._cambios is None and n >= self.min_entrenamiento
+                and n >= 4 * max(self.n_entrenado, 1))
+
+    def entrenar(self):
+        """Recalcula los centroides con k-means esférico y redistribuye los vectores (bloqueante)"""
+        self.esperar_entrenamiento()
+        self._instalar_entrenamiento()
+        ids, bloques = self._congelar()
+        if ids:
+            self._instalar(self._calcular_entrenamiento(ids, bloques))
+
+    def entrenar_en_segundo_plano(self):
+        """Lanza el reentrenamiento en un hilo; el resultado se instala en la próxima llamada"""
+        ids, bloques = self._congelar()
+        if not ids:
+            return
+        self._cambios = []
+
+        def entrenar():
+            try:
+                self._resultado = self._calcular_entrenamiento(ids, bloques)
+            except Exception as e:
+                print(f"⚠️ No se pudo reentrenar el índice IVF: {e}")
+                self._resultado = False
+
+        self._hilo_entrenamiento = threading.Thread(target=entrenar, name='entrenamiento-ivf', daemon=True)
+        self._hilo_entrenamiento.start()
+
+    def esperar_entrenamiento(self):
+        """Espera el entrenamiento en segundo plano (si hay uno) y lo instala"""
+        if self._hilo_entrenamiento is not None:
+            self._hilo_entrenamiento.join()
+        self._instalar_entrenamiento()
+
+    def _congelar(self):
+        ids = []
+        bloques = []
+        for lista in self.listas:
+            ids_lista, vectores = lista.congelar()
+            ids.extend(ids_lista)
+            bloques.append(vectores)
+        return ids, bloques
+
+    def _instalar_entrenamiento(self):
+        """Si terminó un entrenamiento en segundo plano, lo instala y reaplica los cambios"""
+        if self._resultado is None:
+            return
+        resultado, cambios = self._resultado, self._cambios
+        self._resultado = self._cambios = self._hilo_entrenamiento = None
+        if resultado is False:
+            # Falló: se reintenta cuando vuelva a tocar
+            return
+
+        self._instalar(resultado)
+        for caso_id, vector in cambios:
+            if caso_id in self.ubicacion:
+                self._quitar(caso_id)
+            if vector is not None:
+                lista = self._lista_mas_cercana(vector)
+                self.ubicacion[caso_id] = (lista, self.listas[lista].agregar(caso_id, vector))
+
+    def _instalar(self, resultado):
+        self.centroides, self.listas, self.ubicacion, self.n_entrenado, n_sondeo, self.recall_medido = resultado
+        if n_sondeo is not None:
+            self.n_sondeo = n_sondeo
+
+    def _calcular_entrenamiento(self, ids, bloques):
+        """
+        k-means, listas nuevas y calibración del sondeo sobre una copia congelada
+
+        No toca el estado del índice: corre en el hilo de entrenamiento.
+
+        Returns:
+            (centroides, listas, ubicacion, n_entrenado, n_sondeo, recall_medido)
+        """
+        matriz = np.concatenate(bloques)
+        n = len(ids)
+
+        n_listas = max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        muestra = matriz[rng.choice(n, size=min(n, n_listas * 64), replace=False)]
+        centroides = muestra[rng.choice(len(muestra), size=min(n_listas, len(muestra)), replace=False)].copy()
+
+        for _ in range(self.iteraciones_kmeans):
+            # Suma de los miembros de cada centroide en una sola pasada
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, self._asignar(muestra, centroides), muestra)
+            normas = np.linalg.norm(sumas, axis=1, keepdims=True)
+            # Un centroide sin miembros se queda donde estaba
+            centroides = np.where(normas > 0, sumas / np.where(normas > 0, normas, 1.0), centroides)
+
+        # Listas nuevas: los vectores ordenados por lista, un bloque contiguo por lista
+        asignacion = self._asignar(matriz, centroides)
+        orden = np.argsort(asignacion, kind='stable')
+        cortes = np.searchsorted(asignacion[orden], np.arange(len(centroides) + 1))
+        ids = np.asarray(ids)
+        listas = []
+        ubicacion = {}
+        for numero in range(len(centroides)):
+            filas = orden[cortes[numero]:cortes[numero + 1]]
+            ids_lista = ids[filas].tolist()
+            listas.append(_ListaInvertida(self.dimension, ids_lista, matriz[filas]))
+            ubicacion.update((caso_id, (numero, posicion)) for posicion, caso_id in enumerate(ids_lista))
+
+        n_sondeo, recall = None, None
+        if self.recall_objetivo:
+            n_sondeo, recall = self._calibrar_sondeo(centroides, listas, ids, matriz, rng)
+        return centroides, listas, ubicacion, n, n_sondeo, recall
+
+    def _calibrar_sondeo(self, centroides, listas, ids, matriz, rng, k=10, consultas=200):
+        """
+        Menor n_sondeo (potencias de 2) cuyo recall@k alcanza recall_objetivo
+
+        Las consultas son vectores del índice que no cuentan como su propio
+        vecino (ver _vecinos_exactos).
+
+        Returns:
+            (n_sondeo, recall medido con ese n_sondeo)
+        """
+        k = min(k, len(ids) - 1)
+        if k < 1:
+            return None, None
+        filas = rng.choice(len(ids), size=min(consultas, len(ids)), replace=False)
+        exactos = _vecinos_exactos(ids, matriz, filas, k)
+
+        n_sondeo = 1
+        while True:
+            aciertos = 0
+            for fila, exacto in zip(filas, exactos):
+                encontrados = self._buscar_en(centroides, listas, matriz[fila], k + 1, n_sondeo)[0]
+                aciertos += len(exacto.intersection(c for c in encontrados if c != ids[fila]))
+            recall = aciertos / (k * len(filas))
+            if recall >= self.recall_objetivo or n_sondeo >= len(centroides):
+                return min(n_sondeo, len(centroides)), round(recall, 4)
+            n_sondeo *= 2
+
+    @staticmethod
+    def _asignar(matriz, centroides, bloque=8192):
+        asignacion = np.empty(len(matriz), dtype=np.int64)
+        for inicio in range(0, len(matriz), bloque):
+            asignacion[inicio:inicio + bloque] = np.argmax(matriz[inicio:inicio + bloque] @ centroides.T, axis=1)
+        return asignacion
+
+    def buscar(self, vector, k):
+        """Retorna (ids, similitudes) de los k vecinos aproximados, de mayor a menor"""
+        self._instalar_entrenamiento()
+        return self._buscar_en(self.centroides, self.listas, vector, k, self.n_sondeo)
+
+    @staticmethod
+    def _buscar_en(centroides, listas_ivf, vector, k, n_sondeo):
+        if centroides is None:
+            listas = [0]
+        else:
+            cercania = centroides @ vector
+            n_sondeo = min(n_sondeo, len(cercania))
+            listas = np.argpartition(-cercania, n_sondeo - 1)[:n_sondeo]
+
+        ids = []
+        puntajes = []
+        for numero in listas:
+            lista = listas_ivf[numero]
+            if lista.ids:
+                ids.extend(lista.ids)
+                puntajes.append(lista.vectores @ vector)
+
+        if not ids:
+            return [], np.empty(0, dtype=np.float32)
+
+        puntajes = np.concatenate(puntajes)
+        if k < len(puntajes):
+            mejores = np.argpartition(-puntajes, k - 1)[:k]
+        else:
+            mejores = np.arange(len(puntajes))
+        mejores = mejores[np.argsort(-puntajes[mejores], kind='stable')]
+        return [ids[i] for i in mejores], puntajes[mejores]
+
+    def congelar(self):
+        """
+        Copia que no cambia aunque el índice se siga modificando, para
+        guardarla sin lock: las listas comparten los vectores (copy-on-write,
+        ver _ListaInvertida), solo se copian los ids y la ubicación
+        """
+        self._instalar_entrenamiento()
+        copia = copy.copy(self)
+        copia.listas = [_ListaInvertida(self.dimension, *lista.congelar()) for lista in self.listas]
+        copia.ubicacion = dict(self.ubicacion)
+        copia._hilo_entrenamiento = copia._cambios = copia._resultado = None
+        return copia
+
+    def guardar(self, ruta):
+        self._instalar_entrenamiento()
+        with open(ruta, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def cargar(ruta):
+        with open(ruta, 'rb') as f:
+            return pickle.load(f)
+
+
+class IndiceHNSW:
+    """
+    Índice HNSW sobre hnswlib (dependencia opcional)
+
+    `ef` controla el recall de la búsqueda (más alto = más preciso y más lento).
+    Con `recall_objetivo`, la primera carga grande (agregar_lote sobre el
+    índice vacío) elige el menor ef cuyo recall@10 medido lo alcanza.
+    """
+
+    tipo = 'hnsw'
+
+    def __init__(self, dimension, ef=64, recall_objetivo=None, m=16, ef_construccion=200, capacidad=1024):
+        if not HNSWLIB_DISPONIBLE:
+            raise ImportError("hnswlib no instalado. Instala con: pip install hnswlib")
+        import hnswlib
+
+        self.dimension = dimension
+        self.ef = ef
+        self.recall_objetivo = recall_objetivo
+        self.recall_medido = None
+        self._ids = set()
+        self.indice = hnswlib.Index(space='ip', dim=dimension)
+        self.indice.init_index(max_elements=capacidad, M=m, ef_construction=ef_construccion, allow_replace_deleted=True)
+        self.indice.set_ef(ef)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def ids(self):
+        return set(self._ids)
+
+    def agregar(self, caso_id, vector):
+        self.agregar_lote([caso_id], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def agregar_lote(self, ids, matriz):
+        ids = list(ids)
+        if not ids:
+            return
+        for caso_id in ids:
+            if caso_id in self._ids:
+                self.eliminar(caso_id)
+
+        necesarios = self.indice.get_current_count() + len(ids)
+        if necesarios > self.indice.get_max_elements():
+            self.indice.resize_index(max(necesarios, self.indice.get_max_elements() * 2))
+
+        matriz = np.asarray(matriz, dtype=np.float32)
+        if not self._ids and self.recall_objetivo and len(ids) >= 1000:
+            # Índice nuevo: se calibra ef con una muestra que queda fuera del grafo
+            # hasta medir (un nodo del grafo llega a sus vecinos por sus propios enlaces)
+            rng = np.random.default_rng(0)
+            afuera = np.zeros(len(ids), dtype=bool)
+            afuera[rng.choice(len(ids), size=200, replace=False)] = True
+            ids = np.asarray(ids)
+            self.indice.add_items(matriz[~afuera], ids[~afuera], replace_deleted=True)
+            self.calibrar_ef(ids[~afuera], matriz[~afuera], matriz[afuera])
+            self.indice.add_items(matriz[afuera], ids[afuera], replace_deleted=True)
+            ids = ids.tolist()
+        else:
+            self.indice.add_items(matriz, ids, replace_deleted=True)
+        self._ids.update(ids)
+
+    def calibrar_ef(self, ids, matriz, consultas, k=10):
+        """
+        Menor ef (potencias de 2 desde 16) cuyo recall@k alcanza recall_objetivo
+
+        Args:
+            ids, matriz: Los vectores que ya están en el grafo
+            consultas: Vectores que NO están en el grafo
+        """
+        mejores = np.argpartition(-(matriz @ consultas.T), k - 1, axis=0)[:k]
+        exactos = [set(ids[mejores[:, j]].tolist()) for j in range(mejores.shape[1])]
+
+        ef = 16
+        while True:
+            self.indice.set_ef(ef)
+            etiquetas, _ = self.indice.knn_query(consultas, k=k)
+            recall = sum(len(exacto.intersection(fila.tolist())) for exacto, fila in zip(exactos, etiquetas))
+            recall /= k * len(consultas)
+            if recall >= self.recall_objetivo or ef >= 1024:
+                break
+            ef *= 2
+        self.ef, self.recall_medido = ef, round(recall, 4)
+        self.indice.set_ef(ef)
+
+    def esperar_entrenamiento(self):
+        """HNSW no se reentrena: nada que esperar"""
+
+    def eliminar(self, caso_id):
+        if caso_id in self._ids:
+            self.indice.mark_deleted(caso_id)
+            self._ids.discard(caso_id)
+
+    def buscar(self, vector, k):
+        k = min(k, len(self._ids))
+        if k == 0:
+            return [], np.empty(0, dtype=np.float32)
+        self.indice.set_ef(max(self.ef, k))
+        etiquetas, distancias = self.indice.knn_query(vector.reshape(1, -1), k=k)
+        # En el espacio 'ip' hnswlib retorna distancia = 1 - producto punto
+        return [int(e) for e in etiquetas[0]], (1.0 - distancias[0]).astype(np.float32)
+
+    def congelar(self):
+        """Copia para guardar sin lock (hnswlib no comparte el grafo: se copia entero, en C++)"""
+        import hnswlib
+        copia = copy.copy(self)
+        copia._ids = set(self._ids)
+        copia.indice = hnswlib.Index(self.indice)
+        copia.indice.set_ef(self.ef)
+        return copia
+
+    def guardar(self, ruta):
+        self.indice.save_index(ruta + '.bin')
+        with open(ruta, 'wb') as f:
+            pickle.dump({'dimension': self.dimension, 'ef': self.ef, 'ids': self._ids,
+                         'recall_objetivo': self.recall_objetivo, 'recall_medido': self.recall_medido}, f)
+
+    @staticmethod
+    def cargar(ruta):
+        import hnswlib
+        with open(ruta, 'rb') as f:
+            meta = pickle.load(f)
+        nuevo = IndiceHNSW.__new__(IndiceHNSW)
+        nuevo.dimension = meta['dimension']
+        nuevo.ef = meta['ef']
+        nuevo.recall_objetivo = meta.get('recall_objetivo')
+        nuevo.recall_medido = meta.get('recall_medido')
+        nuevo._ids = meta['ids']
+        nuevo.indice = hnswlib.Index(space='ip', dim=nuevo.dimension)
+        nuevo.indice.load_index(ruta + '.bin', allow_replace_deleted=True)
+        nuevo.indice.set_ef(nuevo.ef)
+        return nuevo
+
+
+TIPOS_INDICE = {
+    'ivf': IndiceIVF,
+    'hnsw': IndiceHNSW,
+}
+
+
+# Recall@10 que se busca cuando no se indica otro
+RECALL_POR_DEFECTO = 0.9
+
+
+def objetivo_recall(recall=None):
+    """Recall@10 objetivo que corresponde al parámetro `recall` de crear_indice (None si es fijo)"""
+    recall = RECALL_POR_DEFECTO if recall is None else recall
+    return recall if recall < 1 else None
+
+
+def crear_indice(tipo, dimension, recall=None):
+    """
+    Crea un índice ANN del tipo indicado
+
+    Args:
+        tipo: 'ivf' o 'hnsw'
+        dimension: Dimensión de los embeddings
+        recall: Menor que 1: recall@10 objetivo (el índice calibra n_sondeo
+            o ef midiéndolo contra la búsqueda exacta). 1 o más: valor fijo
+            de n_sondeo (IVF) o ef (HNSW), sin calibrar. None: RECALL_POR_DEFECTO
+    """
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"Tipo de índice desconocido: {tipo}")
+
+    recall = RECALL_POR_DEFECTO if recall is None else recall
+    objetivo = objetivo_recall(recall)
+    if tipo == 'ivf':
+        return IndiceIVF(dimension, n_sondeo=int(recall) if recall >= 1 else 8, recall_objetivo=objetivo)
+    return IndiceHNSW(dimension, ef=int(recall) if recall >= 1 else 64, recall_objetivo=objetivo)
+
+
+def cargar_indice(tipo, ruta):
+    """Carga un índice guardado, o None si no existe o está dañado"""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        return TIPOS_INDICE[tipo].cargar(ruta)
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar el índice ANN ({e})")
+        return None
@@ -0,0 +1,881 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  MANEJADORES DE LA API PQRS (independientes del framework)
+
+  La lógica de cada endpoint vive aquí y devuelve
+  (cuerpo, código HTTP, headers). La comparten:
+  - api_pqrs.py       → Flask (WSGI, gunicorn)
+  - api_pqrs_asgi.py  → Starlette (ASGI, uvicorn)
+
+  Así los dos servidores exponen exactamente el mismo contrato JSON.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+from extractor_valores import extraer, asignaciones_sql
+
+# Importar el sistema PQRS
+try:
+    from sistema_pqrs_v4_ia import SistemaPQRSIA, CAMPOS_CASOS
+    from validador_automatico import ValidadorAutomatico
+    SISTEMA_DISPONIBLE = True
+except ImportError as e:
+    print(f"⚠️ Error importando sistema: {e}")
+    SISTEMA_DISPONIBLE = False
+
+# Inicializar sistema
+sistema = None
+validador = None
+
+if SISTEMA_DISPONIBLE:
+    try:
+        # El modelo carga en segundo plano: el servidor abre el puerto de inmediato.
+        # Con gunicorn (PQRS_PREFORK, ver gunicorn.conf.py) carga en el master y los
+        # workers lo heredan en el fork; sin gunicorn los embeddings se calculan en un
+        # proceso aparte que agrupa las consultas concurrentes.
+        prefork = os.environ.get('PQRS_PREFORK') == '1'
+        sistema = SistemaPQRSIA(
+            cargar_en_segundo_plano=True,
+            servicio_embeddings=not prefork and os.environ.get('PQRS_SERVICIO_EMBEDDINGS', '1') == '1'
+        )
+        validador = ValidadorAutomatico(sistema)
+        if prefork:
+            modo = "modelo cargando en el master de gunicorn; los workers se reemplazan al terminar"
+        elif sistema.usar_servicio_embeddings:
+            modo = "modelo cargando en segundo plano en el proceso de embeddings"
+        else:
+            modo = "modelo cargando en segundo plano en este proceso"
+        print(f"✅ Sistema PQRS inicializado ({modo})")
+    except Exception as e:
+        print(f"❌ Error inicializando sistema: {e}")
+
+
+def sistema_no_disponible():
+    return {
+        "success": False,
+        "error": "Sistema no disponible"
+    }, 503, {}
+
+
+def respuesta_modelo_no_listo():
+    """503 para endpoints que necesitan embeddings mientras el modelo carga (o si falló)"""
+    if sistema.estado == 'error':
+        return {
+            "success": False,
+            "estado": "error",
+            "error": f"El modelo no se pudo cargar: {sistema.error_carga}"
+        }, 503, {}
+    return {
+        "success": False,
+        "estado": "loading",
+        "error": "El modelo de IA se está cargando, intenta de nuevo en unos segundos"
+    }, 503, {'Retry-After': '5'}
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 1: RESOLVER PQRS
+# ═══════════════════════════════════════════════════════════════
+
+def resolver_pqrs(data):
+    """
+    Busca una solución para un problema PQRS
+    
+    Body:
+    {
+        "problema": "Para el crédito 123 cambiar estado a 77",
+        "incluir_validacion": true,  // opcional
+        "ejecutar_automatico": false,  // opcional
+        "categoria": "Estados"  // opcional: buscar solo en esa categoría
+    }
+    
+    Response:
+    {
+        "success": true,
+        "problema": "...",
+        "mejor_caso": {
+            "categoria": "Estados",
+            "problema_base": "...",
+            "sql": "UPDATE ...",
+            "respuesta": "...",
+            "similitud": 0.92
+        },
+        "validacion": { ... },  // si incluir_validacion=true
+        "otros_casos": [ ... ],
+        "busqueda": {"candidatos": 312, "candidatos_ms": 0.4, ...},  // tiempos por etapa
+        "timestamp": "2025-02-17T12:00:00"
+    }
+    """
+    try:
+        if not sistema:
+            return sistema_no_disponible()
+        
+        if sistema.estado != 'ready':
+            return respuesta_modelo_no_listo()
+        
+        if not data or 'problema' not in data:
+            return {
+                "success": False,
+                "error": "Falta el campo 'problema' en el body"
+            }, 400, {}
+        
+        problema = data['problema']
+        inicio = time.perf_counter()
+        
+        # Buscar solución
+        tiempos = {}
+        ranking = sistema.buscar_similar_ia(problema, top_k=4, tiempos=tiempos, categoria=data.get('categoria') or None)
+        
+        response = construir_respuesta_resolver(
+            problema, ranking,
+            data.get('incluir_validacion', False),
+            data.get('ejecutar_automatico', False)
+        )
+        if tiempos:
+            response["busqueda"] = tiempos
+        registrar_resolucion(response, (time.perf_counter() - inicio) * 1000)
+        return response, 200, {}
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, 500, {}
+
+
+def construir_respuesta_resolver(problema, ranking, incluir_validacion=False, ejecutar_automatico=False):
+    """Cuerpo de la respuesta de resolver-pqrs para un problema y su ranking (también por ítem en el lote)"""
+    if not ranking or len(ranking) == 0:
+        return {
+            "success": True,
+            "problema": problema,
+            "encontrado": False,
+            "mensaje": "No se encontraron casos similares",
+            "sugerencia": "Intenta con más detalles o agrega este caso al sistema",
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    mejor_caso = ranking[0]
+    
+    # Generar SQL con valores reemplazados
+    valores = sistema.extraer_valores(problema)
+    sql_generado = sistema.reemplazar_valores(mejor_caso['sql'], valores)
+    
+    # Construir respuesta
+    response = {
+        "success": True,
+        "problema": problema,
+        "encontrado": True,
+        "mejor_caso": {
+            "categoria": mejor_caso['categoria'],
+            "problema_base": mejor_caso['problema'],
+            "sql_original": mejor_caso['sql'],
+            "sql_generado": sql_generado,
+            "respuesta": mejor_caso['respuesta'],
+            "similitud": round(mejor_caso['similitud'] * 100, 2),
+            "confianza": "alta" if mejor_caso['similitud'] >= 0.85 else "media" if mejor_caso['similitud'] >= 0.60 else "baja"
+        },
+        "valores_extraidos": valores,
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    # Agregar otros casos similares
+    if len(ranking) > 1:
+        response["otros_casos"] = []
+        for caso in ranking[1:4]:
+            sql_caso = sistema.reemplazar_valores(caso['sql'], valores)
+            response["otros_casos"].append({
+                "categoria": caso['categoria'],
+                "problema": caso['problema'],
+                "sql": sql_caso,
+                "similitud": round(caso['similitud'] * 100, 2)
+            })
+    
+    # Incluir validación si se solicita
+    if incluir_validacion and validador:
+        tipo_operacion = detectar_tipo_operacion(problema, sql_generado)
+        datos_contexto = extraer_datos_contexto(problema, sql_generado, tipo_operacion)
+        
+        validacion = validador.validar_operacion_completa(
+            sql=sql_generado,
+            tipo_operacion=tipo_operacion,
+            datos_contexto=datos_contexto
+        )
+        
+        response["validacion"] = {
+            "puede_ejecutar": validacion["puede_ejecutar"],
+            "requiere_aprobacion": validacion["requiere_aprobacion"],
+            "nivel_aprobacion": validacion["nivel_aprobacion"],
+            "razon": validacion["razon_principal"],
+            "errores": validacion["errores"],
+            "advertencias": validacion["advertencias"]
+        }
+        
+        # Si se solicita ejecución automática
+        if ejecutar_automatico and validacion["puede_ejecutar"] and not validacion["requiere_aprobacion"]:
+            response["ejecutado"] = True
+            response["mensaje_ejecucion"] = "SQL ejecutado automáticamente (SIMULADO en esta versión)"
+        else:
+            response["ejecutado"] = False
+            if validacion["requiere_aprobacion"]:
+                response["mensaje_ejecucion"] = f"Requiere aprobación de {validacion['nivel_aprobacion']}"
+            elif not validacion["puede_ejecutar"]:
+                response["mensaje_ejecucion"] = "Operación bloqueada por seguridad"
+    
+    return response
+
+
+def registrar_resolucion(response, latencia_ms):
+    """Suma una respuesta de resolver-pqrs a las estadísticas medidas"""
+    validacion = None
+    if "validacion" in response:
+        validacion = {
+            "requiere_aprobacion": response["validacion"]["requiere_aprobacion"],
+            "ejecutado": response.get("ejecutado", False),
+            "bloqueado": not response["validacion"]["puede_ejecutar"],
+        }
+    sistema.registro_resoluciones.registrar(
+        encontrado=response.get("encontrado", False),
+        confianza=response.get("mejor_caso", {}).get("confianza"),
+        latencia_ms=latencia_ms,
+        validacion=validacion
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 1b: RESOLVER PQRS EN LOTE
+# ═══════════════════════════════════════════════════════════════
+
+MAX_LOTE_RESOLVER = int(os.environ.get('PQRS_MAX_LOTE_RESOLVER', 100))
+# Con Accept: application/x-ndjson los resultados salen por bloques y no se acumulan
+MAX_LOTE_RESOLVER_NDJSON = int(os.environ.get('PQRS_MAX_LOTE_RESOLVER_NDJSON', 5000))
+BLOQUE_NDJSON = int(os.environ.get('PQRS_BLOQUE_NDJSON', 32))
+
+
+def resolver_pqrs_lote(data, ndjson=False):
+    """
+    Resuelve varios problemas PQRS en una sola llamada (p. ej. un buzón completo)
+    
+    Los problemas se codifican en una sola pasada del modelo y se puntúan
+    contra todos los casos en un solo producto matriz-matriz. Un ítem
+    inválido o que falla no afecta a los demás.
+    
+    Body:
+    {
+        "problemas": [
+            "Para el crédito 123 cambiar estado a 77",
+            {"problema": "Eliminar comisión duplicada", "incluir_validacion": false}
+        ],
+        "incluir_validacion": true,  // opcional, default de todos los ítems
+        "ejecutar_automatico": false  // opcional, default de todos los ítems
+    }
+    
+    Response:
+    {
+        "success": true,
+        "total": 2,
+        "exitosos": 2,
+        "fallidos": 0,
+        "resultados": [
+            {"indice": 0, ...mismo cuerpo que /api/resolver-pqrs...},
+            {"indice": 1, "success": false, "error": "..."}
+        ],
+        "timestamp": "..."
+    }
+    
+    Con ndjson=True (Accept: application/x-ndjson) el cuerpo es un
+    generador con un resultado por línea, en orden, que se resuelve por
+    bloques de PQRS_BLOQUE_NDJSON problemas a medida que se envía.
+    """
+    try:
+        if not sistema:
+            return sistema_no_disponible()
+        
+        if sistema.estado != 'ready':
+            return respuesta_modelo_no_listo()
+        
+        if not data or not isinstance(data.get('problemas'), list):
+            return {
+                "success": False,
+                "error": "Falta el campo 'problemas' (lista) en el body"
+            }, 400, {}
+        
+        items = data['problemas']
+        maximo = MAX_LOTE_RESOLVER_NDJSON if ndjson else MAX_LOTE_RESOLVER
+        if len(items) > maximo:
+            return {
+                "success": False,
+                "error": f"El lote tiene {len(items)} problemas; el máximo es {maximo}"
+            }, 413, {}
+        
+        if ndjson:
+            return lineas_ndjson(resolver_items_lote(items, data, BLOQUE_NDJSON)), 200, {}
+        
+        resultados = list(resolver_items_lote(items, data, max(len(items), 1)))
+        exitosos = sum(1 for resultado in resultados if resultado["success"])
+        return {
+            "success": True,
+            "total": len(resultados),
+            "exitosos": exitosos,
+            "fallidos": len(resultados) - exitosos,
+            "resultados": resultados,
+            "timestamp": datetime.now().isoformat()
+        }, 200, {}
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, 500, {}
+
+
+def resolver_items_lote(items, opciones, tamano_bloque):
+    """
+    Genera el resultado de cada ítem del lote, en orden
+    
+    Cada bloque de tamano_bloque ítems se busca con una sola llamada a
+    buscar_similar_ia_lote; si esa llamada falla, el bloque se reintenta
+    ítem por ítem para aislar el error.
+    """
+    for inicio in range(0, len(items), tamano_bloque):
+        # Normalizar ítems: texto suelto u objeto con sus propias opciones
+        bloque = []
+        for i, item in enumerate(items[inicio:inicio + tamano_bloque], inicio):
+            if isinstance(item, str):
+                item = {"problema": item}
+            if not isinstance(item, dict) or not isinstance(item.get('problema'), str) or not item['problema'].strip():
+                item = None
+            bloque.append((i, item))
+        
+        validos = [item for _, item in bloque if item is not None]
+        inicio_busqueda = time.perf_counter()
+        try:
+            rankings = iter(sistema.buscar_similar_ia_lote([item['problema'] for item in validos], top_k=4))
+        except Exception:
+            rankings = None
+        # La búsqueda del bloque se reparte entre sus ítems para el histograma de latencia
+        latencia_busqueda = (time.perf_counter() - inicio_busqueda) * 1000 / max(len(validos), 1) if rankings is not None else 0.0
+        
+        for i, item in bloque:
+            if item is None:
+                yield {"indice": i, "success": False, "error": "Falta el campo 'problema' (texto) en el ítem"}
+                continue
+            try:
+                inicio = time.perf_counter()
+                ranking = next(rankings) if rankings is not None else sistema.buscar_similar_ia(item['problema'], top_k=4)
+                resultado = construir_respuesta_resolver(
+                    item['problema'], ranking,
+                    item.get('incluir_validacion', opciones.get('incluir_validacion', False)),
+                    item.get('ejecutar_automatico', opciones.get('ejecutar_automatico', False))
+                )
+                registrar_resolucion(resultado, latencia_busqueda + (time.perf_counter() - inicio) * 1000)
+            except Exception as e:
+                resultado = {"success": False, "error": str(e)}
+            yield {"indice": i, **resultado}
+
+
+# ═══════════════════════════════════════════════════════════════
+# RESPUESTAS NDJSON (streaming)
+# ═══════════════════════════════════════════════════════════════
+
+TIPO_NDJSON = 'application/x-ndjson'
+
+
+def quiere_ndjson(accept):
+    """True si el header Accept pide NDJSON (una línea JSON por elemento)"""
+    return TIPO_NDJSON in (accept or '')
+
+
+def lineas_ndjson(elementos):
+    """
+    Serializa un generador de diccionarios a líneas NDJSON
+    
+    Si algo falla a mitad del stream (el código HTTP ya se envió), la
+    última línea es {"success": false, "error": ...}.
+    """
+    try:
+        for elemento in elementos:
+            yield json.dumps(elemento, ensure_ascii=False) + '\n'
+    except Exception as e:
+        yield json.dumps({"success": False, "error": str(e)}, ensure_ascii=False) + '\n'
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 2: VALIDAR SQL
+# ═══════════════════════════════════════════════════════════════
+
+def validar_sql(data):
+    """
+    Valida un SQL antes de ejecutarlo
+    
+    Body:
+    {
+        "sql": "UPDATE formatexceldlle SET Estado = 77 WHERE Credit = '123'",
+        "tipo_operacion": "cambio_estado",  // opcional
+        "datos_contexto": { ... }  // opcional
+    }
+    
+    Response:
+    {
+        "success": true,
+        "puede_ejecutar": true,
+        "requiere_aprobacion": false,
+        "nivel_aprobacion": "automatico",
+        "razon": "...",
+        ...
+    }
+    """
+    try:
+        if not validador:
+            return {
+                "success": False,
+                "error": "Validador no disponible"
+            }, 503, {}
+        
+        if not data or 'sql' not in data:
+            return {
+                "success": False,
+                "error": "Falta el campo 'sql' en el body"
+            }, 400, {}
+        
+        sql = data['sql']
+        tipo_operacion = data.get('tipo_operacion', 'operacion_general')
+        datos_contexto = data.get('datos_contexto', {})
+        
+        # Validar
+        validacion = validador.validar_operacion_completa(
+            sql=sql,
+            tipo_operacion=tipo_operacion,
+            datos_contexto=datos_contexto
+        )
+        
+        return {
+            "success": True,
+            "sql": sql,
+            "puede_ejecutar": validacion["puede_ejecutar"],
+            "requiere_aprobacion": validacion["requiere_aprobacion"],
+            "nivel_aprobacion": validacion["nivel_aprobacion"],
+            "razon": validacion["razon_principal"],
+            "errores": validacion["errores"],
+            "advertencias": validacion["advertencias"],
+            "validaciones": validacion["validaciones"],
+            "timestamp": datetime.now().isoformat()
+        }, 200, {}
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }, 500, {}
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 3: ENSEÑAR CASO
+# ═══════════════════════════════════════════════════════════════
+
+def ensenar_caso(data):
+    """
+    Agrega un caso nuevo al sistema
+    
+    Body:
+    {
+        "categoria": "Estados",
+        "problema": "Para el crédito [CREDITO] cambiar estado a 77",
+        "sql": "UPDATE formatexceldlle SET Estado = 77 WHERE Credit = '[CREDITO]'",
+        "respuesta": "Estado actualizado correctamente"
+    }
+    
+    Response:
+    {
+        "success": true,
+        "mensaje": "Caso agregado exitosamente",
+        "caso_id": 28
+    }
+    """
+    try:
+        if not sistema:
+            return sistema_no_disponible()
+        
+        if sistema.estado != 'ready':
+            return respuesta_modelo_no_listo()
+        
+        # Validar campos requeridos
+        campos_requeridos = ['categoria', 'problema', 'sql', 'respuesta']
+        for campo in campos_requeridos:
+            if campo not in data:
+                return {
+                    "success": False,
+                    "error": f"Falta el campo '{campo}' en el body"
+                }, 400, {}
+        
+        # Agregar caso
+        caso_id = sistema.agregar_caso(
+            categoria=data['categoria'],
+            problema=data['problema'],
+            sql=data['sql'],
+            respuesta=data['respuesta']
+        )
+        
+        return {
+            "success": True,
+            "mensaje": "Caso agregado exitosamente",
+            "caso_id": caso_id,
+            "categoria": data['categoria'],
+            "timestamp": datetime.now().isoformat()
+        }, 200, {}
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }, 500, {}
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 4: LISTAR CASOS
+# ═══════════════════════════════════════════════════════════════
+
+CAMPOS_LISTADO = ('id', 'categoria', 'problema', 'sql', 'respuesta')
+MAX_LIMIT_CASOS = int(os.environ.get('PQRS_MAX_LIMIT_CASOS', 1000))
+
+
+def listar_casos(parametros, ndjson=False):
+    """
+    Lista los casos del sistema, paginados por id (keyset)
+    
+    Filtro, orden y paginación se resuelven en SQLite: cada página cuesta
+    lo mismo aunque la tabla tenga millones de casos.
+    
+    Query params:
+    - categoria: filtrar por categoría
+    - limit: casos por página (default: 100, máximo PQRS_MAX_LIMIT_CASOS)
+    - after_id: devolver solo casos con id mayor a este (siguiente_after_id
+      de la página anterior)
+    - fields: columnas separadas por coma (default: id,categoria,problema,sql,respuesta)
+    
+    Response:
+    {
+        "success": true,
+        "total": 27,             // casos que cumplen el filtro (todas las páginas)
+        "devueltos": 10,
+        "casos": [ ... ],
+        "siguiente_after_id": 31  // null en la última página
+    }
+    
+    Con ndjson=True (Accept: application/x-ndjson) el cuerpo es un
+    generador con un caso por línea, leído de SQLite por bloques (sin
+    máximo para limit).
+    """
+    try:
+        if not sistema:
+            return sistema_no_disponible()
+        
+        # Obtener parámetros
+        categoria_filtro = parametros.get('categoria') or None
+        try:
+            limit = int(parametros.get('limit', 100))
+            after_id = int(parametros.get('after_id', 0))
+        except ValueError:
+            return {
+                "success": False,
+                "error": "'limit' y 'after_id' deben ser números enteros"
+            }, 400, {}
+        
+        campos = [campo.strip() for campo in parametros.get('fields', '').split(',') if campo.strip()] or list(CAMPOS_LISTADO)
+        campos = ['id'] + [campo for campo in campos if campo != 'id']
+        invalidos = [campo for campo in campos if campo not in CAMPOS_CASOS]
+        if invalidos:
+            return {
+                "success": False,
+                "error": f"Campos desconocidos en 'fields': {', '.join(invalidos)}",
+                "campos_disponibles": list(CAMPOS_CASOS)
+            }, 400, {}
+        
+        if ndjson:
+            return lineas_ndjson(iterar_casos_formateados(campos, categoria_filtro, after_id, max(limit, 0))), 200, {}
+        
+        limit = min(max(limit, 0), MAX_LIMIT_CASOS)
+        
+        # Una fila de más para saber si hay otra página
+        filas = sistema.consultar_casos(campos, categoria_filtro, after_id, limit + 1)
+        casos_formateados = [dict(zip(campos, fila)) for fila in filas[:limit]]
+        siguiente = casos_formateados[-1]['id'] if len(filas) > limit and casos_formateados else None
+        
+        response = {
+            "success": True,
+            "total": sistema.contar_casos(categoria_filtro),
+            "devueltos": len(casos_formateados),
+            "casos": casos_formateados,
+            "after_id": after_id,
+            "siguiente_after_id": siguiente,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        # Agrupar la página por categoría
+        if 'categoria' in campos:
+            categorias = {}
+            for caso in casos_formateados:
+                cat = caso['categoria']
+                categorias[cat] = categorias.get(cat, 0) + 1
+            response["categorias"] = categorias
+        
+        return response, 200, {}
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }, 500, {}
+
+
+def iterar_casos_formateados(campos, categoria_filtro, after_id, limit):
+    """Los mismos casos que listar_casos, uno a uno y sin cargar la tabla completa"""
+    for enviados, fila in enumerate(sistema.iterar_casos(campos, categoria_filtro, after_id)):
+        if enviados >= limit:
+            return
+        yield dict(zip(campos, fila))
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 5: ESTADÍSTICAS
+# ═══════════════════════════════════════════════════════════════
+
+def estadisticas():
+    """
+    Retorna estadísticas del sistema
+    
+    Los conteos de casos salen de contadores que mantienen triggers y las
+    cifras de resolución de contadores acumulados: el costo no depende
+    del tamaño de la base de datos. "proporcion" es el % del total de
+    resoluciones en esa banda (ver RegistroResoluciones.resumen).
+    
+    Response:
+    {
+        "success": true,
+        "total_casos": 27,
+        "casos_por_categoria": { ... },
+        "resoluciones": {
+            "total": 1200,
+            "por_confianza": {"alta": {"resoluciones": 900, "proporcion": 75.0}, ...},
+            "sin_resultado": {"resoluciones": 12, "proporcion": 1.0},
+            "latencia_ms": {"medidas": 1200, "promedio": 18.4, "p50": 12.1, "p90": 41.0, "p99": 180.5},
+            "validacion": {"validadas": 800, "ejecutadas_automaticamente": 310,
+                           "requieren_aprobacion": 470, "bloqueadas": 20}
+        },
+        ...
+    }
+    """
+    try:
+        if not sistema:
+            return sistema_no_disponible()
+        
+        categorias = sistema.casos_por_categoria()
+        
+        return {
+            "success": True,
+            "total_casos": sum(categorias.values()),
+            "casos_por_categoria": categorias,
+            "categorias_unicas": len(categorias),
+            "resoluciones": sistema.registro_resoluciones.resumen(),
+            "cache_consultas": sistema.cache_consultas.estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }, 200, {}
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }, 500, {}
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINT 6: HEALTH CHECK
+# ═══════════════════════════════════════════════════════════════
+
+def health():
+    """
+    Verifica que la API está funcionando
+    
+    Responde desde el primer segundo; "modelo" indica si los embeddings
+    ya están disponibles ("loading", "ready" o "error").
+    
+    Response:
+    {
+        "status": "ok",
+        "modelo": "ready",
+        "sistema_disponible": true,
+        "validador_disponible": true,
+        "timestamp": "..."
+    }
+    """
+    return {
+        "status": "ok",
+        "modelo": sistema.estado if sistema else "no_disponible",
+        "sistema_disponible": sistema is not None,
+        "validador_disponible": validador is not None,
+        "version": "1.0.0",
+        "timestamp": datetime.now().isoformat()
+    }, 200, {}
+
+
+# ═══════════════════════════════════════════════════════════════
+# FUNCIONES AUXILIARES
+# ═══════════════════════════════════════════════════════════════
+
+def detectar_tipo_operacion(problema: str, sql: str) -> str:
+    """Detecta el tipo de operación"""
+    p = problema.lower()
+    sql_upper = sql.upper()
+    
+    if "estado" in p and "SET ESTADOLIQUIDACION" in sql_upper:
+        return "cambio_estado"
+    elif "comision" in p or "comisión" in p:
+        return "cambio_comision"
+    elif "vendedor" in p and "USERID" in sql_upper:
+        return "actualizar_vendedor"
+    else:
+        return "operacion_general"
+
+
+def extraer_datos_contexto(problema: str, sql: str, tipo: str) -> dict:
+    """Extrae datos de contexto"""
+    contexto = {}
+    
+    # Extraer crédito (el mismo registro que ya usó extraer_valores: no se vuelve a escanear)
+    credito = extraer(problema).primero('credito')
+    if credito:
+        contexto["credit_number"] = credito
+    
+    # Según tipo
+    asignaciones = asignaciones_sql(sql)
+    if tipo == "cambio_estado":
+        estados = [a.valor for a in asignaciones if 'estadoliquidacion' in a.tipo.lower()[:-1]]
+        if estados:
+            contexto["estado_nuevo"] = int(estados[0])
+        contexto["estado_actual"] = 71  # Placeholder
+    
+    elif tipo == "cambio_comision":
+        valores = [a.valor for a in asignaciones if a.tipo.lower().endswith('valuecommission')]
+        if valores:
+            contexto["valor_nuevo"] = int(valores[0])
+        contexto["valor_actual"] = 250000  # Placeholder
+    
+    return contexto
+
+
+# ═══════════════════════════════════════════════════════════════
+# PÁGINA DE DOCUMENTACIÓN
+# ═══════════════════════════════════════════════════════════════
+
+PAGINA_DOCUMENTACION = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>API PQRS IA</title>
+        <style>
+            body { font-family: Arial; max-width: 1000px; margin: 50px auto; padding: 20px; background: #0f172a; color: #f1f5f9; }
+            h1 { color: #6366f1; }
+            h2 { color: #ec4899; border-bottom: 2px solid #334155; padding-bottom: 10px; }
+            .endpoint { background: #1e293b; padding: 15px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #6366f1; }
+            .method { color: #10b981; font-weight: bold; }
+            code { background: #334155; padding: 2px 6px; border-radius: 4px; color: #a9b1d6; }
+            pre { background: #1a1b26; padding: 15px; border-radius: 8px; overflow-x: auto; }
+            a { color: #6366f1; text-decoration: none; }
+            a:hover { text-decoration: underline; }
+        </style>
+    </head>
+    <body>
+        <h1>🤖 API REST - Sistema PQRS IA</h1>
+        <p>Documentación de endpoints disponibles</p>
+        
+        <div class="endpoint">
+            <h3><span class="method">GET</span> /api/health</h3>
+            <p>Verifica que la API está funcionando</p>
+            <pre>curl http://localhost:5000/api/health</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h3><span class="method">POST</span> /api/resolver-pqrs</h3>
+            <p>Busca una solución para un problema PQRS</p>
+            <pre>curl -X POST http://localhost:5000/api/resolver-pqrs \\
+  -H "Content-Type: application/json" \\
+  -d '{
+    "problema": "Para el crédito 5800325002956151 cambiar estado a 77",
+    "incluir_validacion": true
+  }'</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h3><span class="method">POST</span> /api/resolver-pqrs/batch</h3>
+            <p>Resuelve varios problemas en una sola llamada (máximo configurable con PQRS_MAX_LOTE_RESOLVER)</p>
+            <pre>curl -X POST http://localhost:5000/api/resolver-pqrs/batch \\
+  -H "Content-Type: application/json" \\
+  -d '{
+    "problemas": ["Para el crédito 5800325002956151 cambiar estado a 77", "Eliminar comisión duplicada"],
+    "incluir_validacion": true
+  }'</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h3><span class="method">POST</span> /api/validar-sql</h3>
+            <p>Valida un SQL antes de ejecutarlo</p>
+            <pre>curl -X POST http://localhost:5000/api/validar-sql \\
+  -H "Content-Type: application/json" \\
+  -d '{
+    "sql": "UPDATE formatexceldlle SET Estado = 77 WHERE Credit = '123'"
+  }'</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h3><span class="method">POST</span> /api/ensenar-caso</h3>
+            <p>Agrega un caso nuevo al sistema</p>
+            <pre>curl -X POST http://localhost:5000/api/ensenar-caso \\
+  -H "Content-Type: application/json" \\
+  -d '{
+    "categoria": "Estados",
+    "problema": "Cambiar estado a 77",
+    "sql": "UPDATE ...",
+    "respuesta": "Estado actualizado"
+  }'</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h3><span class="method">GET</span> /api/casos</h3>
+            <p>Lista los casos del sistema (paginados con after_id, proyección con fields)</p>
+            <pre>curl "http://localhost:5000/api/casos?categoria=Estados&limit=10&fields=id,problema&after_id=0"</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h3><span class="method">GET</span> /api/estadisticas</h3>
+            <p>Retorna estadísticas del sistema</p>
+            <pre>curl http://localhost:5000/api/estadisticas</pre>
+        </div>
+        
+        <h2>📚 Ejemplos de uso con n8n</h2>
+        <p>Configuración en n8n HTTP Request node:</p>
+        <ul>
+            <li><strong>Method:</strong> POST</li>
+            <li><strong>URL:</strong> http://tu-servidor:5000/api/resolver-pqrs</li>
+            <li><strong>Body Type:</strong> JSON</li>
+            <li><strong>Body:</strong> { "problema": "{{$json.email_body}}", "incluir_validacion": true }</li>
+        </ul>
+        
+        <h2>🔗 Recursos</h2>
+        <ul>
+            <li><a href="/api/health">Health Check</a></li>
+            <li><a href="/api/estadisticas">Estadísticas</a></li>
+            <li><a href="/api/casos?limit=5">Últimos 5 casos</a></li>
+        </ul>
+        
+        <hr>
+        <p style="text-align: center; color: #64748b;">API PQRS v1.0 | Desarrollado por Daner Mosquera</p>
+    </body>
+    </html>
+    """
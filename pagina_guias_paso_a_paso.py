@@ -4,7 +4,7 @@ Página de Guías Paso a Paso - Interactiva
 
 import streamlit as st
 from guia_paso_a_paso import GuiaPasoAPaso, detectar_tipo_problema
-import re
+from extractor_valores import extraer
 from typing import Dict
 import pandas as pd
 
@@ -292,30 +292,28 @@ def mostrar_historial_guias():
 def extraer_contexto_problema(problema: str) -> Dict:
     """Extrae información relevante del problema"""
     contexto = {}
+    valores = extraer(problema)
+    numeros = valores.numeros()
     
     # Buscar número de crédito
-    creditos = re.findall(r'\b\d{13,16}\b', problema)
+    creditos = [n for n in numeros if 13 <= len(n) <= 16]
     if creditos:
         contexto['credito'] = creditos[0]
     
     # Buscar valores (montos)
-    valores = re.findall(r'\$?(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)', problema)
-    if valores:
-        valor = valores[0].replace(',', '').replace('.', '')
-        contexto['valor'] = valor
+    montos = [monto for monto in valores.montos() if monto]
+    if montos:
+        contexto['valor'] = montos[0]
     
     # Buscar estados
-    estados = re.findall(r'\b(7[0-9])\b', problema)
+    estados = [n for n in numeros if len(n) == 2 and n.startswith('7')]
     if estados:
         contexto['estado'] = estados[0]
     
     # Buscar cédulas
-    cedulas = re.findall(r'\b\d{8,11}\b', problema)
+    cedulas = [n for n in numeros if 8 <= len(n) <= 11]
     if cedulas:
-        for cedula in cedulas:
-            if len(cedula) < 13:
-                contexto['cedula'] = cedula
-                break
+        contexto['cedula'] = cedulas[0]
     
     return contexto
 
@@ -4,7 +4,7 @@ Página de Resolución de PQRS con Validación Automática - SIN HEADERS DUPLICA
 
 import streamlit as st
 from validador_automatico import ValidadorAutomatico
-import re
+from extractor_valores import extraer, asignaciones_sql
 
 
 def mostrar_pagina_resolver_con_validacion():
@@ -61,7 +61,7 @@ def mostrar_formulario_resolucion():
     if buscar and problema and st.session_state.sistema:
         with st.spinner("🤖 Analizando y validando..."):
             # PASO 1: Buscar solución
-            ranking = st.session_state.sistema.buscar_similar_ia(problema)
+            ranking = st.session_state.sistema.buscar_similar_ia(problema, top_k=1)
             
             if not ranking or len(ranking) == 0:
                 st.warning("No se encontró solución similar.")
@@ -261,22 +261,23 @@ def extraer_datos_contexto(problema: str, sql: str, tipo: str) -> dict:
     """Extrae datos de contexto"""
     contexto = {}
     
-    # Extraer crédito
-    creditos = re.findall(r'\d{13,16}', problema)
-    if creditos:
-        contexto["credit_number"] = creditos[0]
+    # Extraer crédito (el mismo registro que ya usó extraer_valores: no se vuelve a escanear)
+    credito = extraer(problema).primero('credito')
+    if credito:
+        contexto["credit_number"] = credito
     
     # Según tipo
+    asignaciones = asignaciones_sql(sql)
     if tipo == "cambio_estado":
-        matches = re.findall(r'EstadoLiquidacion\w+\s*=\s*(\d+)', sql, re.IGNORECASE)
-        if matches:
-            contexto["estado_nuevo"] = int(matches[0])
+        estados = [a.valor for a in asignaciones if 'estadoliquidacion' in a.tipo.lower()[:-1]]
+        if estados:
+            contexto["estado_nuevo"] = int(estados[0])
         contexto["estado_actual"] = 71  # Placeholder
     
     elif tipo == "cambio_comision":
-        matches = re.findall(r'ValueCommission\s*=\s*(\d+)', sql, re.IGNORECASE)
-        if matches:
-            contexto["valor_nuevo"] = int(matches[0])
+        valores = [a.valor for a in asignaciones if a.tipo.lower().endswith('valuecommission')]
+        if valores:
+            contexto["valor_nuevo"] = int(valores[0])
         contexto["valor_actual"] = 250000  # Placeholder
     
     return contexto
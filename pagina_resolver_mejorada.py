@@ -40,7 +40,7 @@ def mostrar_pagina_resolver_mejorada():
 
     if buscar and problema:
         with st.spinner("🤖 Analizando tu consulta..."):
-            ranking = st.session_state.sistema.buscar_similar_ia(problema)
+            ranking = st.session_state.sistema.buscar_similar_ia(problema, top_k=5)
 
         if not ranking or len(ranking) == 0:
             _mostrar_sin_resultados(problema)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  POOL DE CONEXIONES SQLITE - Sistema PQRS
+
+  - WAL: los lectores no esperan a los escritores (ni al revés)
+  - busy_timeout: si otro proceso tiene el lock de escritura, se
+    espera en vez de fallar con "database is locked"
+  - Una conexión de lectura por hilo (query_only): las búsquedas de
+    los hilos de Flask / Streamlit no comparten cursores
+  - Un solo escritor: las escrituras de todos los hilos pasan por una
+    cola y las ejecuta un hilo dedicado, cada una en su transacción
+
+  Uso:
+      pool = PoolSQLite('pqrs_sistema.db')
+      filas = pool.lectura().execute('SELECT ...').fetchall()
+      caso_id = pool.escribir(lambda conn: conn.execute('INSERT ...').lastrowid)
+═══════════════════════════════════════════════════════════════════
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+
+class PoolSQLite:
+    """Lectores por hilo + un escritor serializado sobre una base SQLite en modo WAL"""
+
+    def __init__(self, ruta, busy_timeout_ms=5000):
+        self.ruta = ruta
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+        # WAL queda grabado en el archivo: basta con activarlo una vez
+        conn = self._abrir()
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.close()
+
+    def _reiniciar(self):
+        self._local = threading.local()
+        self._lectores = []
+        self._cola = queue.Queue()
+        self._escritor = None
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.ruta, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        # Con WAL, NORMAL no pierde consistencia ante un corte (solo la última transacción)
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def lectura(self):
+        """Conexión de solo lectura del hilo actual (se crea la primera vez)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._abrir()
+            conn.execute('PRAGMA query_only = ON')
+            # Autocommit: sin BEGIN implícito que deje fija una instantánea vieja de la base
+            conn.isolation_level = None
+            self._local.conn = conn
+            with self._lock:
+                # El servidor de desarrollo de Flask crea un hilo por request:
+                # cerrar las conexiones de los hilos que ya terminaron
+                vivos = []
+                for hilo, lector in self._lectores:
+                    if hilo.is_alive():
+                        vivos.append((hilo, lector))
+                    else:
+                        lector.close()
+                vivos.append((threading.current_thread(), conn))
+                self._lectores = vivos
+        return conn
+
+    def escribir(self, funcion, *args):
+        """
+        Ejecuta funcion(conn, *args) en el hilo escritor, dentro de una transacción
+
+        Bloquea al hilo que llama hasta que la escritura termina (o falla:
+        la excepción se relanza aquí y la transacción se revierte), pero no
+        a los lectores de los demás hilos.
+
+        Returns:
+            Lo que retorne la función
+        """
+        if threading.current_thread() is self._escritor:
+            # Escritura anidada desde el propio escritor: ya hay transacción abierta
+            return funcion(self._local.conn_escritura, *args)
+
+        with self._lock:
+            if self._escritor is None:
+                self._escritor = threading.Thread(target=self._atender_escrituras, name='pqrs-sqlite-escritor',
+                                                  daemon=True)
+                self._escritor.start()
+
+        futuro = Future()
+        self._cola.put((funcion, args, futuro))
+        return futuro.result()
+
+    def _atender_escrituras(self):
+        conn = self._abrir()
+        self._local.conn_escritura = conn
+        while True:
+            tarea = self._cola.get()
+            if tarea is None:
+                break
+            funcion, args, futuro = tarea
+            try:
+                with conn:
+                    resultado = funcion(conn, *args)
+                futuro.set_result(resultado)
+            except BaseException as e:
+                futuro.set_exception(e)
+        conn.close()
+
+    def cerrar(self):
+        """Detiene el escritor (después de vaciar la cola) y cierra todas las conexiones"""
+        with self._lock:
+            escritor, self._escritor = self._escritor, None
+            lectores, self._lectores = self._lectores, []
+        if escritor is not None:
+            self._cola.put(None)
+            escritor.join()
+        for _, conn in lectores:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+
+    def abierto(self):
+        """True si hay hilo escritor o conexiones de lectura (se abren solas al volver a usar el pool)"""
+        with self._lock:
+            return self._escritor is not None or bool(self._lectores)
+
+    def tras_fork(self):
+        """
+        En el proceso hijo: conexiones e hilo escritor nuevos
+
+        Las conexiones heredadas del padre no se usan ni se cierran (SQLite no
+        soporta compartirlas entre procesos); lo correcto es cerrar el pool
+        antes del fork.
+        """
+        self._lock = threading.Lock()
+        self._reiniciar()
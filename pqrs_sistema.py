@@ -12,6 +12,7 @@ import sqlite3
 import re
 from difflib import SequenceMatcher
 import os
+from extractor_valores import extraer
 
 class SistemaPQRS:
     
@@ -150,51 +151,46 @@ class SistemaPQRS:
         return ranking[0] if ranking else None
     
     def extraer_valores(self, texto):
-        """Extrae valores importantes del texto"""
+        """Extrae valores importantes del texto (una sola pasada, ver extractor_valores.py)"""
+        registro = extraer(texto)
         valores = {}
         
         # Créditos (13+ dígitos)
-        creditos = re.findall(r'\d{13,}', texto)
-        if creditos:
-            valores['credito'] = creditos[0]
-        
-        # IDs - Mejorado para detectar más formatos
-        ids = re.findall(r'(?:ID|id)\s*(?:de\s*)?(?:comisi[óo]n)?[:\s]*(\d+)', texto, re.IGNORECASE)
-        if not ids:
-            # Buscar "comisión 123456" o "comisionID 123456"
-            ids = re.findall(r'comisi[óo]n[:\s]+(\d{5,})', texto, re.IGNORECASE)
-        if ids:
-            valores['id'] = ids[0]
-        
-        # Cédulas/NITs - Mejorado
-        cedulas = re.findall(r'(?:C\.?C\.?|c\.?c\.?|NIT|nit|C[ÉE]DULA|cedula)[:\s]*(\d+)', texto, re.IGNORECASE)
-        if cedulas:
-            valores['cedula'] = cedulas[0]
+        credito = registro.primero('credito')
+        if credito:
+            valores['credito'] = credito
+        
+        # IDs - "ID 123", "ID de comisión 123"; si no hay, "comisión 123456"
+        id_valor = registro.primero('id', 'id_comision') or registro.primero('comision')
+        if id_valor:
+            valores['id'] = id_valor
+        
+        # Cédulas/NITs
+        cedula = registro.primero('cedula')
+        if cedula:
+            valores['cedula'] = cedula
         
         # Documentos (para casos de cambio de documento)
-        documentos = re.findall(r'documento[:\s]+(\d+)', texto, re.IGNORECASE)
+        documentos = registro.todos('documento')
         if documentos:
             valores['documento_origen'] = documentos[0]
             if len(documentos) > 1:
                 valores['documento_destino'] = documentos[1]
         
         # Valores monetarios
-        montos = re.findall(r'\$\s*([\d,.]+)', texto)
+        montos = registro.montos()
         if montos:
-            # Limpiar y convertir
-            valores['montos'] = [m.replace(',', '').replace('.', '') for m in montos]
+            valores['montos'] = montos
         
-        # Fechas
-        fechas = re.findall(r'\d{1,2}[-/]\w{3}[-/]\d{2,4}', texto)
-        if not fechas:
-            fechas = re.findall(r'\d{2}/\d{2}/\d{4}', texto)
-        if fechas:
-            valores['fecha'] = fechas[0]
+        # Fechas (13-ene-2026 antes que 13/01/2026)
+        fecha = registro.primero('fecha') or registro.primero('fecha_numerica')
+        if fecha:
+            valores['fecha'] = fecha
         
         # Números de factura
-        facturas = re.findall(r'(?:FACTURA|FAC|factura)[:\s]*(\w+)', texto, re.IGNORECASE)
-        if facturas:
-            valores['factura'] = facturas[0]
+        factura = registro.primero('factura')
+        if factura:
+            valores['factura'] = factura
         
         return valores
     
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  REGISTRO DE RESOLUCIONES - Sistema PQRS
+
+  Cifras medidas de /api/resolver-pqrs para /api/estadisticas:
+  - resoluciones por banda de confianza (alta / media / baja) y sin resultado
+  - histograma de latencia (percentiles estimados por interpolación)
+  - validadas, ejecutadas automáticamente, que requieren aprobación y bloqueadas
+
+  Todo son contadores en la tabla estadisticas_resoluciones
+  (clave, valor): leer el resumen cuesta lo mismo con 100 que con
+  10 millones de resoluciones. Cada proceso acumula en memoria y suma
+  sus deltas a la tabla cada `intervalo` segundos (UPSERT aditivo, así
+  varios workers de gunicorn comparten los mismos totales).
+═══════════════════════════════════════════════════════════════════
+"""
+
+import atexit
+import threading
+
+BANDAS_CONFIANZA = ('alta', 'media', 'baja')
+
+# Límites superiores (ms) de los baldes del histograma de latencia; el último balde es "más de 10 s"
+LIMITES_LATENCIA_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _clave_balde(indice):
+    return f'latencia_le_{LIMITES_LATENCIA_MS[indice]}' if indice < len(LIMITES_LATENCIA_MS) else 'latencia_mayor'
+
+
+class RegistroResoluciones:
+    """Contadores de resoluciones acumulados en memoria y volcados a SQLite"""
+
+    def __init__(self, obtener_pool, intervalo=5.0):
+        """
+        Args:
+            obtener_pool: Función que retorna el PoolSQLite del sistema
+                (se crea al inicializar, después de este registro)
+            intervalo: Segundos entre volcados de los contadores a la tabla
+        """
+        self.obtener_pool = obtener_pool
+        self.intervalo = intervalo
+        self._deltas = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.volcar)
+
+    @staticmethod
+    def crear_tablas(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS estadisticas_resoluciones (
+                clave TEXT PRIMARY KEY,
+                valor REAL NOT NULL DEFAULT 0
+            )
+        ''')
+
+    def registrar(self, encontrado, confianza=None, latencia_ms=None, validacion=None):
+        """
+        Suma una resolución a los contadores
+
+        Args:
+            encontrado: Si hubo al menos un caso similar
+            confianza: Banda del mejor caso ('alta', 'media' o 'baja')
+            latencia_ms: Tiempo de la resolución
+            validacion: None si no se validó; si no, dict con
+                requiere_aprobacion, ejecutado y bloqueado (bool)
+        """
+        with self._lock:
+            self._sumar('resoluciones')
+            self._sumar(f'banda_{confianza}' if encontrado and confianza in BANDAS_CONFIANZA else 'sin_resultado')
+
+            if latencia_ms is not None:
+                indice = next((i for i, limite in enumerate(LIMITES_LATENCIA_MS) if latencia_ms <= limite),
+                              len(LIMITES_LATENCIA_MS))
+                self._sumar(_clave_balde(indice))
+                self._sumar('latencia_medidas')
+                self._sumar('latencia_suma_ms', latencia_ms)
+
+            if validacion is not None:
+                self._sumar('validadas')
+                for campo in ('requiere_aprobacion', 'ejecutado', 'bloqueado'):
+                    if validacion.get(campo):
+                        self._sumar(campo)
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self.volcar)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sumar(self, clave, valor=1):
+        self._deltas[clave] = self._deltas.get(clave, 0) + valor
+
+    def volcar(self):
+        """Suma los contadores acumulados a la tabla (una transacción)"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not deltas:
+            return
+
+        try:
+            self.obtener_pool().escribir(lambda conn: conn.executemany('''
+                INSERT INTO estadisticas_resoluciones (clave, valor) VALUES (?, ?)
+                ON CONFLICT(clave) DO UPDATE SET valor = valor + excluded.valor
+            ''', list(deltas.items())))
+        except Exception as e:
+            # No perder los contadores: se reintentan en el próximo volcado
+            with self._lock:
+                for clave, valor in deltas.items():
+                    self._sumar(clave, valor)
+            print(f"⚠️ No se pudieron guardar las estadísticas de resoluciones: {e}")
+
+    def tras_fork(self):
+        """En el worker: el timer del master no existe y sus deltas ya se volcaron"""
+        self._lock = threading.Lock()
+        self._deltas = {}
+        self._timer = None
+
+    def resumen(self):
+        """
+        Totales (tabla + lo que este proceso aún no volcó) listos para la API
+
+        "proporcion" es el porcentaje de todas las resoluciones que cayó en
+        esa banda (o sin resultado); las de por_confianza y sin_resultado
+        suman 100. No es una tasa de acierto por banda: una resolución solo
+        tiene banda cuando hubo coincidencia, así que esa tasa sería
+        siempre 100 %.
+        """
+        totales = dict(self.obtener_pool().lectura().execute(
+            'SELECT clave, valor FROM estadisticas_resoluciones').fetchall())
+        with self._lock:
+            for clave, valor in self._deltas.items():
+                totales[clave] = totales.get(clave, 0) + valor
+
+        total = int(totales.get('resoluciones', 0))
+
+        def proporcion(cantidad):
+            return round(cantidad / total * 100, 2) if total else 0.0
+
+        por_confianza = {}
+        for banda in BANDAS_CONFIANZA:
+            cantidad = int(totales.get(f'banda_{banda}', 0))
+            por_confianza[banda] = {"resoluciones": cantidad, "proporcion": proporcion(cantidad)}
+        sin_resultado = int(totales.get('sin_resultado', 0))
+
+        baldes = [totales.get(_clave_balde(i), 0) for i in range(len(LIMITES_LATENCIA_MS) + 1)]
+        medidas = totales.get('latencia_medidas', 0)
+
+        validadas = int(totales.get('validadas', 0))
+        return {
+            "total": total,
+            "por_confianza": por_confianza,
+            "sin_resultado": {"resoluciones": sin_resultado, "proporcion": proporcion(sin_resultado)},
+            "latencia_ms": {
+                "medidas": int(medidas),
+                "promedio": round(totales.get('latencia_suma_ms', 0) / medidas, 2) if medidas else None,
+                "p50": percentil_histograma(baldes, 0.50),
+                "p90": percentil_histograma(baldes, 0.90),
+                "p99": percentil_histograma(baldes, 0.99),
+            },
+            "validacion": {
+                "validadas": validadas,
+                "ejecutadas_automaticamente": int(totales.get('ejecutado', 0)),
+                "requieren_aprobacion": int(totales.get('requiere_aprobacion', 0)),
+                "bloqueadas": int(totales.get('bloqueado', 0)),
+            },
+        }
+
+
+def percentil_histograma(baldes, q):
+    """
+    Percentil estimado de un histograma de latencia (ms)
+
+    Interpola linealmente dentro del balde donde cae el percentil; si cae
+    en el último balde (más de 10 s) retorna el límite inferior de ese balde.
+    """
+    total = sum(baldes)
+    if not total:
+        return None
+
+    objetivo = q * total
+    acumulado = 0
+    for i, cantidad in enumerate(baldes):
+        if cantidad and acumulado + cantidad >= objetivo:
+            if i >= len(LIMITES_LATENCIA_MS):
+                return float(LIMITES_LATENCIA_MS[-1])
+            inferior = LIMITES_LATENCIA_MS[i - 1] if i else 0
+            superior = LIMITES_LATENCIA_MS[i]
+            return round(inferior + (superior - inferior) * (objetivo - acumulado) / cantidad, 2)
+        acumulado += cantidad
+    return float(LIMITES_LATENCIA_MS[-1])
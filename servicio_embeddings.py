@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  SERVICIO DE EMBEDDINGS - Sistema PQRS
+
+  Un proceso aparte es dueño del modelo y atiende las consultas de
+  todos los hilos de la API por un socket local:
+  - Las consultas que llegan dentro de una ventana corta (milisegundos)
+    se juntan en un solo encode por lotes
+  - Cada hilo espera solo su resultado (Future), con un límite: si el
+    proceso muere o no responde a tiempo, la consulta se codifica con
+    un modelo local en el proceso de la API
+
+  Así los hilos de Flask no compiten por el GIL ni por los hilos de
+  torch, y el rendimiento crece con el tamaño del lote.
+
+  El proceso se lanza con `python -m servicio_embeddings` (no con fork),
+  así no hereda el estado del proceso de la API.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import time
+import atexit
+import secrets
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+
+class ServicioEmbeddings:
+    """
+    Cliente del proceso de embeddings
+
+    Expone encode(textos, batch_size, convert_to_numpy) igual que los
+    codificadores, así reemplaza al modelo sin cambiar a quien lo usa.
+    """
+
+    def __init__(self, backend, nombre_modelo, directorio_onnx='modelo_onnx',
+                 ventana_ms=5, lote_maximo=64, timeout_arranque=300, timeout=30):
+        self.backend = backend
+        self.nombre_modelo = nombre_modelo
+        self.directorio_onnx = directorio_onnx
+        self.ventana_ms = ventana_ms
+        self.lote_maximo = lote_maximo
+        self.timeout = timeout              # segundos por consulta antes de usar el modelo local
+
+        self._pendientes = {}               # id de solicitud -> Future
+        self._ids = itertools.count()
+        self._lock_pendientes = threading.Lock()
+        self._lock_envio = threading.Lock()
+        self.vivo = False
+
+        # Modelo en este proceso, solo si el servicio falla (se carga la primera vez)
+        self._codificador_local = None
+        self._lock_local = threading.Lock()
+
+        # Socket local (AF_UNIX) con clave de autenticación de un solo uso
+        clave = secrets.token_bytes(16)
+        listener = Listener(family='AF_UNIX', authkey=clave)
+
+        carpeta = os.path.dirname(os.path.abspath(__file__))
+        entorno = dict(os.environ, PQRS_SERVICIO_CLAVE=clave.hex(),
+                       PYTHONPATH=os.pathsep.join(filter(None, [carpeta, os.environ.get('PYTHONPATH')])))
+        self.proceso = subprocess.Popen(
+            [sys.executable, '-m', 'servicio_embeddings', listener.address, backend, nombre_modelo,
+             directorio_onnx, str(ventana_ms), str(lote_maximo)],
+            env=entorno,
+        )
+
+        # Esperar la conexión del trabajador sin quedarse colgado si muere antes de conectar
+        conexiones = []
+        hilo_accept = threading.Thread(target=lambda: conexiones.append(listener.accept()), daemon=True)
+        hilo_accept.start()
+        limite = time.monotonic() + timeout_arranque
+        while hilo_accept.is_alive() and self.proceso.poll() is None and time.monotonic() < limite:
+            hilo_accept.join(0.1)
+        if not conexiones:
+            self.proceso.kill()
+            raise RuntimeError(f"El servicio de embeddings no arrancó (código {self.proceso.poll()})")
+        self.conexion = conexiones[0]
+        listener.close()
+
+        if not self.conexion.poll(timeout_arranque):
+            self.cerrar()
+            raise RuntimeError("El servicio de embeddings no respondió a tiempo")
+        estado, detalle = self.conexion.recv()
+        if estado != 'listo':
+            self.cerrar()
+            raise RuntimeError(f"El servicio de embeddings no pudo cargar el modelo: {detalle}")
+
+        self.dimension = detalle
+        self.vivo = True
+        self._hilo_respuestas = threading.Thread(target=self._recibir_respuestas,
+                                                 name='respuestas-embeddings', daemon=True)
+        self._hilo_respuestas.start()
+        atexit.register(self.cerrar)
+
+    def _recibir_respuestas(self):
+        """Entrega cada resultado al Future de quien lo pidió"""
+        try:
+            while True:
+                solicitud_id, resultado = self.conexion.recv()
+                with self._lock_pendientes:
+                    futuro = self._pendientes.pop(solicitud_id, None)
+                if futuro is None:
+                    continue
+                if isinstance(resultado, str):
+                    futuro.set_exception(RuntimeError(resultado))
+                else:
+                    futuro.set_result(resultado)
+        except (EOFError, OSError):
+            pass
+
+        # Bajo el lock: una solicitud registrada después ve vivo = False
+        with self._lock_pendientes:
+            self.vivo = False
+            pendientes = list(self._pendientes.values())
+            self._pendientes.clear()
+        for futuro in pendientes:
+            futuro.set_exception(RuntimeError("El servicio de embeddings terminó"))
+
+    def encode(self, textos, batch_size=32, convert_to_numpy=True, timeout=None):
+        """
+        Embeddings de `textos` calculados en el proceso de embeddings
+
+        Si el proceso terminó, falla al responder o no responde en `timeout`
+        segundos (por defecto self.timeout), se codifican con el modelo local.
+        """
+        unico = isinstance(textos, str)
+        if unico:
+            textos = [textos]
+
+        futuro = Future()
+        solicitud_id = next(self._ids)
+        with self._lock_pendientes:
+            registrada = self.vivo
+            if registrada:
+                self._pendientes[solicitud_id] = futuro
+
+        matriz = None
+        if registrada:
+            try:
+                with self._lock_envio:
+                    self.conexion.send((solicitud_id, list(textos)))
+                matriz = futuro.result(self.timeout if timeout is None else timeout)
+            except (OSError, RuntimeError, FutureTimeoutError) as e:
+                if isinstance(e, RuntimeError) and self.vivo:
+                    raise                   # el modelo falló con estos textos: el local fallaría igual
+                with self._lock_pendientes:
+                    self._pendientes.pop(solicitud_id, None)
+                print(f"⚠️ Servicio de embeddings sin respuesta ({type(e).__name__}: {e}); usando el modelo local")
+
+        if matriz is None:
+            matriz = np.asarray(self.codificador_local().encode(list(textos), batch_size=batch_size,
+                                                                convert_to_numpy=True), dtype=np.float32)
+        return matriz[0] if unico else matriz
+
+    def codificador_local(self):
+        """Modelo cargado en este proceso, para cuando el servicio no responde"""
+        with self._lock_local:
+            if self._codificador_local is None:
+                from codificadores import crear_codificador
+                self._codificador_local = crear_codificador(self.backend, self.nombre_modelo, self.directorio_onnx)
+            return self._codificador_local
+
+    def cerrar(self):
+        """Detiene el proceso de embeddings"""
+        try:
+            with self._lock_envio:
+                self.conexion.send(None)
+            self.conexion.close()
+        except OSError:
+            pass
+        if self.proceso.poll() is None:
+            try:
+                self.proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+        self.vivo = False
+
+
+# ─────────────────────────────────────────────
+# Proceso trabajador
+# ─────────────────────────────────────────────
+
+def atender(conexion, codificador, ventana_ms, lote_maximo):
+    """
+    Bucle del trabajador: toma una solicitud, espera `ventana_ms` por más
+    (hasta `lote_maximo` textos) y las resuelve en un solo encode
+    """
+    ventana = ventana_ms / 1000.0
+
+    while True:
+        solicitud = conexion.recv()
+        if solicitud is None:
+            return
+
+        lote = [solicitud]
+        total = len(solicitud[1])
+        limite = time.monotonic() + ventana
+        while total < lote_maximo:
+            restante = limite - time.monotonic()
+            if restante <= 0 or not conexion.poll(restante):
+                break
+            solicitud = conexion.recv()
+            if solicitud is None:
+                conexion.close()
+                return
+            lote.append(solicitud)
+            total += len(solicitud[1])
+
+        textos = [texto for _, textos_solicitud in lote for texto in textos_solicitud]
+        try:
+            matriz = np.asarray(codificador.encode(textos, batch_size=lote_maximo, convert_to_numpy=True),
+                                dtype=np.float32)
+            inicio = 0
+            for solicitud_id, textos_solicitud in lote:
+                conexion.send((solicitud_id, matriz[inicio:inicio + len(textos_solicitud)]))
+                inicio += len(textos_solicitud)
+        except Exception as e:
+            for solicitud_id, _ in lote:
+                conexion.send((solicitud_id, f"Error generando embeddings: {e}"))
+
+
+def main(argv):
+    direccion, backend, nombre_modelo, directorio_onnx, ventana_ms, lote_maximo = argv
+    conexion = Client(direccion, family='AF_UNIX', authkey=bytes.fromhex(os.environ['PQRS_SERVICIO_CLAVE']))
+
+    try:
+        from codificadores import crear_codificador
+        codificador = crear_codificador(backend, nombre_modelo, directorio_onnx)
+        dimension = int(np.asarray(codificador.encode(['dimension'], convert_to_numpy=True)).shape[1])
+    except Exception as e:
+        conexion.send(('error', str(e)))
+        return 1
+    conexion.send(('listo', dimension))
+
+    try:
+        atender(conexion, codificador, float(ventana_ms), int(lote_maximo))
+    except (EOFError, OSError):
+        # El proceso de la API se cerró
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
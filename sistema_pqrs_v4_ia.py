@@ -12,27 +12,141 @@
 
 import sqlite3
 import re
-from difflib import SequenceMatcher
 import os
 import pickle
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from codificadores import crear_codificador, ReordenadorCruzado
+from indice_ann import crear_indice, cargar_indice, objetivo_recall
+from almacen_casos import AlmacenCasos
+from cache_lru import CacheLRU
+from registro_resoluciones import RegistroResoluciones
+from pool_sqlite import PoolSQLite
+from extractor_valores import extraer
+from almacen_embeddings import AlmacenEmbeddings, calcular_huella, clave_texto
+import snapshot_pqrs
+
+MODELO_POR_DEFECTO = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# Entradas que guarda la bitácora cambios_casos (las más viejas las borra el trigger)
+CAMBIOS_EN_BITACORA = 1000
+
+# Columnas de la tabla casos que se pueden pedir en los listados
+CAMPOS_CASOS = ('id', 'categoria', 'problema', 'sql', 'respuesta', 'usos', 'efectividad',
+                'conceptos_clave', 'complejidad')
 
 class SistemaPQRSIA:
     
-    def __init__(self):
+    def __init__(self, cargar_en_segundo_plano=False, servicio_embeddings=False):
+        """
+        Args:
+            cargar_en_segundo_plano: Si es True, el modelo y los embeddings se
+                cargan en un hilo aparte y el constructor retorna de inmediato
+                (la BD ya queda abierta). Ver esperar_listo() y estado.
+            servicio_embeddings: Si es True, el modelo vive en un proceso aparte
+                que junta las consultas concurrentes en lotes (servicio_embeddings.py)
+        """
         self.db = 'pqrs_sistema.db'
-        self.conn = None
+        self.pool = None                    # PoolSQLite: lectores por hilo + un escritor (ver conn)
+        self.busy_timeout_ms = int(os.environ.get('PQRS_SQLITE_BUSY_TIMEOUT_MS', 5000))
         
         # Cargar modelo de embeddings (pequeño y rápido)
-        print("🔄 Cargando modelo de IA...")
-        self.modelo_embeddings = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        print("✅ Modelo cargado")
+        # PQRS_MODELO_REVISION es la etiqueta de la revisión desplegada: cambiarla invalida los vectores
+        self.nombre_modelo = os.environ.get('PQRS_MODELO', MODELO_POR_DEFECTO)
+        self.revision_modelo = os.environ.get('PQRS_MODELO_REVISION', 'main')
+        # Backend del modelo: 'torch' (por defecto), 'onnx' o 'onnx-int8' (ver codificadores.py)
+        self.backend_codificador = os.environ.get('PQRS_CODIFICADOR', 'torch')
+        self.directorio_onnx = os.environ.get('PQRS_DIRECTORIO_ONNX', 'modelo_onnx')
+        self.modelo_embeddings = None
+        
+        # Proceso de embeddings con micro-lotes (ventana de espera, tamaño máximo del lote y
+        # segundos que espera cada consulta antes de usar el modelo local)
+        self.usar_servicio_embeddings = servicio_embeddings
+        self.ventana_servicio_ms = float(os.environ.get('PQRS_SERVICIO_VENTANA_MS', 5))
+        self.lote_servicio = int(os.environ.get('PQRS_SERVICIO_LOTE', 64))
+        self.timeout_servicio = float(os.environ.get('PQRS_SERVICIO_TIMEOUT', 30))
+        
+        # Estado de la carga: 'loading' -> 'ready' (o 'error')
+        self.estado = 'loading'
+        self.error_carga = None
+        self.listo = threading.Event()
+        self.hilo_carga = None
+        
+        # Almacén binario de embeddings (append-only, memmap)
+        self.embeddings = None
+        self.ruta_embeddings = 'embeddings'
+        self.lote_fsync = int(os.environ.get('PQRS_EMBEDDINGS_FSYNC', 64))
+        self.lote_embeddings = int(os.environ.get('PQRS_LOTE_EMBEDDINGS', 64))
+        self.cache_file = 'embeddings_cache.pkl'  # Formato viejo, solo para migrar
+        
+        # Protege almacén e índice frente al hilo que recalcula embeddings
+        self._lock = threading.RLock()
+        # Un solo guardado (snapshot o índice ANN) a la vez; se toma antes que _lock, nunca dentro
+        self._lock_guardado = threading.Lock()
+        # Un cambio de la tabla casos (propio o sincronizado) se aplica al almacén de principio a
+        # fin sin que otro hilo aplique otro en el medio; se toma antes que _lock, nunca dentro
+        self._lock_cambios = threading.RLock()
+        self.casos_pendientes = set()
+        self.hilo_reembebido = None
+        
+        # Contadores de resoluciones para /api/estadisticas (se vuelcan a SQLite cada pocos segundos)
+        self.registro_resoluciones = RegistroResoluciones(
+            lambda: self.pool, intervalo=float(os.environ.get('PQRS_INTERVALO_ESTADISTICAS', 5))
+        )
         
-        # Cache de embeddings
-        self.cache_embeddings = {}
-        self.cache_file = 'embeddings_cache.pkl'
+        # Cache LRU de embeddings de consultas repetidas
+        self.cache_consultas = CacheLRU(
+            maximo=int(os.environ.get('PQRS_CACHE_CONSULTAS', 1024)),
+            ttl=float(os.environ.get('PQRS_CACHE_TTL', 3600))
+        )
+        
+        # Almacén columnar en memoria (ids, categorías, embeddings, bitsets); las búsquedas
+        # leen una versión congelada por hilo (ver version_congelada)
+        self._local = threading.local()
+        self.almacen = None
+        
+        # Índice ANN opcional: 'exacto' (matriz completa), 'ivf' o 'hnsw'
+        self.tipo_indice = os.environ.get('PQRS_INDICE_ANN', 'exacto')
+        # Recall@10 objetivo (0.9 por defecto; el índice calibra su sondeo) o, si es 1 o más,
+        # n_sondeo (IVF) / ef (HNSW) fijo
+        self.recall_indice = float(os.environ.get('PQRS_ANN_RECALL', 0)) or None
+        self.candidatos_ann = int(os.environ.get('PQRS_ANN_CANDIDATOS', 200))
+        self.indice_ann = None
+        self.indice_file = f'indice_ann_{self.tipo_indice}-{calcular_huella(self.configuracion_embeddings())}.pkl'
+        
+        # Índice léxico FTS5 (BM25) fusionado con la similitud de embeddings: nombres exactos
+        # de tablas y campos (EstadoLiquidacionVendedor) pesan aunque el modelo no los entienda
+        self.fts_disponible = False         # lo define crear_esquema (SQLite puede venir sin FTS5)
+        self.candidatos_bm25 = int(os.environ.get('PQRS_BM25_CANDIDATOS', 50))
+        self.peso_bm25 = float(os.environ.get('PQRS_PESO_BM25', 0.15))
+        self.saturacion_bm25 = float(os.environ.get('PQRS_BM25_SATURACION', 5.0))
+        
+        # Búsqueda en dos etapas: candidatos baratos (coseno o ANN + BM25 + números en común),
+        # después bonus y reordenamiento solo sobre esos candidatos
+        self.candidatos_etapa1 = int(os.environ.get('PQRS_CANDIDATOS_ETAPA1', 300))
+        # Cross-encoder opcional para los mejores (p. ej. cross-encoder/mmarco-mMiniLMv2-L12-H384-v1)
+        self.nombre_reordenador = os.environ.get('PQRS_REORDENADOR') or None
+        self.candidatos_reordenar = int(os.environ.get('PQRS_CANDIDATOS_REORDENAR', 20))
+        self.reordenador = None
+        
+        # Particiones por categoría: sin índice ANN la búsqueda empieza por las categorías con el
+        # centroide más parecido a la consulta y solo se amplía si el mejor coseno no llega al umbral
+        self.enrutar_categorias = os.environ.get('PQRS_ENRUTAR', '1') == '1'
+        self.enrutar_desde = int(os.environ.get('PQRS_ENRUTAR_DESDE', 2000))    # con menos casos se recorre todo
+        self.particiones_ruta = int(os.environ.get('PQRS_PARTICIONES_RUTA', 1))
+        self.umbral_ruta = float(os.environ.get('PQRS_UMBRAL_RUTA', 0.6))
+        
+        # Snapshot del estado de búsqueda para arrancar en caliente (se reescribe tras cambios)
+        self.usar_snapshot = os.environ.get('PQRS_SNAPSHOT', '1') == '1'
+        self.snapshot_file = f'snapshot_pqrs-{calcular_huella(self.configuracion_embeddings())}.bin'
+        self.demora_snapshot = float(os.environ.get('PQRS_SNAPSHOT_DEMORA', 5))
+        self.version_casos = None           # versión de la tabla casos que refleja el almacén
+        self.ultimo_id_casos = None         # mayor id de casos que vio el almacén
+        self.ultimo_cambio_casos = None     # última entrada de cambios_casos aplicada
+        self._timer_snapshot = None
+        self._preparado_para_fork = False   # ver preparar_fork
         
         # DICCIONARIO DE SINÓNIMOS
         self.sinonimos = {
@@ -54,13 +168,172 @@ class SistemaPQRSIA:
             'factura': ['invoice', 'recibo'],
         }
         
+        # La BD se abre siempre de inmediato: lo que no usa embeddings funciona desde ya
         self.inicializar()
-        self.cargar_cache_embeddings()
+        
+        if cargar_en_segundo_plano:
+            self.hilo_carga = threading.Thread(target=self.cargar_modelo, name='carga-modelo-pqrs', daemon=True)
+            self.hilo_carga.start()
+        else:
+            self.cargar_modelo()
+            if self.error_carga is not None:
+                raise self.error_carga
+    
+    def cargar_modelo(self):
+        """Carga el modelo, el almacén de embeddings y el índice ANN (la parte lenta del arranque)"""
+        try:
+            inicio = time.perf_counter()
+            print(f"🔄 Cargando modelo de IA ({self.backend_codificador})...")
+            if self.usar_servicio_embeddings:
+                from servicio_embeddings import ServicioEmbeddings
+                self.modelo_embeddings = ServicioEmbeddings(
+                    self.backend_codificador, self.nombre_modelo, self.directorio_onnx,
+                    ventana_ms=self.ventana_servicio_ms, lote_maximo=self.lote_servicio,
+                    timeout=self.timeout_servicio
+                )
+                print(f"✅ Modelo cargado en el servicio de embeddings (pid {self.modelo_embeddings.proceso.pid})")
+            else:
+                self.modelo_embeddings = crear_codificador(self.backend_codificador, self.nombre_modelo, self.directorio_onnx)
+                print("✅ Modelo cargado")
+            
+            if self.nombre_reordenador:
+                self.reordenador = ReordenadorCruzado(self.nombre_reordenador)
+                print(f"✅ Reordenador cargado ({self.nombre_reordenador})")
+            
+            self.cargar_cache_embeddings()
+            
+            # Cargar casos desde archivo si la BD está vacía
+            if self.conn.execute('SELECT COUNT(*) FROM casos').fetchone()[0] == 0:
+                self.cargar_desde_archivo()
+            
+            if not self.cargar_snapshot():
+                self.construir_almacen()
+                self.preparar_indice_ann()
+                self.guardar_snapshot()
+            
+            self.estado = 'ready'
+            print(f"✅ Sistema listo en {time.perf_counter() - inicio:.1f}s")
+        except Exception as e:
+            self.estado = 'error'
+            self.error_carga = e
+            print(f"❌ Error cargando modelo: {e}")
+        finally:
+            self.listo.set()
+    
+    def preparar_fork(self):
+        """
+        Deja el sistema listo para hacer fork (gunicorn con preload_app)
+        
+        Espera la carga y el recálculo en segundo plano y vacía los buffers
+        de escritura, para que los workers no hereden escrituras a medias.
+        
+        gunicorn lo llama antes de cada fork, también al reemplazar un worker
+        (max_requests, caída): después de la primera vez solo se repite si
+        el master volvió a usar la BD o dejó algo pendiente.
+        """
+        self.esperar_listo()
+        if self._preparado_para_fork and not self._cambios_desde_preparar_fork():
+            return
+        if self.hilo_reembebido is not None:
+            self.hilo_reembebido.join()
+        self.registro_resoluciones.volcar()
+        with self._lock:
+            self.embeddings.cerrar()
+            if self.indice_ann is not None:
+                # Sin hilo de entrenamiento del IVF a medias al hacer fork
+                self.indice_ann.esperar_entrenamiento()
+            pendiente = self._timer_snapshot is not None
+            if pendiente:
+                self._timer_snapshot.cancel()
+        if pendiente:
+            # Lo que iba a guardar el timer (snapshot o índice ANN), antes de que los workers lo hereden
+            self._escribir_snapshot_programado()
+        with self._lock:
+            # Sin hilo escritor ni conexiones abiertas al hacer fork
+            self.pool.cerrar()
+        self._preparado_para_fork = True
+    
+    def _cambios_desde_preparar_fork(self):
+        """Si desde el último preparar_fork quedó algo que los workers no deben heredar"""
+        # Contadores sin volcar: volcarlos abre el pool
+        self.registro_resoluciones.volcar()
+        return (self.pool.abierto() or self._timer_snapshot is not None
+                or (self.hilo_reembebido is not None and self.hilo_reembebido.is_alive()))
+    
+    def reabrir_tras_fork(self):
+        """
+        Se llama en cada worker después del fork
+        
+        Las conexiones SQLite no se pueden compartir entre procesos: el pool
+        abre las suyas. El modelo y la matriz de embeddings (memmap) siguen
+        compartidos copy-on-write con el master.
+        """
+        self._lock = threading.RLock()
+        self._lock_guardado = threading.Lock()
+        self._lock_cambios = threading.RLock()
+        self.pool.tras_fork()
+        self.registro_resoluciones.tras_fork()
+    
+    def esperar_listo(self, timeout=None):
+        """
+        Espera a que termine la carga del modelo
+        
+        Returns:
+            True si el sistema quedó listo. Lanza el error de carga si falló.
+        """
+        if not self.listo.wait(timeout):
+            return False
+        if self.error_carga is not None:
+            raise RuntimeError(f"El modelo no se pudo cargar: {self.error_carga}")
+        return True
+    
+    @property
+    def conn(self):
+        """
+        Conexión de solo lectura del hilo actual
+        
+        Cada hilo (Flask, Streamlit, hilos internos) lee con su propia
+        conexión; las escrituras pasan por self.pool.escribir.
+        """
+        return self.pool.lectura()
+    
+    @property
+    def almacen(self):
+        """
+        Almacén columnar de casos
+        
+        Dentro de version_congelada, la versión fijada para el hilo actual.
+        """
+        congelado = getattr(self._local, 'almacen', None)
+        return congelado if congelado is not None else self._almacen
+    
+    @almacen.setter
+    def almacen(self, almacen):
+        self._almacen = almacen
+    
+    @contextmanager
+    def version_congelada(self):
+        """
+        Fija para el hilo actual una versión congelada del almacén
+        (AlmacenCasos.congelar): dentro del bloque se puntúa e hidrata sin
+        self._lock aunque otro hilo agregue o quite casos
+        """
+        with self._lock:
+            almacen = self._almacen.congelar()
+        self._local.almacen = almacen
+        try:
+            yield almacen
+        finally:
+            self._local.almacen = None
     
     def inicializar(self):
-        """Inicializa base de datos"""
-        self.conn = sqlite3.connect(self.db, check_same_thread=False)
-        c = self.conn.cursor()
+        """Inicializa base de datos (pool de conexiones en modo WAL y esquema)"""
+        self.pool = PoolSQLite(self.db, busy_timeout_ms=self.busy_timeout_ms)
+        self.pool.escribir(self.crear_esquema)
+    
+    def crear_esquema(self, conn):
+        """Tablas, índices y triggers (se ejecuta en el escritor del pool)"""
+        c = conn.cursor()
         
         c.execute('''
             CREATE TABLE IF NOT EXISTS casos (
@@ -76,12 +349,126 @@ class SistemaPQRSIA:
             )
         ''')
         
-        self.conn.commit()
+        # Listado por categoría con paginación por id (keyset) sin recorrer la tabla
+        c.execute('CREATE INDEX IF NOT EXISTS idx_casos_categoria ON casos (categoria, id)')
+        
+        # Casos por categoría mantenidos por triggers: contar no recorre la tabla casos
+        existe = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estadisticas_categorias'").fetchone()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS estadisticas_categorias (
+                categoria TEXT PRIMARY KEY,
+                casos INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        if not existe:
+            # Base de datos anterior a la tabla: contar una sola vez
+            c.execute('''
+                INSERT INTO estadisticas_categorias (categoria, casos)
+                SELECT COALESCE(categoria, ''), COUNT(*) FROM casos GROUP BY COALESCE(categoria, '')
+            ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_categorias_insert AFTER INSERT ON casos
+            BEGIN
+                INSERT INTO estadisticas_categorias (categoria, casos) VALUES (COALESCE(NEW.categoria, ''), 1)
+                ON CONFLICT(categoria) DO UPDATE SET casos = casos + 1;
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_categorias_delete AFTER DELETE ON casos
+            BEGIN
+                UPDATE estadisticas_categorias SET casos = casos - 1 WHERE categoria = COALESCE(OLD.categoria, '');
+                DELETE FROM estadisticas_categorias WHERE casos <= 0;
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_categorias_update AFTER UPDATE OF categoria ON casos
+            BEGIN
+                UPDATE estadisticas_categorias SET casos = casos - 1 WHERE categoria = COALESCE(OLD.categoria, '');
+                DELETE FROM estadisticas_categorias WHERE casos <= 0;
+                INSERT INTO estadisticas_categorias (categoria, casos) VALUES (COALESCE(NEW.categoria, ''), 1)
+                ON CONFLICT(categoria) DO UPDATE SET casos = casos + 1;
+            END
+        ''')
+        RegistroResoluciones.crear_tablas(c)
+        
+        # Versión de la tabla casos: la suben triggers en cada cambio que afecta la búsqueda,
+        # hecho desde cualquier proceso (el snapshot guarda con qué versión se generó)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS version_casos (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        c.execute('INSERT OR IGNORE INTO version_casos (id, version) VALUES (1, 0)')
+        
+        # Bitácora de casos editados o borrados, llenada por los mismos triggers: sincronizar
+        # solo relee esos casos y los de id nuevo (AUTOINCREMENT: un id no se reutiliza)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS cambios_casos (
+                secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+                caso_id INTEGER NOT NULL
+            )
+        ''')
+        bitacora = f'''
+                    INSERT INTO cambios_casos (caso_id) VALUES (OLD.id);
+                    DELETE FROM cambios_casos
+                    WHERE secuencia <= (SELECT MAX(secuencia) FROM cambios_casos) - {CAMBIOS_EN_BITACORA};'''
+        for nombre, evento in (('insert', 'INSERT'),
+                               ('update', 'UPDATE OF categoria, problema, conceptos_clave, complejidad'),
+                               ('delete', 'DELETE')):
+            cuerpo = '' if nombre == 'insert' else bitacora
+            anterior = c.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                                 (f'casos_version_{nombre}',)).fetchone()
+            if anterior and cuerpo and 'cambios_casos' not in anterior[0]:
+                # Trigger de antes de la bitácora
+                c.execute(f'DROP TRIGGER casos_version_{nombre}')
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS casos_version_{nombre} AFTER {evento} ON casos
+                BEGIN
+                    UPDATE version_casos SET version = version + 1 WHERE id = 1;{cuerpo}
+                END
+            ''')
         
-        # Cargar casos desde archivo si la BD está vacía
-        c.execute('SELECT COUNT(*) FROM casos')
-        if c.fetchone()[0] == 0:
-            self.cargar_desde_archivo()
+        # Índice de texto completo sobre casos (contenido externo: no duplica los textos)
+        existe_fts = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'casos_fts'").fetchone()
+        try:
+            c.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS casos_fts USING fts5(
+                    categoria, problema, sql,
+                    content='casos', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ SQLite sin FTS5 ({e}): la búsqueda sigue solo con embeddings")
+            return
+        self.fts_disponible = True
+        if not existe_fts:
+            # Base de datos anterior al índice: indexar lo que ya hay
+            c.execute("INSERT INTO casos_fts (casos_fts) VALUES ('rebuild')")
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_fts_insert AFTER INSERT ON casos
+            BEGIN
+                INSERT INTO casos_fts (rowid, categoria, problema, sql)
+                VALUES (NEW.id, NEW.categoria, NEW.problema, NEW.sql);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_fts_delete AFTER DELETE ON casos
+            BEGIN
+                INSERT INTO casos_fts (casos_fts, rowid, categoria, problema, sql)
+                VALUES ('delete', OLD.id, OLD.categoria, OLD.problema, OLD.sql);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_fts_update AFTER UPDATE OF categoria, problema, sql ON casos
+            BEGIN
+                INSERT INTO casos_fts (casos_fts, rowid, categoria, problema, sql)
+                VALUES ('delete', OLD.id, OLD.categoria, OLD.problema, OLD.sql);
+                INSERT INTO casos_fts (rowid, categoria, problema, sql)
+                VALUES (NEW.id, NEW.categoria, NEW.problema, NEW.sql);
+            END
+        ''')
     
     def normalizar_texto(self, texto):
         """Normaliza texto removiendo tildes y convirtiendo a minúsculas"""
@@ -168,46 +555,547 @@ class SistemaPQRSIA:
         
         return embedding
     
+    def embedding_consulta(self, problema):
+        """
+        Embedding normalizado de una consulta, pasando por el cache LRU
+        
+        La clave ignora mayúsculas, tildes y espacios repetidos, así un
+        reintento con el mismo texto no vuelve a pasar por el modelo.
+        """
+        clave = ' '.join(self.normalizar_texto(problema).split())
+        embedding = self.cache_consultas.obtener(clave)
+        if embedding is None:
+            embedding = self.normalizar_embedding(self.generar_embedding(problema))
+            embedding.setflags(write=False)
+            self.cache_consultas.guardar(clave, embedding)
+        return embedding
+    
+    def embeddings_consultas(self, problemas):
+        """
+        Matriz (consultas x dimensión) de embeddings normalizados
+        
+        Las consultas que no están en el cache LRU se codifican juntas en
+        una sola llamada al modelo.
+        """
+        claves = [' '.join(self.normalizar_texto(problema).split()) for problema in problemas]
+        vectores = [self.cache_consultas.obtener(clave) for clave in claves]
+        
+        faltantes = {}
+        for clave, problema, vector in zip(claves, problemas, vectores):
+            if vector is None and clave not in faltantes:
+                faltantes[clave] = problema.strip()
+        
+        nuevos = {}
+        if faltantes:
+            matriz = np.asarray(
+                self.modelo_embeddings.encode(list(faltantes.values()), batch_size=self.lote_embeddings,
+                                              convert_to_numpy=True),
+                dtype=np.float32
+            )
+            for clave, embedding in zip(faltantes, matriz):
+                vector = self.normalizar_embedding(embedding)
+                vector.setflags(write=False)
+                self.cache_consultas.guardar(clave, vector)
+                nuevos[clave] = vector
+        
+        return np.stack([vector if vector is not None else nuevos[clave] for clave, vector in zip(claves, vectores)])
+    
     def cargar_cache_embeddings(self):
-        """Carga embeddings en cache si existe"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'rb') as f:
-                    self.cache_embeddings = pickle.load(f)
-                print(f"✅ Cache de embeddings cargado: {len(self.cache_embeddings)} casos")
-            except:
-                self.cache_embeddings = {}
+        """Abre el almacén binario de embeddings (memmap) de la huella del modelo actual"""
+        self.embeddings = AlmacenEmbeddings(
+            self.ruta_embeddings,
+            configuracion=self.configuracion_embeddings(),
+            lote_fsync=self.lote_fsync
+        )
+        
+        if len(self.embeddings):
+            print(f"✅ Cache de embeddings cargado: {len(self.embeddings)} textos (huella {self.embeddings.huella})")
+    
+    def configuracion_embeddings(self):
+        """Todo lo que cambia los vectores: si algo de esto cambia, cambia la huella"""
+        configuracion = {
+            'modelo': self.nombre_modelo,
+            'revision': self.revision_modelo,
+            'normalizacion': 'l2',
+            'texto': 'strip',
+        }
+        # Con torch la huella queda igual que antes de existir los backends
+        if self.backend_codificador != 'torch':
+            configuracion['backend'] = self.backend_codificador
+        return configuracion
+    
+    def clave_texto(self, problema):
+        """Clave del embedding de un problema (hash del texto que se envía al modelo)"""
+        return clave_texto(problema.strip())
+    
+    def migrar_cache_pickle(self, filas_bd):
+        """
+        Migra una sola vez embeddings_cache.pkl (indexado por caso_id) al almacén
+        
+        El pickle viejo no guardaba modelo ni texto: solo se confía en él para
+        el modelo por defecto y contra los textos actuales de la BD.
+        """
+        if len(self.embeddings) or not os.path.exists(self.cache_file):
+            return
+        if (self.nombre_modelo, self.revision_modelo, self.backend_codificador) != (MODELO_POR_DEFECTO, 'main', 'torch'):
+            return
+        
+        try:
+            with open(self.cache_file, 'rb') as f:
+                cache_viejo = pickle.load(f)
+            
+            claves = []
+            vectores = []
+            for caso_id, _, problema, _, _ in filas_bd:
+                clave = self.clave_texto(problema)
+                if caso_id in cache_viejo and clave not in claves:
+                    claves.append(clave)
+                    vectores.append(self.normalizar_embedding(cache_viejo[caso_id]))
+            
+            if claves:
+                self.embeddings.agregar_lote(claves, np.stack(vectores))
+                self.guardar_cache_embeddings()
+            print(f"✅ Cache de embeddings migrado desde {self.cache_file}: {len(claves)} casos")
+        except Exception as e:
+            print(f"⚠️ No se pudo migrar {self.cache_file}: {e}")
     
     def guardar_cache_embeddings(self):
-        """Guarda embeddings en cache"""
-        with open(self.cache_file, 'wb') as f:
-            pickle.dump(self.cache_embeddings, f)
+        """Hace fsync de los embeddings agregados desde el último lote"""
+        self.embeddings.sincronizar()
     
     def calcular_embedding_caso(self, caso_id, problema):
-        """Calcula y cachea el embedding de un caso"""
-        if caso_id not in self.cache_embeddings:
-            self.cache_embeddings[caso_id] = self.generar_embedding(problema)
-            self.guardar_cache_embeddings()
+        """
+        Calcula (si no existe) y agrega al almacén el embedding normalizado de un caso
+        
+        El vector se busca por el hash del texto, no por caso_id: un problema
+        editado o un id reutilizado siempre obtienen el vector correcto.
+        """
+        clave = self.clave_texto(problema)
+        with self._lock:
+            # Otro proceso (worker de gunicorn) pudo haberlo calculado ya
+            self.embeddings.refrescar()
+        if clave not in self.embeddings:
+            vector = self.normalizar_embedding(self.generar_embedding(problema))
+            with self._lock:
+                if clave not in self.embeddings:
+                    self.embeddings.agregar(clave, vector)
         
-        return self.cache_embeddings[caso_id]
+        return self.embeddings.vector(clave)
     
-    def cargar_desde_archivo(self):
-        """Carga PQRS desde archivo de texto"""
-        archivo = 'PQRS_NUEVAS_CON_SQL.txt'
+    def calcular_embeddings_lote(self, problemas):
+        """
+        Calcula por lotes los embeddings que faltan y los agrega al almacén
         
-        if not os.path.exists(archivo):
-            print(f"⚠️  Archivo {archivo} no encontrado")
+        Los textos se ordenan por longitud para que cada lote tenga textos
+        parecidos y el modelo no rellene de más. Retorna cuántos se calcularon.
+        """
+        with self._lock:
+            self.embeddings.refrescar()
+        
+        pendientes = {}
+        for problema in problemas:
+            clave = self.clave_texto(problema)
+            if clave not in self.embeddings and clave not in pendientes:
+                pendientes[clave] = problema.strip()
+        
+        claves = sorted(pendientes, key=lambda clave: len(pendientes[clave]))
+        for inicio in range(0, len(claves), self.lote_embeddings):
+            lote = claves[inicio:inicio + self.lote_embeddings]
+            matriz = np.asarray(
+                self.modelo_embeddings.encode([pendientes[clave] for clave in lote],
+                                              batch_size=self.lote_embeddings, convert_to_numpy=True),
+                dtype=np.float32
+            )
+            normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+            matriz = matriz / np.where(normas > 0, normas, 1.0)
+            
+            with self._lock:
+                self.embeddings.agregar_lote(lote, matriz)
+        
+        return len(claves)
+    
+    def normalizar_embedding(self, embedding):
+        """Convierte un embedding a float32 con norma 1 (coseno = producto punto)"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norma = np.linalg.norm(vector)
+        if norma > 0:
+            vector = vector / norma
+        return vector
+    
+    def construir_almacen(self):
+        """
+        Carga una sola vez todos los casos en el almacén columnar en memoria
+        
+        Los casos cuyo texto no tiene embedding vigente (caso editado, modelo
+        nuevo) se recalculan en segundo plano; mientras tanto no aparecen en
+        las búsquedas.
+        """
+        # El vocabulario arranca con todos los conceptos que conoce extraer_conceptos_clave
+        terminos = [t for concepto, sinonimos in self.sinonimos.items() for t in [concepto] + sinonimos]
+        self.almacen = AlmacenCasos(self.embeddings, terminos)
+        
+        c = self.conn.cursor()
+        self.version_casos, self.ultimo_id_casos, self.ultimo_cambio_casos = self.leer_posicion_casos()
+        c.execute('SELECT id, categoria, problema, conceptos_clave, complejidad FROM casos ORDER BY id')
+        filas_bd = c.fetchall()
+        
+        self.migrar_cache_pickle(filas_bd)
+        
+        claves_vivas = [self.clave_texto(fila[2]) for fila in filas_bd]
+        if self.embeddings.necesita_compactar(len(set(claves_vivas))):
+            print("🔄 Compactando almacén de embeddings...")
+            self.embeddings.compactar(claves_vivas)
+        
+        pendientes = []
+        for fila, clave in zip(filas_bd, claves_vivas):
+            caso_id, categoria, problema, conceptos, complejidad = fila
+            if clave in self.embeddings:
+                self.almacen.agregar(caso_id, categoria, complejidad, clave, problema, conceptos)
+            else:
+                pendientes.append(fila)
+        
+        if pendientes:
+            self.reembeber_en_segundo_plano(pendientes)
+    
+    def reembeber_en_segundo_plano(self, filas):
+        """Calcula en un hilo aparte los embeddings que faltan y suma los casos al almacén"""
+        self.casos_pendientes.update(fila[0] for fila in filas)
+        print(f"🔄 {len(filas)} casos sin embedding vigente: recalculando en segundo plano...")
+        
+        def reembeber():
+            for inicio in range(0, len(filas), self.lote_embeddings):
+                lote = filas[inicio:inicio + self.lote_embeddings]
+                try:
+                    self.calcular_embeddings_lote([fila[2] for fila in lote])
+                    with self._lock:
+                        for caso_id, categoria, problema, conceptos, complejidad in lote:
+                            if caso_id in self.casos_pendientes:
+                                self.almacen.agregar(caso_id, categoria, complejidad, self.clave_texto(problema), problema, conceptos)
+                                if self.indice_ann is not None:
+                                    self.indice_ann.agregar(caso_id, self.almacen.embedding(caso_id))
+                except Exception as e:
+                    print(f"⚠️ Error recalculando embeddings de {len(lote)} casos: {e}")
+                finally:
+                    self.casos_pendientes.difference_update(fila[0] for fila in lote)
+            
+            with self._lock:
+                self.guardar_cache_embeddings()
+            if self.indice_ann is None:
+                # Sin casos al arrancar no se pudo construir el índice
+                self.preparar_indice_ann()
+            self.programar_snapshot()
+            print(f"✅ {len(filas)} embeddings recalculados")
+        
+        self.hilo_reembebido = threading.Thread(target=reembeber, name='reembebido-pqrs', daemon=True)
+        self.hilo_reembebido.start()
+    
+    def agregar_al_almacen(self, caso_id, categoria, problema, conceptos, complejidad):
+        """Agrega un caso al almacén columnar (calcula su embedding si no existe)"""
+        self.calcular_embedding_caso(caso_id, problema)
+        with self._lock:
+            self.casos_pendientes.discard(caso_id)
+            self.almacen.agregar(caso_id, categoria, complejidad, self.clave_texto(problema), problema, conceptos)
+    
+    def leer_version_casos(self, conn=None):
+        """Versión de la tabla casos (la suben los triggers creados en crear_esquema)"""
+        return (conn or self.conn).execute('SELECT version FROM version_casos WHERE id = 1').fetchone()[0]
+    
+    def leer_posicion_casos(self):
+        """
+        (versión, mayor id de casos, última entrada de cambios_casos) en una
+        sola lectura: los tres valores son de la misma foto de la BD
+        """
+        return self.conn.execute('''
+            SELECT (SELECT version FROM version_casos WHERE id = 1),
+                   (SELECT COALESCE(MAX(id), 0) FROM casos),
+                   (SELECT COALESCE(MAX(secuencia), 0) FROM cambios_casos)
+        ''').fetchone()
+    
+    def registrar_cambio_propio(self, version_antes, n_cambios):
+        """
+        Tras aplicar al almacén un cambio propio: si nadie más escribió en el
+        medio, el almacén sigue al día con la versión nueva de la tabla
+        """
+        version, ultimo_id, ultimo_cambio = self.leer_posicion_casos()
+        if self.version_casos == version_antes and version == version_antes + n_cambios:
+            self.version_casos, self.ultimo_id_casos, self.ultimo_cambio_casos = version, ultimo_id, ultimo_cambio
+        self.programar_snapshot()
+    
+    def sincronizar_almacen(self):
+        """
+        Sincroniza el almacén con cambios hechos por fuera de este proceso
+        (por ejemplo, borrar_caso del menú de pqrs_sistema.py o un UPDATE
+        manual del problema)
+        
+        Solo lee los casos con id mayor al último visto y los que anotaron
+        los triggers en cambios_casos desde la última sincronización. Si la
+        bitácora ya no llega hasta ahí (más de CAMBIOS_EN_BITACORA cambios,
+        o un snapshot de antes de la bitácora) se compara la tabla completa.
+        
+        Si otro hilo está aplicando un cambio al almacén no espera: sigue con
+        lo que hay y la próxima llamada sincroniza.
+        """
+        if self.leer_version_casos() == self.version_casos:
+            return
+        if not self._lock_cambios.acquire(blocking=False):
             return
+        try:
+            self._sincronizar_almacen()
+        finally:
+            self._lock_cambios.release()
+    
+    def _sincronizar_almacen(self):
+        # Con _lock_cambios tomado: la posición se relee, el cambio que se esperó ya pudo aplicarse
+        posicion = self.leer_posicion_casos()
+        version_casos, ultimo_id, ultimo_cambio = posicion
+        if version_casos == self.version_casos:
+            return
+        if self.ultimo_cambio_casos is None:
+            return self.sincronizar_completo(posicion)
         
-        print(f"🔄 Cargando casos desde {archivo}...")
+        c = self.conn.cursor()
+        cambios = c.execute('''
+            SELECT secuencia, caso_id FROM cambios_casos
+            WHERE secuencia > ? AND secuencia <= ? ORDER BY secuencia
+        ''', (self.ultimo_cambio_casos, ultimo_cambio)).fetchall()
+        if ultimo_cambio > self.ultimo_cambio_casos and (not cambios or cambios[0][0] != self.ultimo_cambio_casos + 1):
+            # La bitácora ya borró cambios que este proceso no vio
+            return self.sincronizar_completo(posicion)
         
-        with open(archivo, 'r', encoding='utf-8') as f:
-            contenido = f.read()
+        filas = c.execute('''
+            SELECT id, categoria, problema, conceptos_clave, complejidad
+            FROM casos WHERE id > ? AND id <= ?
+        ''', (self.ultimo_id_casos, ultimo_id)).fetchall()
+        editados = {caso_id for _, caso_id in cambios}
+        editados_bd = set()
+        lista = list(editados)
+        for inicio in range(0, len(lista), 500):
+            bloque = lista[inicio:inicio + 500]
+            filas_bloque = c.execute(f'''
+                SELECT id, categoria, problema, conceptos_clave, complejidad
+                FROM casos WHERE id IN ({','.join('?' * len(bloque))})
+            ''', bloque).fetchall()
+            filas.extend(filas_bloque)
+            editados_bd.update(fila[0] for fila in filas_bloque)
+        
+        with self._lock:
+            for caso_id in editados - editados_bd:
+                self.casos_pendientes.discard(caso_id)
+                self.almacen.quitar(caso_id)
+                if self.indice_ann is not None:
+                    self.indice_ann.eliminar(caso_id)
+        
+        for caso_id, categoria, problema, conceptos, complejidad in filas:
+            if caso_id in self.casos_pendientes:
+                continue
+            texto_igual = caso_id in self.almacen and self.almacen.clave(caso_id) == self.clave_texto(problema)
+            if texto_igual and caso_id not in editados:
+                continue
+            
+            # Caso nuevo o editado (categoría, conceptos o problema)
+            self.agregar_al_almacen(caso_id, categoria, problema, conceptos, complejidad)
+            if self.indice_ann is not None and not texto_igual:
+                with self._lock:
+                    self.indice_ann.agregar(caso_id, self.almacen.embedding(caso_id))
+        
+        self.version_casos, self.ultimo_id_casos, self.ultimo_cambio_casos = posicion
+        self.programar_snapshot()
+    
+    def sincronizar_completo(self, posicion):
+        """Sincroniza comparando la tabla completa con el almacén (ver sincronizar_almacen)"""
+        c = self.conn.cursor()
+        c.execute('SELECT id, categoria, problema, conceptos_clave, complejidad FROM casos')
+        filas_bd = c.fetchall()
+        ids_bd = {fila[0] for fila in filas_bd}
+        
+        with self._lock:
+            for caso_id in set(self.almacen.posicion) - ids_bd:
+                self.almacen.quitar(caso_id)
+                if self.indice_ann is not None:
+                    self.indice_ann.eliminar(caso_id)
+        
+        for caso_id, categoria, problema, conceptos, complejidad in filas_bd:
+            if caso_id in self.casos_pendientes:
+                continue
+            if caso_id in self.almacen and self.almacen.clave(caso_id) == self.clave_texto(problema):
+                continue
+            
+            # Caso nuevo o con el problema editado
+            self.agregar_al_almacen(caso_id, categoria, problema, conceptos, complejidad)
+            if self.indice_ann is not None:
+                with self._lock:
+                    self.indice_ann.agregar(caso_id, self.almacen.embedding(caso_id))
+        
+        self.version_casos, self.ultimo_id_casos, self.ultimo_cambio_casos = posicion
+        self.programar_snapshot()
+    
+    def hidratar_casos(self, ids):
+        """Trae de SQLite los textos de los casos indicados: {id: (categoria, problema, sql, respuesta)}"""
+        c = self.conn.cursor()
+        textos = {}
+        ids = list(ids)
+        for inicio in range(0, len(ids), 500):
+            bloque = ids[inicio:inicio + 500]
+            c.execute(f'''
+                SELECT id, categoria, problema, sql, respuesta
+                FROM casos WHERE id IN ({','.join('?' * len(bloque))})
+            ''', bloque)
+            for caso_id, categoria, problema, sql, respuesta in c.fetchall():
+                textos[caso_id] = (categoria, problema, sql, respuesta)
+        return textos
+    
+    def preparar_indice_ann(self):
+        """Carga o construye el índice ANN (si no hay, se usa la matriz completa)"""
+        if self.tipo_indice == 'exacto' or not len(self.almacen):
+            return
+        
+        try:
+            indice = cargar_indice(self.tipo_indice, self.indice_file)
+            
+            with self._lock:
+                # Reconstruir si el índice guardado no corresponde a los casos actuales
+                # o se construyó con otro PQRS_ANN_RECALL
+                construido = (indice is None or indice.ids() != set(self.almacen.posicion)
+                              or indice.recall_objetivo != objetivo_recall(self.recall_indice))
+                if construido:
+                    print(f"🔄 Construyendo índice ANN ({self.tipo_indice})...")
+                    indice = crear_indice(self.tipo_indice, self.almacen.dimension, self.recall_indice)
+                    indice.agregar_lote(self.almacen.ids.tolist(), self.almacen.matriz_embeddings)
+                
+                self.indice_ann = indice
+            if construido:
+                self.guardar_indice_ann()
+            recall = f", recall@10 medido {indice.recall_medido}" if indice.recall_medido is not None else ""
+            print(f"✅ Índice ANN listo: {len(indice)} casos{recall}")
+        except (ImportError, ValueError) as e:
+            print(f"⚠️ Índice ANN no disponible ({e}) - usando búsqueda exacta")
+            self.indice_ann = None
+    
+    def guardar_indice_ann(self):
+        """
+        Guarda el índice ANN junto al cache de embeddings
+        
+        Con el lock solo se toma una copia congelada; serializar y escribir
+        (cientos de MB con muchos casos) no frena búsquedas ni escrituras.
+        No llamar con self._lock tomado.
+        """
+        with self._lock_guardado:
+            with self._lock:
+                indice = self.indice_ann.congelar() if self.indice_ann is not None else None
+            if indice is not None:
+                indice.guardar(self.indice_file)
+    
+    def cargar_snapshot(self):
+        """
+        Arranque en caliente: almacén e índice ANN desde el snapshot mapeado
+        
+        Returns:
+            False si no hay snapshot usable (otro modelo, archivo dañado, ...)
+            y hay que reconstruir todo
+        """
+        if not self.usar_snapshot or not os.path.exists(self.snapshot_file):
+            return False
+        
+        inicio = time.perf_counter()
+        try:
+            meta, arrays = snapshot_pqrs.cargar_snapshot(self.snapshot_file)
+            if meta.get('huella') != self.embeddings.huella:
+                raise ValueError("snapshot de otro modelo de embeddings")
+            almacen = AlmacenCasos.desde_snapshot(self.embeddings, meta['almacen'], arrays)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Snapshot descartado ({e}) - reconstruyendo")
+            return False
+        
+        indice = None
+        if 'indice' in arrays and meta.get('tipo_indice') == self.tipo_indice:
+            try:
+                indice = pickle.loads(arrays['indice'].tobytes())
+            except (pickle.UnpicklingError, ImportError, EOFError, AttributeError) as e:
+                print(f"⚠️ Índice ANN del snapshot no se pudo leer ({e})")
+        
+        with self._lock:
+            self.almacen = almacen
+            self.indice_ann = indice
+            self.version_casos = meta['version_casos']
+            # Snapshot de antes de la bitácora: la primera sincronización compara todo
+            self.ultimo_id_casos = meta.get('ultimo_id_casos')
+            self.ultimo_cambio_casos = meta.get('ultimo_cambio_casos')
+        print(f"⚡ Snapshot cargado: {len(almacen)} casos en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        
+        # Cambios hechos en la BD después de escribir el snapshot
+        self.sincronizar_almacen()
+        if self.indice_ann is None:
+            self.preparar_indice_ann()
+        return True
+    
+    def guardar_snapshot(self):
+        """
+        Escribe el snapshot con el estado actual (si no quedan embeddings pendientes)
+        
+        Como guardar_indice_ann: con el lock solo se congelan almacén e
+        índice, la exportación y la escritura van fuera. No llamar con
+        self._lock tomado.
+        """
+        if not self.usar_snapshot or self.almacen is None:
+            return
+        
+        with self._lock_guardado:
+            with self._lock:
+                if self.casos_pendientes:
+                    return
+                almacen = self.almacen.congelar()
+                indice = self.indice_ann.congelar() if self.indice_ann is not None else None
+                meta = {
+                    'huella': self.embeddings.huella,
+                    'version_casos': self.version_casos,
+                    'ultimo_id_casos': self.ultimo_id_casos,
+                    'ultimo_cambio_casos': self.ultimo_cambio_casos,
+                    'tipo_indice': self.tipo_indice if indice is not None else None,
+                }
+            
+            meta['almacen'], arrays = almacen.exportar()
+            if indice is not None:
+                arrays['indice'] = np.frombuffer(pickle.dumps(indice, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+            snapshot_pqrs.guardar_snapshot(self.snapshot_file, meta, arrays)
+    
+    def programar_snapshot(self):
+        """
+        Reescribe el snapshot unos segundos después del último cambio (agrupa ráfagas)
         
-        bloques = contenido.split('========================')
-        casos_cargados = 0
+        Los cambios al índice ANN solo se hacen en memoria; se guardan acá,
+        dentro del snapshot o, sin snapshot, en su propio archivo.
+        """
+        if not self.usar_snapshot and self.indice_ann is None:
+            return
         
-        for bloque in bloques:
+        with self._lock:
+            if self._timer_snapshot is not None:
+                self._timer_snapshot.cancel()
+            self._timer_snapshot = threading.Timer(self.demora_snapshot, self._escribir_snapshot_programado)
+            self._timer_snapshot.daemon = True
+            self._timer_snapshot.start()
+    
+    def _escribir_snapshot_programado(self):
+        with self._lock:
+            self._timer_snapshot = None
+        try:
+            if self.usar_snapshot:
+                self.guardar_snapshot()
+            else:
+                self.guardar_indice_ann()
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir el snapshot: {e}")
+    
+    def parsear_bloques(self, contenido):
+        """
+        Extrae los casos de un archivo en el formato de PQRS_NUEVAS_CON_SQL.txt
+        
+        Returns:
+            Lista de tuplas (categoria, problema, sql, respuesta)
+        """
+        casos = []
+        
+        for bloque in contenido.split('========================'):
             if '--- PROBLEMA ---' not in bloque:
                 continue
             
@@ -229,132 +1117,537 @@ class SistemaPQRSIA:
                 respuesta = resp_match.group(1).strip() if resp_match else ""
                 
                 if problema and sql:
-                    # Extraer conceptos
-                    conceptos = self.extraer_conceptos_clave(problema)
-                    conceptos_str = ','.join(conceptos)
-                    complejidad = self.detectar_complejidad(problema)
-                    
-                    c = self.conn.cursor()
-                    c.execute('''
-                        INSERT INTO casos (categoria, problema, sql, respuesta, conceptos_clave, complejidad)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (categoria, problema, sql, respuesta, conceptos_str, complejidad))
-                    
-                    caso_id = c.lastrowid
-                    
-                    # Generar embedding
-                    self.calcular_embedding_caso(caso_id, problema)
-                    
-                    casos_cargados += 1
+                    casos.append((categoria, problema, sql, respuesta))
             
             except Exception as e:
                 print(f"⚠️ Error procesando bloque: {e}")
                 continue
         
-        self.conn.commit()
-        print(f"✅ {casos_cargados} casos cargados correctamente")
-        print(f"✅ {len(self.cache_embeddings)} embeddings generados")
+        return casos
     
-    def buscar_similar_ia(self, problema):
-        """Busca casos similares usando IA (embeddings)"""
-        c = self.conn.cursor()
-        c.execute('SELECT id, categoria, problema, sql, respuesta, conceptos_clave, complejidad FROM casos')
-        casos = c.fetchall()
+    def cargar_desde_archivo(self, archivo='PQRS_NUEVAS_CON_SQL.txt'):
+        """
+        Carga masiva de PQRS desde un archivo de texto
         
-        if not casos:
-            return None
+        Todos los casos se insertan en una sola transacción y los embeddings
+        se calculan por lotes (PQRS_LOTE_EMBEDDINGS), no uno por uno.
+        """
+        if not os.path.exists(archivo):
+            print(f"⚠️  Archivo {archivo} no encontrado")
+            return 0
         
-        # Generar embedding del problema nuevo
-        embedding_nuevo = self.generar_embedding(problema)
+        print(f"🔄 Cargando casos desde {archivo}...")
+        inicio = time.perf_counter()
         
-        # Extraer números clave del problema nuevo (créditos, IDs, cédulas)
-        numeros_nuevo = set(re.findall(r'\d{5,}', problema))
+        with open(archivo, 'r', encoding='utf-8') as f:
+            casos = self.parsear_bloques(f.read())
         
-        # Calcular similitudes
-        ranking = []
+        filas = []
+        for categoria, problema, sql, respuesta in casos:
+            conceptos_str = ','.join(self.extraer_conceptos_clave(problema))
+            complejidad = self.detectar_complejidad(problema)
+            filas.append((categoria, problema, sql, respuesta, conceptos_str, complejidad))
         
-        for caso in casos:
-            caso_id, cat, prob_bd, sql, resp, conceptos, complejidad = caso
-            
-            # Obtener embedding del caso
-            embedding_caso = self.calcular_embedding_caso(caso_id, prob_bd)
-            
-            # Calcular similitud coseno (IA REAL)
-            similitud_ia = cosine_similarity(
-                embedding_nuevo.reshape(1, -1),
-                embedding_caso.reshape(1, -1)
-            )[0][0]
+        # Una sola transacción para todo el archivo
+        def insertar(conn):
+            ultimo_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM casos').fetchone()[0]
+            version_antes = self.leer_version_casos(conn)
+            conn.executemany('''
+                INSERT INTO casos (categoria, problema, sql, respuesta, conceptos_clave, complejidad)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', filas)
+            return ultimo_id, version_antes
+        
+        with self._lock_cambios:
+            ultimo_id, version_antes = self.pool.escribir(insertar)
             
-            # Bonus por conceptos clave en común
-            conceptos_nuevo = set(self.extraer_conceptos_clave(problema))
-            conceptos_bd = set(conceptos.split(',')) if conceptos else set()
+            # Embeddings por lotes
+            nuevos = self.calcular_embeddings_lote([fila[1] for fila in filas])
+            self.guardar_cache_embeddings()
             
-            bonus_conceptos = 0
-            if conceptos_nuevo and conceptos_bd:
-                comunes = len(conceptos_nuevo & conceptos_bd)
-                total = len(conceptos_nuevo | conceptos_bd)
-                bonus_conceptos = (comunes / total) * 0.15 if total > 0 else 0
+            # Si el almacén ya está construido, sumar los casos nuevos (y al índice ANN)
+            if self.almacen is not None:
+                filas_nuevas = self.conn.execute('''
+                    SELECT id, categoria, problema, conceptos_clave, complejidad
+                    FROM casos WHERE id > ? ORDER BY id
+                ''', (ultimo_id,)).fetchall()
+                with self._lock:
+                    for caso_id, categoria, problema, conceptos, complejidad in filas_nuevas:
+                        self.almacen.agregar(caso_id, categoria, complejidad, self.clave_texto(problema), problema, conceptos)
+                        if self.indice_ann is not None:
+                            self.indice_ann.agregar(caso_id, self.almacen.embedding(caso_id))
+                self.registrar_cambio_propio(version_antes, len(filas))
+        
+        segundos = time.perf_counter() - inicio
+        print(f"✅ {len(filas)} casos cargados correctamente en {segundos:.1f}s "
+              f"({len(filas) / max(segundos, 1e-9):.0f} casos/s)")
+        print(f"✅ {nuevos} embeddings generados")
+        return len(filas)
+    
+    def buscar_similar_ia(self, problema, top_k=None, tiempos=None, categoria=None):
+        """
+        Busca casos similares usando IA (embeddings)
+        
+        Etapa 1: candidatos baratos (ver generar_candidatos). Etapa 2: bonus
+        y, si hay cross-encoder, reordenamiento, solo sobre los candidatos.
+        
+        Args:
+            problema: Texto del problema nuevo
+            top_k: Número de casos a retornar (None = ranking completo, o todos
+                los candidatos cuando hay índice ANN)
+            tiempos: Diccionario opcional donde se anota la duración (ms) de
+                cada etapa y el número de candidatos
+            categoria: Buscar solo en los casos de esta categoría
+        
+        Returns:
+            Lista de casos ordenada por similitud (de mayor a menor)
+        """
+        self.esperar_listo()
+        self.sincronizar_almacen()
+        
+        if not len(self.almacen):
+            return None
+        
+        # Embedding del problema nuevo (cacheado si la consulta se repite)
+        inicio = time.perf_counter()
+        embedding_nuevo = self.embedding_consulta(problema)
+        fin_embedding = time.perf_counter()
+        lexicos = self.buscar_bm25(problema)
+        fin_bm25 = time.perf_counter()
+        
+        with self.version_congelada():
+            puntuados = self.puntuar_consulta(problema, embedding_nuevo, self.tamano_etapa2(top_k),
+                                              lexicos=lexicos, tiempos=tiempos, categoria=categoria)
+            if puntuados is None:
+                return None
+            inicio_hidratacion = time.perf_counter()
+            ranking = self.armar_ranking(puntuados, self.hidratar_casos(puntuados[0]))
+            fin_hidratacion = time.perf_counter()
+        
+        ranking = self.reordenar(problema, ranking, top_k)
+        
+        if tiempos is not None:
+            tiempos.update({
+                'embedding_ms': round((fin_embedding - inicio) * 1000, 3),
+                'bm25_ms': round((fin_bm25 - fin_embedding) * 1000, 3),
+                'hidratacion_ms': round((fin_hidratacion - inicio_hidratacion) * 1000, 3),
+                'reordenamiento_ms': round((time.perf_counter() - fin_hidratacion) * 1000, 3),
+            })
+        return ranking
+    
+    def buscar_similar_ia_lote(self, problemas, top_k=None):
+        """
+        Busca casos similares para varios problemas a la vez
+        
+        Los embeddings que no están en el cache se calculan en una sola
+        pasada del modelo, y sin índice ANN las similitudes de todas las
+        consultas salen de un solo producto matriz-matriz (con enrutamiento
+        por categoría, uno por partición: ver buscar_en_particiones_lote).
+        Los textos de los ganadores se traen de SQLite en una sola consulta.
+        
+        Returns:
+            Lista con un ranking (o None) por problema, en el mismo orden
+        """
+        self.esperar_listo()
+        self.sincronizar_almacen()
+        
+        if not problemas:
+            return []
+        if not len(self.almacen):
+            return [None] * len(problemas)
+        
+        matriz_consultas = self.embeddings_consultas(problemas)
+        lexicos = [self.buscar_bm25(problema) for problema in problemas]
+        
+        with self.version_congelada():
+            similitudes = rutas = None
+            if self.indice_ann is None:
+                if self.enrutar(top_k):
+                    rutas = self.buscar_en_particiones_lote(matriz_consultas)
+                else:
+                    # (consultas x casos) en un solo producto matriz-matriz
+                    similitudes = self.almacen.similitudes_lote(matriz_consultas)
             
-            # Bonus por números/IDs similares (opcional)
-            numeros_bd = set(re.findall(r'\d{5,}', prob_bd))
-            bonus_numeros = 0
-            if numeros_nuevo and numeros_bd:
-                if numeros_nuevo & numeros_bd:  # Si hay IDs en común
-                    bonus_numeros = 0.05
+            puntuados = [
+                self.puntuar_consulta(problema, matriz_consultas[i], self.tamano_etapa2(top_k),
+                                      similitudes[i] if similitudes is not None else None, lexicos[i],
+                                      ruta=rutas[i] if rutas is not None else None)
+                for i, problema in enumerate(problemas)
+            ]
             
-            # Similitud total (máximo 1.0)
-            similitud_total = min(similitud_ia + bonus_conceptos + bonus_numeros, 1.0)
+            ids = {caso_id for resultado in puntuados if resultado is not None for caso_id in resultado[0]}
+            textos = self.hidratar_casos(ids)
+            rankings = [self.armar_ranking(resultado, textos) if resultado is not None else None
+                        for resultado in puntuados]
+        
+        return [self.reordenar(problema, ranking, top_k) if ranking is not None else None
+                for problema, ranking in zip(problemas, rankings)]
+    
+    def puntuar_consulta(self, problema, embedding_nuevo, top_k=None, similitudes_ia=None, lexicos=None,
+                         tiempos=None, categoria=None, ruta=None):
+        """
+        Puntúa los candidatos de una consulta y selecciona los ganadores
+        (llamar dentro de version_congelada o con self._lock tomado)
+        
+        Args:
+            similitudes_ia: Similitudes contra todos los casos ya calculadas
+                (búsqueda por lote); si es None se calculan aquí
+            lexicos: Candidatos BM25 de buscar_bm25 (ids, puntajes)
+            tiempos: Diccionario opcional para la duración de cada etapa
+            categoria: Restringir los candidatos a esa categoría
+            ruta: Resultado de buscar_en_particiones ya calculado (búsqueda
+                por lote con enrutamiento)
+        
+        Returns:
+            (ids, filas, similitud total, similitud IA, bonus conceptos,
+            bonus léxico) de los ganadores, o None si no hubo candidatos
+        """
+        inicio = time.perf_counter()
+        
+        # Rasgos del problema nuevo: se calculan una sola vez por consulta
+        numeros_nuevo = set(re.findall(r'\d{5,}', problema))
+        
+        # Etapa 1: candidatos
+        filas, similitudes_ia = self.generar_candidatos(embedding_nuevo, numeros_nuevo, top_k, similitudes_ia,
+                                                        lexicos, categoria, tiempos, ruta)
+        if not len(filas):
+            return None
+        fin_candidatos = time.perf_counter()
+        
+        # Etapa 2: bonus solo sobre los candidatos
+        conceptos_nuevo = set(self.extraer_conceptos_clave(problema))
+        
+        # Bonus por conceptos clave en común y por números/IDs en común
+        bonus_conceptos = self.almacen.calcular_bonus_conceptos(conceptos_nuevo, filas)
+        bonus_numeros = self.almacen.calcular_bonus_numeros(numeros_nuevo, filas)
+        
+        # Fusión con BM25 (nombres de tablas y campos, términos exactos)
+        bonus_lexico = self.calcular_bonus_lexico(lexicos, filas)
+        
+        # Similitud total (máximo 1.0)
+        similitudes_total = np.minimum(similitudes_ia + bonus_conceptos + bonus_numeros + bonus_lexico, 1.0)
+        
+        # Solo los ganadores pasan a hidratarse y armarse como diccionarios
+        seleccion = self.seleccionar_top_k(similitudes_total, top_k)
+        filas_ganadoras = filas[seleccion]
+        
+        if tiempos is not None:
+            tiempos.update({
+                'candidatos': len(filas),
+                'candidatos_ms': round((fin_candidatos - inicio) * 1000, 3),
+                'puntuacion_ms': round((time.perf_counter() - fin_candidatos) * 1000, 3),
+            })
+        return (self.almacen.ids[filas_ganadoras].tolist(), filas_ganadoras, similitudes_total[seleccion],
+                similitudes_ia[seleccion], bonus_conceptos[seleccion], bonus_lexico[seleccion])
+    
+    def generar_candidatos(self, embedding_nuevo, numeros_nuevo, top_k=None, similitudes_ia=None, lexicos=None,
+                           categoria=None, tiempos=None, ruta=None):
+        """
+        Etapa 1 de la búsqueda: candidatos baratos de obtener
+        
+        - Con categoría: solo las filas de esa partición.
+        - Con índice ANN: sus candidatos_ann vecinos.
+        - Sin índice y con muchos casos: las particiones que elige
+          buscar_en_particiones (o `ruta`, si ya se calculó por lote).
+        - Si no: los candidatos_etapa1 de mayor coseno (un producto
+          matriz-vector y una selección parcial; con top_k=None o
+          candidatos_etapa1=0 pasan todos los casos).
+        - Siempre: los candidatos BM25 y los casos con números en común,
+          aunque su coseno sea bajo (con categoría, solo los de esa categoría).
+        
+        Returns:
+            (filas, similitud IA de cada fila)
+        """
+        todas = None
+        if categoria is not None or ruta is not None or (
+                self.indice_ann is None and similitudes_ia is None and self.enrutar(top_k)):
+            if categoria is not None:
+                filas = self.almacen.filas_categoria(categoria)
+                similitudes_ia = self.almacen.similitudes_filas(embedding_nuevo, filas)
+                n_particiones = 1
+            else:
+                filas, similitudes_ia, n_particiones = ruta or self.buscar_en_particiones(embedding_nuevo)
+            if tiempos is not None:
+                tiempos['particiones'] = n_particiones
             
+            n_candidatos = max(self.candidatos_etapa1, top_k or 0)
+            if top_k is not None and self.candidatos_etapa1 and n_candidatos < len(filas):
+                mejores = np.argpartition(-similitudes_ia, n_candidatos - 1)[:n_candidatos]
+                filas, similitudes_ia = filas[mejores], similitudes_ia[mejores]
+        elif self.indice_ann is not None:
+            # El índice no tiene versiones congeladas: solo su búsqueda va con el lock
+            with self._lock:
+                ids_candidatos, similitudes = self.indice_ann.buscar(
+                    embedding_nuevo, max(self.candidatos_ann, top_k or 0)
+                )
+            presentes = [i for i, caso_id in enumerate(ids_candidatos) if caso_id in self.almacen]
+            filas = self.almacen.filas(ids_candidatos)
+            similitudes_ia = np.asarray(similitudes, dtype=np.float32)[presentes]
+        else:
+            # Similitud coseno contra todos los casos en un solo producto matriz-vector (IA REAL)
+            todas = similitudes_ia if similitudes_ia is not None else self.almacen.similitudes(embedding_nuevo)
+            n_candidatos = max(self.candidatos_etapa1, top_k or 0)
+            if top_k is None or not self.candidatos_etapa1 or n_candidatos >= len(todas):
+                return np.arange(len(todas)), todas
+            filas = np.argpartition(-todas, n_candidatos - 1)[:n_candidatos]
+            similitudes_ia = todas[filas]
+        
+        # Candidatos léxicos y por número que la etapa de embeddings no trajo
+        forzadas = self.almacen.filas_con_numeros(numeros_nuevo)
+        if lexicos is not None:
+            forzadas = np.concatenate([forzadas, self.almacen.filas(lexicos[0])])
+        nuevas = np.setdiff1d(forzadas, filas)
+        if categoria is not None:
+            codigo = self.almacen.codigo_categoria.get(categoria or "General")
+            nuevas = nuevas[self.almacen.codigos_categoria[nuevas] == codigo]
+        if len(nuevas):
+            filas = np.concatenate([filas, nuevas])
+            similitudes_ia = np.concatenate([
+                similitudes_ia,
+                todas[nuevas] if todas is not None else self.almacen.similitudes_filas(embedding_nuevo, nuevas)
+            ])
+        return filas, similitudes_ia
+    
+    def enrutar(self, top_k):
+        """Si la búsqueda exacta (sin ANN) debe ir por particiones de categoría"""
+        return (self.enrutar_categorias and top_k is not None and len(self.almacen) >= self.enrutar_desde
+                and len(self.almacen.particiones()) > 1)
+    
+    def buscar_en_particiones(self, embedding_nuevo):
+        """
+        Similitudes contra las particiones de categoría, de la más a la menos
+        parecida según su centroide
+        
+        Recorre al menos particiones_ruta particiones y sigue con la siguiente
+        solo mientras el mejor coseno visto no llegue a umbral_ruta: si la
+        categoría predicha tiene un caso bueno, el resto del corpus no se toca.
+        
+        Returns:
+            (filas, similitudes, particiones recorridas)
+        """
+        codigos, centroides = self.almacen.centroides()
+        particiones = self.almacen.particiones()
+        
+        filas, similitudes = [], []
+        mejor = -np.inf
+        for recorridas, codigo in enumerate(codigos[np.argsort(-(centroides @ embedding_nuevo))].tolist(), 1):
+            filas.append(particiones[codigo])
+            similitudes.append(self.almacen.similitudes_filas(embedding_nuevo, filas[-1]))
+            mejor = max(mejor, float(similitudes[-1].max()))
+            if recorridas >= self.particiones_ruta and mejor >= self.umbral_ruta:
+                break
+        return np.concatenate(filas), np.concatenate(similitudes), recorridas
+    
+    def buscar_en_particiones_lote(self, matriz_consultas):
+        """
+        buscar_en_particiones para varias consultas, con un producto
+        matriz-matriz por partición en vez de uno matriz-vector por consulta
+        
+        Va por rondas: en cada una, las consultas que siguen recorriendo se
+        agrupan por la próxima partición de su orden (la primera ronda, por
+        el centroide más cercano) y cada grupo hace una sola GEMM contra esa
+        partición. Cada consulta para con la misma regla que en
+        buscar_en_particiones, así que el resultado es el mismo.
+        
+        Frente a la GEMM contra todo el corpus: se multiplican solo las filas
+        que cada consulta recorre, a cambio de varias GEMM más chicas (una por
+        partición y ronda). Si el lote se reparte entre muchas particiones y
+        casi todas las consultas siguen de largo, el total se acerca al de la
+        GEMM completa, nunca lo pasa.
+        
+        Returns:
+            Lista con (filas, similitudes, particiones recorridas) por consulta
+        """
+        codigos, centroides = self.almacen.centroides()
+        particiones = self.almacen.particiones()
+        # Orden de visita de cada consulta: códigos de la partición más a la menos parecida
+        orden = codigos[np.argsort(-(matriz_consultas @ centroides.T), axis=1)]
+        
+        n = len(matriz_consultas)
+        filas = [[] for _ in range(n)]
+        similitudes = [[] for _ in range(n)]
+        mejor = np.full(n, -np.inf, dtype=np.float32)
+        recorridas = np.zeros(n, dtype=np.int64)
+        pendientes = np.arange(n)
+        ronda = 0
+        while len(pendientes):
+            siguientes = orden[pendientes, ronda]
+            for codigo in np.unique(siguientes).tolist():
+                grupo = pendientes[siguientes == codigo]
+                bloque = self.almacen.similitudes_filas_lote(matriz_consultas[grupo], particiones[codigo])
+                for i, similitudes_consulta in zip(grupo.tolist(), bloque):
+                    filas[i].append(particiones[codigo])
+                    similitudes[i].append(similitudes_consulta)
+                mejor[grupo] = np.maximum(mejor[grupo], bloque.max(axis=1))
+            ronda += 1
+            recorridas[pendientes] = ronda
+            if ronda >= len(codigos):
+                break
+            if ronda >= self.particiones_ruta:
+                pendientes = pendientes[mejor[pendientes] < self.umbral_ruta]
+        
+        return [(np.concatenate(filas[i]), np.concatenate(similitudes[i]), int(recorridas[i])) for i in range(n)]
+    
+    def tamano_etapa2(self, top_k):
+        """Ganadores a hidratar: con cross-encoder, los que se van a reordenar aunque top_k sea menor"""
+        if self.reordenador is None or top_k is None:
+            return top_k
+        return max(top_k, self.candidatos_reordenar)
+    
+    def reordenar(self, problema, ranking, top_k=None):
+        """
+        Reordena los primeros candidatos_reordenar casos del ranking con el
+        cross-encoder (si hay) y lo recorta a top_k
+        
+        El cross-encoder lee problema y caso juntos: más preciso que comparar
+        embeddings, pero cuesta una pasada del modelo por par, por eso va al
+        final y sobre pocos casos. La similitud de cada caso no cambia (la
+        confianza de la API sigue saliendo de ahí); el puntaje del
+        cross-encoder queda en 'puntaje_reordenador'.
+        """
+        if self.reordenador is not None and len(ranking) > 1 and self.candidatos_reordenar > 1:
+            cabeza = ranking[:self.candidatos_reordenar]
+            puntajes = self.reordenador.puntuar(problema, [caso['problema'] for caso in cabeza])
+            for caso, puntaje in zip(cabeza, puntajes):
+                caso['puntaje_reordenador'] = float(puntaje)
+            cabeza.sort(key=lambda caso: caso['puntaje_reordenador'], reverse=True)
+            ranking = cabeza + ranking[self.candidatos_reordenar:]
+        return ranking[:top_k] if top_k is not None else ranking
+    
+    def consulta_fts(self, problema):
+        """
+        Expresión MATCH de FTS5 para el problema: sus términos (3+ caracteres)
+        unidos con OR, cada uno entre comillas para que nada del texto se
+        interprete como sintaxis de FTS5
+        """
+        terminos = dict.fromkeys(t for t in re.findall(r'\w+', problema.lower()) if len(t) >= 3)
+        return ' OR '.join(f'"{termino}"' for termino in list(terminos)[:64])
+    
+    def buscar_bm25(self, problema):
+        """
+        Candidatos léxicos del índice FTS5 (sin recorrer la tabla)
+        
+        Returns:
+            (ids, puntajes BM25 positivos, mayor = mejor) de a lo sumo
+            candidatos_bm25 casos, o None si no hay índice o ningún término
+        """
+        if not self.fts_disponible or self.peso_bm25 <= 0 or self.candidatos_bm25 <= 0:
+            return None
+        consulta = self.consulta_fts(problema)
+        if not consulta:
+            return None
+        
+        # Pesos por columna (categoria, problema, sql): los nombres de tablas y campos están en el SQL
+        filas = self.conn.execute('''
+            SELECT rowid, -bm25(casos_fts, 0.5, 1.0, 2.0) AS puntaje FROM casos_fts
+            WHERE casos_fts MATCH ?
+            ORDER BY puntaje DESC
+            LIMIT ?
+        ''', (consulta, self.candidatos_bm25)).fetchall()
+        if not filas:
+            return None
+        ids, puntajes = zip(*filas)
+        return list(ids), np.asarray(puntajes, dtype=np.float32)
+    
+    def calcular_bonus_lexico(self, lexicos, filas):
+        """
+        Bonus BM25 (máximo peso_bm25) para las filas dadas
+        
+        Fusión ponderada: cada puntaje se divide por el mejor de la consulta
+        más saturacion_bm25, así el mejor candidato léxico recibe casi todo
+        el peso solo cuando la coincidencia es fuerte (términos raros).
+        """
+        bonus = np.zeros(len(filas), dtype=np.float32)
+        if lexicos is None:
+            return bonus
+        
+        ids, puntajes = lexicos
+        presentes = [i for i, caso_id in enumerate(ids) if caso_id in self.almacen]
+        if not presentes:
+            return bonus
+        escala = self.peso_bm25 / (float(puntajes.max()) + self.saturacion_bm25)
+        posiciones = self.almacen.filas(ids)
+        valores = np.maximum(puntajes[presentes], 0.0) * escala
+        
+        # Cruce de las filas candidatas con las posiciones BM25 (ordenadas) sin recorrer el almacén
+        orden = np.argsort(posiciones)
+        posiciones, valores = posiciones[orden], valores[orden]
+        indices = np.minimum(np.searchsorted(posiciones, filas), len(posiciones) - 1)
+        coinciden = posiciones[indices] == filas
+        bonus[coinciden] = valores[indices[coinciden]]
+        return bonus
+    
+    def armar_ranking(self, puntuados, textos):
+        """Diccionarios del ranking a partir de los ganadores de puntuar_consulta y sus textos"""
+        ranking = []
+        for caso_id, fila, total, ia, bonus, lexico in zip(*puntuados):
+            if caso_id not in textos:
+                continue
+            cat, prob_bd, sql, resp = textos[caso_id]
             ranking.append({
                 'id': caso_id,
                 'categoria': cat,
                 'problema': prob_bd,
                 'sql': sql,
                 'respuesta': resp,
-                'similitud': float(similitud_total),  # Convertir a float nativo
-                'similitud_ia': float(similitud_ia),
-                'bonus_conceptos': float(bonus_conceptos),
-                'complejidad': complejidad
+                'similitud': float(total),  # Convertir a float nativo
+                'similitud_ia': float(ia),
+                'bonus_conceptos': float(bonus),
+                'bonus_lexico': float(lexico),
+                'complejidad': int(self.almacen.complejidades[fila])
             })
+        return ranking
+    
+    def seleccionar_top_k(self, puntajes, top_k=None):
+        """
+        Retorna las posiciones de los top_k puntajes de mayor a menor
         
-        # Ordenar por similitud
-        ranking.sort(key=lambda x: x['similitud'], reverse=True)
+        Con top_k usa selección parcial (argpartition, O(N)) y solo ordena
+        los ganadores; sin top_k ordena todo (orden estable ante empates).
+        """
+        if top_k is None or top_k >= len(puntajes):
+            return np.argsort(-puntajes, kind='stable')
         
-        return ranking
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64)
+        
+        candidatos = np.argpartition(-puntajes, top_k - 1)[:top_k]
+        return candidatos[np.argsort(-puntajes[candidatos], kind='stable')]
     
     def extraer_valores(self, texto):
-        """Extrae valores del texto"""
+        """Extrae valores del texto (una sola pasada, ver extractor_valores.py)"""
+        registro = extraer(texto)
         valores = {}
         
         # Créditos
-        creditos = re.findall(r'\d{13,}', texto)
-        if creditos:
-            valores['credito'] = creditos[0]
+        credito = registro.primero('credito')
+        if credito:
+            valores['credito'] = credito
         
-        # IDs
-        ids = re.findall(r'(?:ID|id)[:\s]*(\d{5,})', texto, re.IGNORECASE)
+        # IDs (5+ dígitos)
+        ids = [valor for valor in registro.todos('id') if len(valor) >= 5]
         if ids:
             valores['id'] = ids[0]
         
         # Cédulas/NITs
-        cedulas = re.findall(r'(?:CC|NIT|cedula|nit)[:\s]*(\d+)', texto, re.IGNORECASE)
-        if cedulas:
-            valores['cedula'] = cedulas[0]
+        cedula = registro.primero('cedula')
+        if cedula:
+            valores['cedula'] = cedula
         
         # Nombres
-        nombres = re.findall(r'(?:Nombre|nombre)[:\s]+([A-Z][a-záéíóúñ]+(?:\s+[A-Z][a-záéíóúñ]+)*)', texto)
-        if nombres:
-            valores['nombre_completo'] = nombres[0]
+        nombre = registro.primero('nombre')
+        if nombre:
+            valores['nombre_completo'] = nombre
         
         # Valores monetarios
-        montos = re.findall(r'\$\s*([\d,.]+)', texto)
+        montos = registro.montos()
         if montos:
-            valores['montos'] = [m.replace(',', '').replace('.', '') for m in montos]
+            valores['montos'] = montos
         
         # Estados
-        estados = re.findall(r'estado[:\s]+([A-Z][a-záéíóúñ\s]+)', texto, re.IGNORECASE)
-        if estados:
-            valores['estado'] = estados[0].strip()
+        estado = registro.primero('estado_texto')
+        if estado:
+            valores['estado'] = estado
         
         return valores
     
@@ -378,30 +1671,110 @@ class SistemaPQRSIA:
     
     def guardar_caso_nuevo(self, categoria, problema, sql, respuesta):
         """Guarda un caso nuevo"""
+        self.esperar_listo()
         conceptos = self.extraer_conceptos_clave(problema)
         conceptos_str = ','.join(conceptos)
         complejidad = self.detectar_complejidad(problema)
         
-        c = self.conn.cursor()
-        c.execute('''
-            INSERT INTO casos (categoria, problema, sql, respuesta, conceptos_clave, complejidad)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (categoria or "General", problema, sql, respuesta, conceptos_str, complejidad))
-        self.conn.commit()
+        def insertar(conn):
+            version_antes = self.leer_version_casos(conn)
+            c = conn.execute('''
+                INSERT INTO casos (categoria, problema, sql, respuesta, conceptos_clave, complejidad)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (categoria or "General", problema, sql, respuesta, conceptos_str, complejidad))
+            return version_antes, c.lastrowid
         
-        caso_id = c.lastrowid
-        
-        # Generar embedding
-        self.calcular_embedding_caso(caso_id, problema)
+        with self._lock_cambios:
+            version_antes, caso_id = self.pool.escribir(insertar)
+            
+            # Generar embedding y sumarlo al almacén / índice (solo en memoria: el
+            # índice se guarda con el próximo snapshot, ver programar_snapshot)
+            self.agregar_al_almacen(caso_id, categoria or "General", problema, conceptos_str, complejidad)
+            if self.indice_ann is not None:
+                with self._lock:
+                    self.indice_ann.agregar(caso_id, self.almacen.embedding(caso_id))
+            self.registrar_cambio_propio(version_antes, 1)
         
         return caso_id
     
+    def borrar_caso(self, caso_id):
+        """Borra un caso de la base de datos, el almacén en memoria y el índice ANN"""
+        self.esperar_listo()
+        def eliminar(conn):
+            version_antes = self.leer_version_casos(conn)
+            return version_antes, conn.execute('DELETE FROM casos WHERE id = ?', (caso_id,)).rowcount
+        
+        with self._lock_cambios:
+            version_antes, borrados = self.pool.escribir(eliminar)
+            
+            # El embedding se queda en el almacén (indexado por texto) hasta la próxima compactación
+            with self._lock:
+                self.casos_pendientes.discard(caso_id)
+                self.almacen.quitar(caso_id)
+                if self.indice_ann is not None:
+                    self.indice_ann.eliminar(caso_id)
+            self.registrar_cambio_propio(version_antes, borrados)
+        
+        return borrados > 0
+    
     def obtener_todos_casos(self):
         """Obtiene todos los casos de la base de datos"""
         c = self.conn.cursor()
         c.execute('SELECT * FROM casos')
         return c.fetchall()
     
+    def consultar_casos(self, campos=None, categoria=None, despues_de=0, limite=100):
+        """
+        Una página de casos ordenada por id, filtrada y paginada en SQLite
+        
+        Args:
+            campos: Columnas a traer (de CAMPOS_CASOS); el id siempre va primero
+            categoria: Filtrar por categoría (usa idx_casos_categoria)
+            despues_de: Cursor keyset: solo casos con id mayor a este
+            limite: Tamaño de la página
+        
+        Returns:
+            Lista de tuplas con las columnas en el orden de campos
+        """
+        campos = ['id'] + [campo for campo in (campos or CAMPOS_CASOS) if campo != 'id']
+        invalidos = set(campos) - set(CAMPOS_CASOS)
+        if invalidos:
+            raise ValueError(f"Campos desconocidos: {', '.join(sorted(invalidos))}")
+        
+        condiciones, parametros = ['id > ?'], [despues_de]
+        if categoria is not None:
+            condiciones.append('categoria = ?')
+            parametros.append(categoria)
+        
+        consulta = (f"SELECT {', '.join(campos)} FROM casos "
+                    f"WHERE {' AND '.join(condiciones)} ORDER BY id LIMIT ?")
+        return self.conn.execute(consulta, parametros + [limite]).fetchall()
+    
+    def contar_casos(self, categoria=None):
+        """Total de casos (de una categoría), desde los contadores de estadisticas_categorias"""
+        conteo = self.casos_por_categoria()
+        if categoria is None:
+            return sum(conteo.values())
+        return conteo.get(categoria, 0)
+    
+    def casos_por_categoria(self):
+        """{categoría: casos}, mantenido por triggers (no recorre la tabla casos)"""
+        return dict(self.conn.execute('SELECT categoria, casos FROM estadisticas_categorias ORDER BY categoria').fetchall())
+    
+    def iterar_casos(self, campos=None, categoria=None, despues_de=0, bloque=500):
+        """
+        Recorre los casos por páginas de consultar_casos (sin cargar la tabla completa)
+        
+        Cada página es una consulta aparte, así no queda un cursor abierto
+        sobre la conexión compartida mientras se consume el generador.
+        """
+        while True:
+            filas = self.consultar_casos(campos, categoria, despues_de, bloque)
+            if not filas:
+                return
+            yield from filas
+            despues_de = filas[-1][0]
+    
     def agregar_caso(self, categoria, problema, sql, respuesta):
         """
         Agrega un nuevo caso a la base de datos
@@ -419,3 +1792,13 @@ class SistemaPQRSIA:
 
 # Para compatibilidad con el código anterior
 SistemaPQRSUltra = SistemaPQRSIA
+
+
+if __name__ == '__main__':
+    import sys
+    
+    # Carga masiva: python sistema_pqrs_v4_ia.py archivo.txt
+    if len(sys.argv) > 1:
+        SistemaPQRSIA().cargar_desde_archivo(sys.argv[1])
+    else:
+        print("Uso: python sistema_pqrs_v4_ia.py <archivo_pqrs.txt>")
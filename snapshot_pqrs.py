@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════
+  SNAPSHOT DEL ESTADO DE BÚSQUEDA - Sistema PQRS
+
+  Un solo archivo, mapeable a memoria, con todo lo que necesita la
+  búsqueda para arrancar sin reconstruir nada:
+  - columnas del almacén de casos (ids, categorías, complejidad, bitsets)
+  - matriz de embeddings normalizados
+  - índice ANN serializado (si hay)
+
+  Formato (little-endian):
+      [8s  magia 'PQRSSNAP']
+      [u32 versión del formato]
+      [u32 crc32 de la cabecera]
+      [u64 largo de la cabecera]
+      [cabecera JSON: meta + tabla de arrays (offset, dtype, shape, crc32)]
+      [arrays alineados a 64 bytes]
+
+  Se escribe a un archivo temporal y se reemplaza con os.replace: un
+  proceso que tenga mapeado el snapshot viejo no se ve afectado.
+═══════════════════════════════════════════════════════════════════
+"""
+
+import os
+import json
+import zlib
+import struct
+import numpy as np
+
+MAGIA = b'PQRSSNAP'
+VERSION_FORMATO = 1
+_PREFIJO = struct.Struct('<8sIIQ')
+_ALINEACION = 64
+
+
+def _alinear(posicion):
+    return (posicion + _ALINEACION - 1) // _ALINEACION * _ALINEACION
+
+
+def guardar_snapshot(ruta, meta, arrays):
+    """
+    Escribe el snapshot de forma atómica
+
+    Args:
+        ruta: Archivo destino
+        meta: Diccionario serializable a JSON
+        arrays: {nombre: np.ndarray}
+    """
+    tabla = {}
+    offset = 0
+    contiguos = {}
+    for nombre, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        contiguos[nombre] = array
+        tabla[nombre] = {
+            'offset': offset,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'crc32': zlib.crc32(array.data) if array.nbytes else 0,
+        }
+        offset = _alinear(offset + array.nbytes)
+
+    cabecera = json.dumps({'meta': meta, 'arrays': tabla}).encode('utf-8')
+    inicio_datos = _alinear(_PREFIJO.size + len(cabecera))
+
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(_PREFIJO.pack(MAGIA, VERSION_FORMATO, zlib.crc32(cabecera), len(cabecera)))
+        f.write(cabecera)
+        for nombre, array in contiguos.items():
+            f.seek(inicio_datos + tabla[nombre]['offset'])
+            f.write(array.data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def cargar_snapshot(ruta):
+    """
+    Mapea el snapshot a memoria y verifica formato y checksums
+
+    Returns:
+        (meta, arrays): los arrays son vistas de solo lectura sobre el archivo
+
+    Raises:
+        ValueError: si el archivo no es un snapshot válido o está dañado
+    """
+    datos = np.memmap(ruta, dtype=np.uint8, mode='r')
+    if len(datos) < _PREFIJO.size:
+        raise ValueError("archivo truncado")
+
+    magia, version, crc_cabecera, largo = _PREFIJO.unpack(bytes(datos[:_PREFIJO.size]))
+    if magia != MAGIA:
+        raise ValueError("no es un snapshot PQRS")
+    if version != VERSION_FORMATO:
+        raise ValueError(f"versión de formato {version} (se esperaba {VERSION_FORMATO})")
+
+    cabecera = bytes(datos[_PREFIJO.size:_PREFIJO.size + largo])
+    if len(cabecera) != largo or zlib.crc32(cabecera) != crc_cabecera:
+        raise ValueError("cabecera dañada")
+    cabecera = json.loads(cabecera.decode('utf-8'))
+    inicio_datos = _alinear(_PREFIJO.size + largo)
+
+    arrays = {}
+    for nombre, info in cabecera['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        n_bytes = int(np.prod(info['shape'], dtype=np.int64)) * dtype.itemsize
+        inicio = inicio_datos + info['offset']
+        crudo = datos[inicio:inicio + n_bytes]
+        if len(crudo) != n_bytes:
+            raise ValueError(f"array '{nombre}' truncado")
+        if n_bytes and zlib.crc32(crudo) != info['crc32']:
+            raise ValueError(f"checksum de '{nombre}' no coincide")
+        arrays[nombre] = crudo.view(dtype).reshape(info['shape'])
+
+    return cabecera['meta'], arrays
@@ -0,0 +1,79 @@
+"""
+Fixtures compartidas de las pruebas del Sistema PQRS
+
+El modelo de embeddings se reemplaza por un codificador determinista
+(bolsa de palabras con hash) para que las pruebas no dependan de torch
+ni descarguen nada; todo lo demás (SQLite, almacén, índices) es el real.
+"""
+
+import re
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+DIMENSION = 64
+
+
+class CodificadorHash:
+    """Codificador de prueba: cada palabra suma 1 en la dimensión de su crc32"""
+
+    backend = 'prueba'
+
+    def encode(self, textos, batch_size=32, convert_to_numpy=True):
+        unico = isinstance(textos, str)
+        if unico:
+            textos = [textos]
+        matriz = np.full((len(textos), DIMENSION), 0.01, dtype=np.float32)
+        for i, texto in enumerate(textos):
+            for palabra in re.findall(r'\w+', texto.lower()):
+                matriz[i, zlib.crc32(palabra.encode()) % DIMENSION] += 1.0
+        return matriz[0] if unico else matriz
+
+
+def bloque_pqrs(numero, categoria, problema, sql, respuesta='Caso resuelto.'):
+    """Un caso en el formato de PQRS_NUEVAS_CON_SQL.txt"""
+    return (f"===== PQRS {numero} =====\n"
+            f"CATEGORÍA: {categoria}\n\n"
+            f"--- PROBLEMA ---\n{problema}\n\n"
+            f"--- SOLUCIÓN ---\n{respuesta}\n\n"
+            f"--- SOLUCIÓN TÉCNICA (SQL) ---\n{sql}\n\n"
+            f"========================\n")
+
+
+@pytest.fixture
+def crear_sistema(tmp_path, monkeypatch):
+    """
+    Fábrica de SistemaPQRSIA sobre una BD vacía en tmp_path
+
+    Las variables de entorno PQRS_* que se pasen como argumentos con
+    nombre se fijan antes de crear el sistema.
+    """
+    import sistema_pqrs_v4_ia
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('PQRS_SNAPSHOT', '0')
+    monkeypatch.setattr(sistema_pqrs_v4_ia, 'crear_codificador', lambda *args: CodificadorHash())
+    creados = []
+
+    def crear(**entorno):
+        for nombre, valor in entorno.items():
+            monkeypatch.setenv(nombre, str(valor))
+        sistema = sistema_pqrs_v4_ia.SistemaPQRSIA()
+        creados.append(sistema)
+        return sistema
+
+    yield crear
+
+    for sistema in creados:
+        if sistema._timer_snapshot is not None:
+            sistema._timer_snapshot.cancel()
+        if sistema.hilo_reembebido is not None:
+            sistema.hilo_reembebido.join()
+        sistema.registro_resoluciones.volcar()
+        sistema.pool.cerrar()
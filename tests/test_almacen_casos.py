@@ -0,0 +1,50 @@
+"""Almacén columnar: versiones congeladas (copy-on-write) para leer sin lock"""
+
+import numpy as np
+
+from almacen_casos import AlmacenCasos
+from almacen_embeddings import AlmacenEmbeddings, clave_texto
+
+
+def almacen_con_casos(tmp_path, n=10, dimension=8):
+    embeddings = AlmacenEmbeddings(str(tmp_path / 'embeddings'))
+    rng = np.random.default_rng(0)
+    textos = [f'Problema {i} del credito {5800325002950000 + i}' for i in range(n + 5)]
+    matriz = rng.standard_normal((len(textos), dimension)).astype(np.float32)
+    embeddings.agregar_lote([clave_texto(texto) for texto in textos], matriz / np.linalg.norm(matriz, axis=1, keepdims=True))
+
+    almacen = AlmacenCasos(embeddings)
+    for i in range(n):
+        almacen.agregar(i, f'Categoria{i % 2}', 1, clave_texto(textos[i]), textos[i], 'credito,estado')
+    return almacen, textos
+
+
+def test_congelado_no_ve_altas_bajas_ni_reemplazos(tmp_path):
+    almacen, textos = almacen_con_casos(tmp_path)
+    congelado = almacen.congelar()
+    antes = (congelado.ids.copy(), congelado.matriz_embeddings.copy(), dict(congelado.posicion))
+
+    almacen.quitar(0)                                        # mueve la última fila al hueco
+    almacen.agregar(3, 'Nueva', 2, clave_texto(textos[12]), textos[12], 'factura')
+    almacen.agregar(20, 'Categoria0', 1, clave_texto(textos[13]), textos[13], '')
+
+    np.testing.assert_array_equal(congelado.ids, antes[0])
+    np.testing.assert_array_equal(congelado.matriz_embeddings, antes[1])
+    assert congelado.posicion == antes[2]
+    assert congelado.filas_con_numeros({'5800325002950000'}).tolist() == [0]
+    assert 'Nueva' not in congelado.codigo_categoria and 'factura' not in congelado.vocabulario_conceptos
+
+    assert set(almacen.posicion) == set(range(1, 10)) | {20}
+    assert almacen.categorias[almacen.codigos_categoria[almacen.posicion[3]]] == 'Nueva'
+    assert almacen.filas_con_numeros({'5800325002950000'}).tolist() == []
+
+
+def test_congelar_sin_cambios_entrega_la_misma_version(tmp_path):
+    almacen, textos = almacen_con_casos(tmp_path)
+    assert almacen.congelar() is almacen.congelar()
+
+    buffer = almacen._buffers['embeddings']
+    almacen.congelar()
+    almacen.agregar(30, 'Categoria1', 1, clave_texto(textos[11]), textos[11], '')
+    # Agregar escribe después de las filas que ve la versión congelada: no copia las columnas
+    assert almacen._buffers['embeddings'] is buffer
@@ -0,0 +1,147 @@
+"""
+Almacén binario de embeddings compartido entre procesos (workers de gunicorn)
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import almacen_embeddings
+from almacen_embeddings import AlmacenEmbeddings
+
+DIMENSION = 16
+
+requiere_fork = pytest.mark.skipif(not hasattr(os, 'fork') or almacen_embeddings.fcntl is None,
+                                   reason="necesita fork y fcntl")
+
+
+def vector_de(clave):
+    """Vector unitario que depende solo de la clave: permite verificar que filas y claves coinciden"""
+    vector = np.random.default_rng(clave % 2**32).standard_normal(DIMENSION).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def agregar(almacen, claves):
+    return almacen.agregar_lote(list(claves), np.stack([vector_de(clave) for clave in claves]))
+
+
+def assert_alineado(almacen, claves):
+    assert set(claves) <= set(almacen.fila_clave)
+    for clave in claves:
+        np.testing.assert_array_equal(almacen.vector(clave), vector_de(clave))
+
+
+@pytest.fixture
+def ruta_base(tmp_path):
+    return str(tmp_path / 'embeddings')
+
+
+# ─── Lock entre procesos ─────────────────────────────────────────
+
+@requiere_fork
+@pytest.mark.parametrize('operacion', [
+    lambda almacen: agregar(almacen, range(4, 8)),
+    lambda almacen: almacen.compactar(range(8)),
+], ids=['agregar', 'compactar'])
+def test_lock_excluye_al_proceso_hijo(ruta_base, operacion):
+    almacen = AlmacenEmbeddings(ruta_base)
+    agregar(almacen, range(4))                   # el padre ya escribió antes del fork
+
+    tomado_r, tomado_w = os.pipe()
+    soltar_r, soltar_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with almacen._bloqueo():
+                os.write(tomado_w, b'1')
+                os.read(soltar_r, 1)
+        finally:
+            os._exit(0)
+
+    os.read(tomado_r, 1)
+    hilo = threading.Thread(target=operacion, args=(almacen,))
+    hilo.start()
+    try:
+        hilo.join(0.3)
+        bloqueado = hilo.is_alive()
+    finally:
+        os.write(soltar_w, b'1')
+        os.waitpid(pid, 0)
+    assert bloqueado, "el padre escribió mientras el hijo tenía el lock"
+
+    hilo.join(5)
+    assert not hilo.is_alive()
+    assert_alineado(almacen, range(4))
+    assert_alineado(AlmacenEmbeddings(ruta_base), range(4))
+
+
+@requiere_fork
+def test_escrituras_concurrentes_quedan_alineadas(ruta_base):
+    almacen = AlmacenEmbeddings(ruta_base)
+    agregar(almacen, [0])
+
+    pids = []
+    for proceso in range(3):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for inicio in range(1000 * (proceso + 1), 1000 * (proceso + 1) + 200, 5):
+                    agregar(almacen, range(inicio, inicio + 5))
+                almacen.cerrar()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        assert os.waitpid(pid, 0)[1] == 0
+
+    almacen.refrescar()
+    escritas = [0] + [clave for proceso in range(3) for clave in range(1000 * (proceso + 1), 1000 * (proceso + 1) + 200)]
+    assert almacen.n_filas == len(escritas)
+    assert_alineado(almacen, escritas)
+    assert_alineado(AlmacenEmbeddings(ruta_base), escritas)
+
+
+# ─── Compactación ────────────────────────────────────────────────
+
+def test_compactar_publica_vectores_y_claves_juntos(ruta_base):
+    almacen = AlmacenEmbeddings(ruta_base)
+    otro = AlmacenEmbeddings(ruta_base)                # otro worker sobre los mismos archivos
+    agregar(almacen, range(100))
+    otro.refrescar()
+    agregar(otro, [500, 501])                          # el primero todavía no las vio
+
+    viejos = (almacen.ruta_vectores, almacen.ruta_claves)
+    almacen.compactar(range(0, 100, 2))
+
+    assert almacen.generacion == 1
+    assert not any(os.path.exists(ruta) for ruta in viejos)
+    assert set(almacen.fila_clave) == set(range(0, 100, 2)) | {500, 501}
+    assert_alineado(almacen, list(range(0, 100, 2)) + [500, 501])
+
+    # El otro worker detecta la generación nueva y sigue agregando sobre ella
+    otro.refrescar()
+    assert otro.generacion == 1 and otro.n_filas == almacen.n_filas
+    agregar(otro, [600])
+    almacen.refrescar()
+    assert_alineado(almacen, [0, 98, 501, 600])
+    assert_alineado(AlmacenEmbeddings(ruta_base), [0, 98, 501, 600])
+
+
+def test_almacen_sin_generacion_se_sigue_leyendo(ruta_base):
+    almacen = AlmacenEmbeddings(ruta_base)
+    agregar(almacen, range(10))
+    almacen.cerrar()
+
+    # .json escrito antes de existir las generaciones
+    with open(almacen.ruta_meta, encoding='utf-8') as f:
+        meta = json.load(f)
+    del meta['generacion']
+    with open(almacen.ruta_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    copia = AlmacenEmbeddings(ruta_base)
+    assert copia.generacion == 0 and copia.ruta_vectores == ruta_base + f'-{copia.huella}.f32'
+    assert_alineado(copia, range(10))
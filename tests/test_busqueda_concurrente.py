@@ -0,0 +1,86 @@
+"""
+Búsquedas concurrentes con altas y bajas: se puntúa e hidrata sobre una
+versión congelada del almacén, sin tomar el lock del sistema
+"""
+
+import threading
+
+import pytest
+
+from conftest import bloque_pqrs
+
+
+@pytest.fixture(params=['exacto', 'ivf'])
+def sistema(request, crear_sistema, tmp_path):
+    sistema = crear_sistema(PQRS_INDICE_ANN=request.param, PQRS_ENRUTAR_DESDE=50)
+    archivo = tmp_path / 'casos.txt'
+    archivo.write_text(''.join(
+        bloque_pqrs(i, f'Categoria{i % 4}', f'Problema {i} tema{i % 4} del credito {5800325002950000 + i}', f'SELECT {i}')
+        for i in range(120)
+    ), encoding='utf-8')
+    sistema.cargar_desde_archivo(str(archivo))
+    sistema.preparar_indice_ann()
+    return sistema
+
+
+def lock_libre(sistema):
+    """True si otro hilo puede tomar el lock del sistema en este momento"""
+    libre = []
+    hilo = threading.Thread(target=lambda: libre.append(sistema._lock.acquire(timeout=1)) or sistema._lock.release())
+    hilo.start()
+    hilo.join()
+    return libre == [True]
+
+
+def test_puntuar_e_hidratar_sin_el_lock(sistema, monkeypatch):
+    estados = []
+    hidratar = sistema.hidratar_casos
+    puntuar = sistema.puntuar_consulta
+    monkeypatch.setattr(sistema, 'hidratar_casos', lambda ids: estados.append(('hidratar', lock_libre(sistema))) or hidratar(ids))
+    monkeypatch.setattr(sistema, 'puntuar_consulta',
+                        lambda *args, **kwargs: estados.append(('puntuar', lock_libre(sistema))) or puntuar(*args, **kwargs))
+
+    sistema.buscar_similar_ia('tema1 credito', top_k=3)
+    sistema.buscar_similar_ia_lote(['tema1 credito', 'tema2'], top_k=3)
+
+    assert estados == [('puntuar', True), ('hidratar', True), ('puntuar', True), ('puntuar', True), ('hidratar', True)]
+
+
+def test_busquedas_durante_altas_y_bajas(sistema):
+    errores = []
+    fin = threading.Event()
+
+    def escribir():
+        try:
+            for i in range(60):
+                caso_id = sistema.guardar_caso_nuevo(f'Categoria{i % 4}', f'Caso nuevo {i} tema{i % 4}', 'SELECT 1', 'ok')
+                if i % 2:
+                    sistema.borrar_caso(caso_id)
+                    sistema.borrar_caso(sorted(sistema.almacen.posicion)[0])
+        except Exception as e:
+            errores.append(e)
+        finally:
+            fin.set()
+
+    def buscar():
+        try:
+            while not fin.is_set():
+                for ranking in [sistema.buscar_similar_ia('tema2 del credito', top_k=5)] + \
+                        sistema.buscar_similar_ia_lote(['tema1', 'Caso nuevo tema3', 'credito 5800325002950007'], top_k=5):
+                    assert ranking and len({caso['id'] for caso in ranking}) == len(ranking)
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=escribir)] + [threading.Thread(target=buscar) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(60)
+
+    assert errores == []
+    vivos = set(sistema.almacen.posicion)
+    assert len(vivos) == 120 + 30 - 30
+    if sistema.indice_ann is not None:
+        assert sistema.indice_ann.ids() == vivos
+    ranking = sistema.buscar_similar_ia('Caso nuevo 58 tema2', top_k=5)
+    assert 'Caso nuevo 58 tema2' in [caso['problema'] for caso in ranking]
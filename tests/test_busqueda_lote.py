@@ -0,0 +1,80 @@
+"""Búsqueda por lote con enrutamiento por categoría: una GEMM por partición"""
+
+import numpy as np
+import pytest
+
+from conftest import bloque_pqrs
+
+TEMAS = {
+    'Estados': 'estado liquidacion vendedor',
+    'Comisiones': 'comision concesionario valor',
+    'Certificados': 'certificado reteiva proveedor',
+    'Facturas': 'factura pagada anulada',
+    'Usuarios': 'usuario clave bloqueado',
+    'Pagos': 'pago transferencia banco',
+}
+
+CONSULTAS = [
+    'estado liquidacion vendedor credito 5800325002950003',
+    'comision concesionario valor',
+    'certificado reteiva proveedor nit',
+    'usuario bloqueado',
+    'algo que no se parece a nada',
+    'pago banco factura',
+]
+
+
+@pytest.fixture
+def sistema_enrutado(crear_sistema, tmp_path):
+    sistema = crear_sistema(PQRS_ENRUTAR_DESDE=100)
+    archivo = tmp_path / 'casos.txt'
+    archivo.write_text(''.join(
+        bloque_pqrs(i, categoria, f'{tema} caso {i} credito {5800325002950000 + i}', f'SELECT {i}')
+        for i in range(40)
+        for categoria, tema in TEMAS.items()
+    ), encoding='utf-8')
+    sistema.cargar_desde_archivo(str(archivo))
+    assert sistema.enrutar(5)
+    return sistema
+
+
+def test_lote_enrutado_igual_a_consultas_sueltas(sistema_enrutado):
+    sistema = sistema_enrutado
+    lote = sistema.buscar_similar_ia_lote(CONSULTAS, top_k=5)
+
+    def casos(ranking):
+        # Los empates exactos pueden salir en otro orden
+        return sorted((round(caso['similitud'], 5), caso['id']) for caso in ranking)
+
+    for consulta, ranking in zip(CONSULTAS, lote):
+        assert casos(ranking) == casos(sistema.buscar_similar_ia(consulta, top_k=5))
+
+
+def test_rutas_por_lote_iguales_a_buscar_en_particiones(sistema_enrutado):
+    sistema = sistema_enrutado
+    matriz = sistema.embeddings_consultas(CONSULTAS)
+
+    for sistema.particiones_ruta, sistema.umbral_ruta in ((1, 0.6), (2, 0.6), (1, 1.1)):
+        rutas = sistema.buscar_en_particiones_lote(matriz)
+        for vector, (filas, similitudes, recorridas) in zip(matriz, rutas):
+            filas_suelta, similitudes_suelta, recorridas_suelta = sistema.buscar_en_particiones(vector)
+            assert recorridas == recorridas_suelta
+            np.testing.assert_array_equal(filas, filas_suelta)
+            np.testing.assert_allclose(similitudes, similitudes_suelta, atol=1e-5)
+
+
+def test_una_gemm_por_particion_y_ronda(sistema_enrutado, monkeypatch):
+    sistema = sistema_enrutado
+    llamadas = []
+    original = sistema.almacen.similitudes_filas_lote
+    monkeypatch.setattr(sistema.almacen, 'similitudes_filas_lote',
+                        lambda matriz, filas: llamadas.append(len(matriz)) or original(matriz, filas))
+    monkeypatch.setattr(sistema.almacen, 'similitudes_lote',
+                        lambda matriz: pytest.fail("GEMM contra todo el corpus con enrutamiento"))
+
+    consultas = CONSULTAS[:4] * 8
+    sistema.buscar_similar_ia_lote(consultas, top_k=5)
+
+    # Las 32 consultas caen en a lo sumo 4 particiones en la primera ronda
+    assert sum(llamadas) >= len(consultas)
+    assert len(llamadas) < len(consultas)
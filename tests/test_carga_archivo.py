@@ -0,0 +1,103 @@
+"""Carga masiva desde archivo con el sistema ya andando (almacén construido)"""
+
+import threading
+import time
+
+from conftest import bloque_pqrs
+from indice_ann import cargar_indice
+
+
+def escribir_archivo(ruta, casos):
+    ruta.write_text(''.join(bloque_pqrs(10000 + i, *caso) for i, caso in enumerate(casos)), encoding='utf-8')
+    return str(ruta)
+
+
+def test_carga_con_almacen_construido_llega_a_la_busqueda(crear_sistema, tmp_path):
+    sistema = crear_sistema()
+    assert sistema.almacen is not None and len(sistema.almacen) == 0
+
+    archivo = escribir_archivo(tmp_path / 'lote1.txt', [
+        ('Estados', 'Cambiar el estado de liquidacion del vendedor del credito 5800325002956151 a 77',
+         "UPDATE liquidacion SET EstadoLiquidacionVendedor = 77 WHERE creditnumber = '5800325002956151'"),
+        ('Certificados', 'Regenerar el certificado de ReteIVA del proveedor con NIT 900838904',
+         "UPDATE certificatefileuser SET valorbase = 356093 WHERE userid = 55249"),
+    ])
+    assert sistema.cargar_desde_archivo(archivo) == 2
+    assert len(sistema.almacen) == 2
+
+    # Segunda carga sobre un almacén que ya tiene casos
+    archivo = escribir_archivo(tmp_path / 'lote2.txt', [
+        ('Comisiones', 'Ajustar la comision del concesionario para el credito 5800325002956999',
+         "UPDATE comision SET ValueCommission = 250000 WHERE creditnumber = '5800325002956999'"),
+    ])
+    assert sistema.cargar_desde_archivo(archivo) == 1
+    assert len(sistema.almacen) == 3
+
+    ranking = sistema.buscar_similar_ia('comision del concesionario credito 5800325002956999', top_k=1)
+    assert ranking[0]['categoria'] == 'Comisiones'
+
+    # El almacén quedó al día con la tabla: la próxima búsqueda no resincroniza
+    assert sistema.version_casos == sistema.leer_version_casos()
+
+
+def test_carga_suma_al_indice_ann(crear_sistema, tmp_path):
+    sistema = crear_sistema(PQRS_INDICE_ANN='ivf')
+    archivo = escribir_archivo(tmp_path / 'lote.txt', [
+        (f'Categoria{i % 3}', f'Problema numero {i} con el credito {5800325002950000 + i}', f'SELECT {i}')
+        for i in range(40)
+    ])
+    sistema.cargar_desde_archivo(archivo)
+    sistema.preparar_indice_ann()
+    assert sistema.indice_ann.ids() == set(sistema.almacen.posicion)
+
+    archivo = escribir_archivo(tmp_path / 'otro.txt', [('Estados', 'Un caso nuevo despues del indice', 'SELECT 1')])
+    sistema.cargar_desde_archivo(archivo)
+    assert sistema.indice_ann.ids() == set(sistema.almacen.posicion)
+
+
+def test_altas_y_bajas_guardan_el_indice_una_vez_y_sin_lock(crear_sistema, tmp_path, monkeypatch):
+    sistema = crear_sistema(PQRS_INDICE_ANN='ivf', PQRS_SNAPSHOT_DEMORA=0.2)
+    sistema.cargar_desde_archivo(escribir_archivo(tmp_path / 'lote.txt', [
+        ('Estados', f'Problema numero {i} con el credito {5800325002950000 + i}', f'SELECT {i}') for i in range(20)
+    ]))
+    sistema.preparar_indice_ann()
+
+    guardados = []
+    original = type(sistema.indice_ann).guardar
+
+    def guardar(indice, ruta):
+        # Desde otro hilo: el lock del sistema tiene que estar libre mientras se serializa
+        libre = []
+        hilo = threading.Thread(target=lambda: libre.append(sistema._lock.acquire(timeout=1)) or sistema._lock.release())
+        hilo.start()
+        hilo.join()
+        guardados.append((indice is sistema.indice_ann, libre == [True], set(indice.ids())))
+        original(indice, ruta)
+
+    monkeypatch.setattr(type(sistema.indice_ann), 'guardar', guardar)
+
+    nuevos = [sistema.guardar_caso_nuevo('Estados', f'Caso nuevo {i}', 'SELECT 1', 'ok') for i in range(5)]
+    sistema.borrar_caso(nuevos[0])
+    assert guardados == []
+
+    time.sleep(0.6)
+    assert guardados == [(False, True, set(sistema.almacen.posicion))]
+    assert cargar_indice('ivf', sistema.indice_file).ids() == set(sistema.almacen.posicion)
+
+
+def test_snapshot_de_la_version_congelada_se_vuelve_a_cargar(crear_sistema, tmp_path):
+    sistema = crear_sistema(PQRS_INDICE_ANN='ivf', PQRS_SNAPSHOT=1)
+    sistema.cargar_desde_archivo(escribir_archivo(tmp_path / 'lote.txt', [
+        (f'Categoria{i % 3}', f'Problema numero {i} con el credito {5800325002950000 + i}', f'SELECT {i}')
+        for i in range(30)
+    ]))
+    sistema.preparar_indice_ann()
+    sistema.guardar_snapshot()
+    # Cambios después de congelar no entran en el snapshot ya escrito
+    sistema.borrar_caso(sorted(sistema.almacen.posicion)[0])
+
+    copia = crear_sistema(PQRS_INDICE_ANN='ivf', PQRS_SNAPSHOT=1)
+    assert set(copia.almacen.posicion) == set(sistema.almacen.posicion)
+    assert copia.indice_ann.ids() == set(sistema.almacen.posicion)
+    ranking = copia.buscar_similar_ia('credito 5800325002950007', top_k=1)
+    assert ranking[0]['problema'].startswith('Problema numero 7 ')
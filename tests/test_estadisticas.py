@@ -0,0 +1,58 @@
+"""Cifras de /api/estadisticas: contadores de resoluciones y de casos por categoría"""
+
+import pytest
+
+
+def test_proporcion_por_banda_es_parte_del_total(crear_sistema):
+    registro = crear_sistema().registro_resoluciones
+    for confianza in ['alta'] * 3 + ['media', 'baja'] * 2:
+        registro.registrar(True, confianza, latencia_ms=10)
+    registro.registrar(False, latencia_ms=10)
+    registro.volcar()
+    registro.registrar(True, 'alta', latencia_ms=10)      # sin volcar todavía
+
+    resumen = registro.resumen()
+    assert resumen['total'] == 9
+    assert resumen['por_confianza']['alta'] == {'resoluciones': 4, 'proporcion': pytest.approx(44.44)}
+    assert resumen['sin_resultado'] == {'resoluciones': 1, 'proporcion': pytest.approx(11.11)}
+    partes = [banda['proporcion'] for banda in resumen['por_confianza'].values()]
+    assert sum(partes) + resumen['sin_resultado']['proporcion'] == pytest.approx(100, abs=0.05)
+
+
+def conteo_real(sistema):
+    return dict(sistema.conn.execute(
+        "SELECT COALESCE(categoria, ''), COUNT(*) FROM casos GROUP BY COALESCE(categoria, '')").fetchall())
+
+
+def test_contadores_por_categoria_siguen_a_la_tabla(crear_sistema):
+    sistema = crear_sistema()
+    ids = [sistema.guardar_caso_nuevo(categoria, f'Problema {i}', 'SELECT 1', 'ok')
+           for i, categoria in enumerate(['Estados', 'Estados', 'Comisiones', None])]
+    assert sistema.casos_por_categoria() == {'Estados': 2, 'Comisiones': 1, 'General': 1}
+
+    sistema.borrar_caso(ids[2])
+    assert sistema.casos_por_categoria() == {'Estados': 2, 'General': 1}
+
+    def editar(conn):
+        conn.execute("UPDATE casos SET categoria = 'Pagos' WHERE id = ?", (ids[0],))
+        conn.execute("UPDATE casos SET categoria = NULL WHERE id = ?", (ids[1],))
+        conn.execute("UPDATE casos SET problema = 'Otro texto' WHERE id = ?", (ids[3],))
+    sistema.pool.escribir(editar)
+    assert sistema.casos_por_categoria() == {'Pagos': 1, '': 1, 'General': 1} == conteo_real(sistema)
+
+
+def test_bd_anterior_a_los_contadores_cuenta_una_vez(crear_sistema):
+    sistema = crear_sistema()
+    for categoria in ['Estados', 'Estados', 'Facturas']:
+        sistema.guardar_caso_nuevo(categoria, 'Problema', 'SELECT 1', 'ok')
+
+    def quitar_contadores(conn):
+        conn.execute('DROP TABLE estadisticas_categorias')
+    sistema.pool.escribir(quitar_contadores)
+    sistema.registro_resoluciones.volcar()
+    sistema.pool.cerrar()
+
+    sistema = crear_sistema()
+    assert sistema.casos_por_categoria() == {'Estados': 2, 'Facturas': 1}
+    sistema.guardar_caso_nuevo('Facturas', 'Otro problema', 'SELECT 1', 'ok')
+    assert sistema.casos_por_categoria() == {'Estados': 2, 'Facturas': 2} == conteo_real(sistema)
@@ -0,0 +1,211 @@
+"""
+extractor_valores contra las cascadas de regex que reemplazó
+
+Las funciones base_* son copia literal de las implementaciones anteriores
+(baseline): cada llamador debe seguir dando exactamente lo mismo sobre la
+tabla de textos, salvo las diferencias documentadas más abajo.
+"""
+
+import re
+
+import pytest
+
+from extractor_valores import extraer, asignaciones_sql
+from pqrs_sistema import SistemaPQRS
+from sistema_pqrs_v4_ia import SistemaPQRSIA
+
+
+# ─── Implementaciones anteriores ─────────────────────────────────
+
+def base_v4(texto):
+    valores = {}
+    creditos = re.findall(r'\d{13,}', texto)
+    if creditos:
+        valores['credito'] = creditos[0]
+    ids = re.findall(r'(?:ID|id)[:\s]*(\d{5,})', texto, re.IGNORECASE)
+    if ids:
+        valores['id'] = ids[0]
+    cedulas = re.findall(r'(?:CC|NIT|cedula|nit)[:\s]*(\d+)', texto, re.IGNORECASE)
+    if cedulas:
+        valores['cedula'] = cedulas[0]
+    nombres = re.findall(r'(?:Nombre|nombre)[:\s]+([A-Z][a-záéíóúñ]+(?:\s+[A-Z][a-záéíóúñ]+)*)', texto)
+    if nombres:
+        valores['nombre_completo'] = nombres[0]
+    montos = re.findall(r'\$\s*([\d,.]+)', texto)
+    if montos:
+        valores['montos'] = [m.replace(',', '').replace('.', '') for m in montos]
+    estados = re.findall(r'estado[:\s]+([A-Z][a-záéíóúñ\s]+)', texto, re.IGNORECASE)
+    if estados:
+        valores['estado'] = estados[0].strip()
+    return valores
+
+
+def base_legado(texto):
+    valores = {}
+    creditos = re.findall(r'\d{13,}', texto)
+    if creditos:
+        valores['credito'] = creditos[0]
+    ids = re.findall(r'(?:ID|id)\s*(?:de\s*)?(?:comisi[óo]n)?[:\s]*(\d+)', texto, re.IGNORECASE)
+    if not ids:
+        ids = re.findall(r'comisi[óo]n[:\s]+(\d{5,})', texto, re.IGNORECASE)
+    if ids:
+        valores['id'] = ids[0]
+    cedulas = re.findall(r'(?:C\.?C\.?|c\.?c\.?|NIT|nit|C[ÉE]DULA|cedula)[:\s]*(\d+)', texto, re.IGNORECASE)
+    if cedulas:
+        valores['cedula'] = cedulas[0]
+    documentos = re.findall(r'documento[:\s]+(\d+)', texto, re.IGNORECASE)
+    if documentos:
+        valores['documento_origen'] = documentos[0]
+        if len(documentos) > 1:
+            valores['documento_destino'] = documentos[1]
+    montos = re.findall(r'\$\s*([\d,.]+)', texto)
+    if montos:
+        valores['montos'] = [m.replace(',', '').replace('.', '') for m in montos]
+    fechas = re.findall(r'\d{1,2}[-/]\w{3}[-/]\d{2,4}', texto)
+    if not fechas:
+        fechas = re.findall(r'\d{2}/\d{2}/\d{4}', texto)
+    if fechas:
+        valores['fecha'] = fechas[0]
+    facturas = re.findall(r'(?:FACTURA|FAC|factura)[:\s]*(\w+)', texto, re.IGNORECASE)
+    if facturas:
+        valores['factura'] = facturas[0]
+    return valores
+
+
+def base_contexto(problema, sql, tipo):
+    contexto = {}
+    creditos = re.findall(r'\d{13,16}', problema)
+    if creditos:
+        contexto["credit_number"] = creditos[0]
+    if tipo == "cambio_estado":
+        matches = re.findall(r'EstadoLiquidacion\w+\s*=\s*(\d+)', sql, re.IGNORECASE)
+        if matches:
+            contexto["estado_nuevo"] = int(matches[0])
+    elif tipo == "cambio_comision":
+        matches = re.findall(r'ValueCommission\s*=\s*(\d+)', sql, re.IGNORECASE)
+        if matches:
+            contexto["valor_nuevo"] = int(matches[0])
+    return contexto
+
+
+def base_guias(problema):
+    contexto = {}
+    creditos = re.findall(r'\b\d{13,16}\b', problema)
+    if creditos:
+        contexto['credito'] = creditos[0]
+    estados = re.findall(r'\b(7[0-9])\b', problema)
+    if estados:
+        contexto['estado'] = estados[0]
+    cedulas = re.findall(r'\b\d{8,11}\b', problema)
+    if cedulas:
+        for cedula in cedulas:
+            if len(cedula) < 13:
+                contexto['cedula'] = cedula
+                break
+    return contexto
+
+
+# ─── Textos ──────────────────────────────────────────────────────
+
+TEXTOS = [
+    'Ajustar la comision 250000 del credito 5800325002956151 al vendedor ID: 98765',
+    'Asignar userid 45678 al credito 5800325002956151',
+    'id 5800325002956151 estado 71',
+    'Por favor cambiar el estado: aprobado del credito 5800325002956151',
+    'Estado: Rechazado\nNombre: Juan Perez\nCC 1032456789',
+    'Nombre: Maria Lopez, NIT 900838904, pago de $ 1.200.000 y $350,000.50',
+    'El cliente con cedula 79845123 pide cambiar el documento 12345678 al documento 87654321',
+    'Se liquidó la comisión 3456789 sin ID de comision asociado',
+    'ID de comision 778899 mal liquidada el 13-ene-2026',
+    'Corregir la fecha 05/02/2025 del crédito 5800325002956151 con CommissionID = 12345',
+    'Pasar el estado de liquidacion del vendedor a 77, credito 5800325002956152',
+    'Hola, necesito ayuda con un caso',
+    'Valor $ 45.000 en el credito 58003250029561519999 por el asesor id:123',
+    'Doble ID 123 y luego ID 456789 para el vendedor con nit:800123456',
+    'estado Activo nombre: Pedro Gomez Ruiz, monto $ 99.999',
+    'Texto sin valores pero con estado',
+    'Documento: 1020304050 y comision: 98765 por 3 meses',
+    '',
+]
+
+
+@pytest.mark.parametrize('texto', TEXTOS)
+def test_extraer_valores_v4_igual_a_la_base(texto):
+    assert SistemaPQRSIA.extraer_valores(None, texto) == base_v4(texto)
+
+
+@pytest.mark.parametrize('texto', TEXTOS)
+def test_extraer_valores_legado_igual_a_la_base(texto):
+    assert SistemaPQRS.extraer_valores(None, texto) == base_legado(texto)
+
+
+@pytest.mark.parametrize('texto', TEXTOS)
+def test_numeros_igual_a_la_base(texto):
+    # Lo que usaba el agente: re.findall(r'\d+') y re.findall(r'\d{10,}')
+    assert extraer(texto).numeros() == re.findall(r'\d+', texto)
+    assert extraer(texto).numeros(minimo_digitos=10) == re.findall(r'\d{10,}', texto)
+
+
+@pytest.mark.parametrize('texto', TEXTOS)
+def test_contexto_problema_igual_a_la_base(texto):
+    guias = pytest.importorskip('pagina_guias_paso_a_paso')
+    contexto = guias.extraer_contexto_problema(texto)
+    contexto.pop('valor', None)     # diferencia documentada: sale de los montos con $
+    assert contexto == base_guias(texto)
+
+
+@pytest.mark.parametrize('sql, tipo', [
+    ("UPDATE liquidacion SET EstadoLiquidacionVendedor = 77, EstadoLiquidacionConcesionario=71", 'cambio_estado'),
+    ("UPDATE liquidacion SET EstadoLiquidacion = 5", 'cambio_estado'),
+    ("UPDATE comision SET ValueCommission = 250000 WHERE CommissionID = 123", 'cambio_comision'),
+    ("UPDATE comision SET ValueCommission = '250000'", 'cambio_comision'),
+])
+def test_asignaciones_sql_igual_a_la_base(sql, tipo):
+    # Mismo filtro que extraer_datos_contexto en manejadores_api.py / pagina_resolver_con_validacion.py
+    asignaciones = asignaciones_sql(sql)
+    contexto = {}
+    if tipo == 'cambio_estado':
+        estados = [a.valor for a in asignaciones if 'estadoliquidacion' in a.tipo.lower()[:-1]]
+        if estados:
+            contexto['estado_nuevo'] = int(estados[0])
+    else:
+        valores = [a.valor for a in asignaciones if a.tipo.lower().endswith('valuecommission')]
+        if valores:
+            contexto['valor_nuevo'] = int(valores[0])
+    assert contexto == base_contexto('', sql, tipo)
+
+
+# ─── Diferencias documentadas con la base ─────────────────────────
+
+def test_v4_reconoce_cc_con_puntos_y_cedula_con_tilde():
+    # La base de v4 no las veía (la de pqrs_sistema.py sí)
+    assert SistemaPQRSIA.extraer_valores(None, 'C.C. 1032456789')['cedula'] == '1032456789'
+    assert SistemaPQRSIA.extraer_valores(None, 'cédula 1032456789')['cedula'] == '1032456789'
+
+
+def test_factura_exige_digito_y_toma_el_numero_completo():
+    # La base tomaba la palabra siguiente: "factura de venta" -> 'de', "FE-1234" -> 'FE'
+    assert 'factura' not in SistemaPQRS.extraer_valores(None, 'la factura de venta')
+    assert SistemaPQRS.extraer_valores(None, 'FACTURA: FE-1234')['factura'] == 'FE-1234'
+
+
+# ─── Registro tipado ─────────────────────────────────────────────
+
+def test_posiciones_apuntan_al_texto():
+    texto = 'Estado: Rechazado, credito 5800325002956151, $ 1.200.000 y ID 98765 el 13-ene-2026'
+    for coincidencia in extraer(texto):
+        assert texto[coincidencia.inicio:coincidencia.fin] == coincidencia.valor
+
+
+def test_tipos_del_registro():
+    valores = extraer('estado de liquidacion a 77 del id 5800325002956151 el 13/01/2026 factura FE-99')
+    assert valores.primero('estado') == '77'
+    assert valores.primero('estado_texto') == 'de liquidacion a'
+    assert valores.primero('credito') == valores.primero('id') == '5800325002956151'
+    assert valores.primero('fecha_numerica') == '13/01/2026'
+    assert valores.primero('factura') == 'FE-99'
+
+
+def test_resultado_cacheado():
+    texto = 'credito 5800325002956151 ' * 50
+    assert extraer(texto) is extraer(texto)
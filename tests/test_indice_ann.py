@@ -0,0 +1,159 @@
+"""
+Índices ANN: recall medido con semilla fija y reentrenamiento IVF en segundo plano
+"""
+
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from indice_ann import IndiceIVF, crear_indice, RECALL_POR_DEFECTO
+
+
+def datos_agrupados(n, dimension=64, grupos=64, semilla=0):
+    """Vectores unitarios alrededor de `grupos` centros (parecido a embeddings de PQRS)"""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((grupos, dimension)).astype(np.float32)
+    matriz = centros[rng.integers(0, grupos, n)] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return matriz / np.linalg.norm(matriz, axis=1, keepdims=True)
+
+
+def recall_a_10(indice, base, consultas):
+    aciertos = 0
+    for consulta in consultas:
+        exactos = set(np.argsort(-(base @ consulta))[:10].tolist())
+        aproximados, _ = indice.buscar(consulta, 10)
+        aciertos += len(exactos & set(aproximados))
+    return aciertos / (10 * len(consultas))
+
+
+# ─── Recall ──────────────────────────────────────────────────────
+
+def test_ivf_alcanza_el_recall_por_defecto():
+    matriz, consultas = np.split(datos_agrupados(20200), [20000])     # consultas fuera del índice
+    indice = crear_indice('ivf', 64)
+    indice.agregar_lote(range(len(matriz)), matriz)
+
+    assert indice.recall_medido >= RECALL_POR_DEFECTO
+    assert recall_a_10(indice, matriz, consultas) >= 0.85
+
+
+def test_ivf_con_sondeo_fijo_no_calibra():
+    matriz = datos_agrupados(5000)
+    indice = crear_indice('ivf', 64, recall=3)
+    indice.agregar_lote(range(len(matriz)), matriz)
+
+    assert indice.n_sondeo == 3
+    assert indice.recall_medido is None
+
+
+def test_hnsw_alcanza_el_recall_por_defecto():
+    pytest.importorskip('hnswlib')
+    matriz, consultas = np.split(datos_agrupados(5200), [5000])
+    indice = crear_indice('hnsw', 64)
+    indice.agregar_lote(range(len(matriz)), matriz)
+
+    assert indice.recall_medido >= RECALL_POR_DEFECTO
+    assert recall_a_10(indice, matriz, consultas) >= 0.85
+
+
+# ─── Reentrenamiento en segundo plano ────────────────────────────
+
+def test_agregar_no_espera_el_reentrenamiento():
+    matriz = datos_agrupados(8000)
+    indice = IndiceIVF(64, min_entrenamiento=1024)
+    indice.agregar_lote(range(1024), matriz[:1024])
+    assert indice.n_entrenado == 1024
+
+    # El caso 4096 cruza el umbral (4x): el k-means corre en otro hilo
+    indice.agregar_lote(range(1024, 4095), matriz[1024:4095])
+    inicio = time.perf_counter()
+    indice.agregar(4095, matriz[4095])
+    assert time.perf_counter() - inicio < 0.5
+    assert indice._hilo_entrenamiento is not None
+
+    # Mientras entrena se sigue buscando sobre las listas viejas
+    ids, _ = indice.buscar(matriz[10], 5)
+    assert 10 in ids
+
+    indice.esperar_entrenamiento()
+    assert indice.n_entrenado == 4096
+    assert len(indice) == 4096
+
+
+def test_cambios_durante_el_entrenamiento_se_reaplican():
+    matriz = datos_agrupados(5000)
+    indice = IndiceIVF(64, min_entrenamiento=1024)
+    indice.agregar_lote(range(1024), matriz[:1024])
+    indice.agregar_lote(range(1024, 4095), matriz[1024:4095])
+    indice.agregar(4095, matriz[4095])           # lanza el entrenamiento
+
+    for caso_id in range(4096, 4200):
+        indice.agregar(caso_id, matriz[caso_id])
+    for caso_id in range(0, 50):
+        indice.eliminar(caso_id)
+    indice.agregar(60, matriz[4500])             # reemplazo de un vector ya entrenado
+
+    indice.esperar_entrenamiento()
+
+    assert indice.ids() == set(range(50, 4200))
+    for caso_id, vector in [(4150, matriz[4150]), (60, matriz[4500]), (3000, matriz[3000])]:
+        lista, posicion = indice.ubicacion[caso_id]
+        assert indice.listas[lista].ids[posicion] == caso_id
+        np.testing.assert_array_equal(indice.listas[lista].vectores[posicion], vector)
+    ids, _ = indice.buscar(matriz[4500], 10)
+    assert 60 in ids
+    assert not set(ids) & set(range(50))
+
+
+def test_pickle_no_guarda_el_entrenamiento_en_curso():
+    matriz = datos_agrupados(4096)
+    indice = IndiceIVF(64, min_entrenamiento=1024)
+    indice.agregar_lote(range(1024), matriz[:1024])
+    indice.agregar_lote(range(1024, 4095), matriz[1024:4095])
+    indice.agregar(4095, matriz[4095])
+
+    copia = pickle.loads(pickle.dumps(indice))
+    indice.esperar_entrenamiento()
+
+    assert copia._hilo_entrenamiento is None and copia._cambios is None
+    assert len(copia) == 4096
+    ids, _ = copia.buscar(matriz[7], 5)
+    assert 7 in ids
+
+
+# ─── Copias congeladas (guardar sin lock) ────────────────────────
+
+def test_ivf_congelado_no_ve_cambios_posteriores():
+    matriz = datos_agrupados(3000)
+    indice = IndiceIVF(64, min_entrenamiento=1024)
+    indice.agregar_lote(range(2000), matriz[:2000])
+
+    copia = indice.congelar()
+    for caso_id in range(2000, 2100):
+        indice.agregar(caso_id, matriz[caso_id])
+    for caso_id in range(0, 500):
+        indice.eliminar(caso_id)
+
+    assert copia.ids() == set(range(2000))
+    restaurada = pickle.loads(pickle.dumps(copia))
+    for caso_id in (0, 499, 1999):
+        lista, posicion = restaurada.ubicacion[caso_id]
+        np.testing.assert_array_equal(restaurada.listas[lista].vectores[posicion], matriz[caso_id])
+    assert indice.ids() == set(range(500, 2100))
+
+
+def test_hnsw_congelado_no_ve_cambios_posteriores():
+    pytest.importorskip('hnswlib')
+    matriz = datos_agrupados(600)
+    indice = crear_indice('hnsw', 64, recall=32)
+    indice.agregar_lote(range(500), matriz[:500])
+
+    copia = indice.congelar()
+    indice.agregar_lote(range(500, 600), matriz[500:])
+    indice.eliminar(3)
+
+    assert copia.ids() == set(range(500))
+    ids, _ = pickle.loads(pickle.dumps(copia)).buscar(matriz[3], 1)
+    assert ids == [3]
@@ -0,0 +1,64 @@
+"""PoolSQLite: lectores por hilo que no esperan al escritor"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from pool_sqlite import PoolSQLite
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PoolSQLite(str(tmp_path / 'prueba.db'))
+    pool.escribir(lambda conn: conn.execute('CREATE TABLE t (x INTEGER)'))
+    yield pool
+    pool.cerrar()
+
+
+def contar(pool):
+    return pool.lectura().execute('SELECT COUNT(*) FROM t').fetchone()[0]
+
+
+def test_lectura_durante_escritura_en_curso(pool):
+    escribiendo, soltar = threading.Event(), threading.Event()
+
+    def escritura_lenta(conn):
+        conn.execute('INSERT INTO t VALUES (1)')
+        escribiendo.set()
+        assert soltar.wait(10)
+
+    hilo = threading.Thread(target=pool.escribir, args=(escritura_lenta,))
+    hilo.start()
+    assert escribiendo.wait(10)
+
+    # La transacción del escritor está abierta: el lector no se bloquea y no ve la fila
+    assert contar(pool) == 0
+
+    soltar.set()
+    hilo.join(10)
+    assert contar(pool) == 1
+
+
+def test_escritura_fallida_se_revierte_y_relanza(pool):
+    def falla(conn):
+        conn.execute('INSERT INTO t VALUES (1)')
+        raise ValueError('falla a propósito')
+
+    with pytest.raises(ValueError):
+        pool.escribir(falla)
+    assert contar(pool) == 0
+
+
+def test_lectores_por_hilo_y_solo_lectura(pool):
+    conexiones = []
+    hilo = threading.Thread(target=lambda: conexiones.append(pool.lectura()))
+    hilo.start()
+    hilo.join()
+    assert conexiones[0] is not pool.lectura()
+
+    with pytest.raises(sqlite3.OperationalError):
+        pool.lectura().execute('INSERT INTO t VALUES (2)')
+    # Un intento fallido no deja una instantánea vieja abierta en el lector
+    pool.escribir(lambda conn: conn.execute('INSERT INTO t VALUES (3)'))
+    assert contar(pool) == 1
@@ -0,0 +1,50 @@
+"""preparar_fork (gunicorn pre_fork): se prepara una vez, no en cada worker que se reemplaza"""
+
+from conftest import bloque_pqrs
+
+
+def sistema_listo_para_fork(crear_sistema, tmp_path, monkeypatch):
+    sistema = crear_sistema(PQRS_INDICE_ANN='ivf', PQRS_SNAPSHOT_DEMORA=60)
+    archivo = tmp_path / 'casos.txt'
+    archivo.write_text(''.join(bloque_pqrs(i, 'Estados', f'Problema {i}', f'SELECT {i}') for i in range(20)),
+                       encoding='utf-8')
+    sistema.cargar_desde_archivo(str(archivo))
+    sistema.preparar_indice_ann()
+
+    guardados = []
+    monkeypatch.setattr(sistema, 'guardar_indice_ann', lambda: guardados.append('indice'))
+    monkeypatch.setattr(sistema, 'guardar_snapshot', lambda: guardados.append('snapshot'))
+    return sistema, guardados
+
+
+def test_forks_siguientes_no_repiten_la_preparacion(crear_sistema, tmp_path, monkeypatch):
+    sistema, guardados = sistema_listo_para_fork(crear_sistema, tmp_path, monkeypatch)
+    cerrar = sistema.pool.cerrar
+    cierres = []
+    monkeypatch.setattr(sistema.pool, 'cerrar', lambda: cierres.append(1) or cerrar())
+
+    sistema.guardar_caso_nuevo('Estados', 'Caso nuevo antes del fork', 'SELECT 1', 'ok')
+    sistema.preparar_fork()
+    assert guardados == ['indice'] and len(cierres) == 1      # el cambio pendiente (sin snapshot: el índice)
+    assert not sistema.pool.abierto() and sistema._timer_snapshot is None
+
+    # Respawns: nada cambió en el master
+    for _ in range(3):
+        sistema.preparar_fork()
+    assert guardados == ['indice'] and len(cierres) == 1
+
+
+def test_se_repite_si_el_master_volvio_a_usar_la_bd(crear_sistema, tmp_path, monkeypatch):
+    sistema, guardados = sistema_listo_para_fork(crear_sistema, tmp_path, monkeypatch)
+    sistema.preparar_fork()
+    assert guardados == []                   # preparar_indice_ann ya lo guardó
+
+    sistema.contar_casos()                   # reabre una conexión de lectura
+    sistema.preparar_fork()
+    assert not sistema.pool.abierto()
+    assert guardados == []
+
+    sistema.guardar_caso_nuevo('Estados', 'Caso nuevo en el master', 'SELECT 1', 'ok')
+    sistema.preparar_fork()
+    assert guardados == ['indice']
+    assert not sistema.pool.abierto() and sistema._timer_snapshot is None
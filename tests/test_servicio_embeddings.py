@@ -0,0 +1,131 @@
+"""
+Cliente del servicio de embeddings: una consulta nunca queda esperando
+para siempre si el proceso muere o deja de responder
+"""
+
+import threading
+from multiprocessing.connection import Client
+
+import numpy as np
+import pytest
+
+import codificadores
+import servicio_embeddings
+from conftest import CodificadorHash, DIMENSION
+
+
+class ProcesoFalso:
+    """
+    Reemplaza al subprocess del servicio por un hilo que habla el mismo
+    protocolo; `responder(solicitud)` decide qué hace con cada una
+    """
+
+    responder = None
+    pid = 0
+
+    def __init__(self, argumentos, env):
+        direccion = argumentos[3]
+        clave = bytes.fromhex(env['PQRS_SERVICIO_CLAVE'])
+        self.codigo = None
+        self.hilo = threading.Thread(target=self.atender, args=(direccion, clave), daemon=True)
+        self.hilo.start()
+
+    def atender(self, direccion, clave):
+        conexion = Client(direccion, family='AF_UNIX', authkey=clave)
+        conexion.send(('listo', DIMENSION))
+        try:
+            while True:
+                solicitud = conexion.recv()
+                if solicitud is None or not type(self).responder(conexion, solicitud):
+                    break
+        except (EOFError, OSError):
+            pass
+        conexion.close()
+        self.codigo = 0
+
+    def poll(self):
+        return self.codigo
+
+    def wait(self, timeout=None):
+        self.hilo.join(timeout)
+        return self.codigo
+
+    def kill(self):
+        pass
+
+
+def responder_bien(conexion, solicitud):
+    solicitud_id, textos = solicitud
+    conexion.send((solicitud_id, CodificadorHash().encode(textos)))
+    return True
+
+
+def morir(conexion, solicitud):
+    """Lee la solicitud y termina sin responder"""
+    return False
+
+
+def colgarse(conexion, solicitud):
+    """Lee la solicitud y no responde nunca"""
+    return True
+
+
+@pytest.fixture
+def crear_servicio(monkeypatch):
+    locales = []
+    monkeypatch.setattr(servicio_embeddings.subprocess, 'Popen', ProcesoFalso)
+    monkeypatch.setattr(codificadores, 'crear_codificador', lambda *args: locales.append(args) or CodificadorHash())
+    creados = []
+
+    def crear(responder, timeout=30):
+        monkeypatch.setattr(ProcesoFalso, 'responder', staticmethod(responder))
+        servicio = servicio_embeddings.ServicioEmbeddings('torch', 'modelo', timeout=timeout)
+        creados.append(servicio)
+        return servicio, locales
+
+    yield crear
+
+    for servicio in creados:
+        servicio.cerrar()
+
+
+def test_responde_el_proceso(crear_servicio):
+    servicio, locales = crear_servicio(responder_bien)
+
+    matriz = servicio.encode(['hola mundo', 'otro texto'])
+    np.testing.assert_array_equal(matriz, CodificadorHash().encode(['hola mundo', 'otro texto']))
+    np.testing.assert_array_equal(servicio.encode('hola mundo'), matriz[0])
+    assert locales == [] and servicio._pendientes == {}
+
+
+def test_proceso_muere_con_la_solicitud_leida(crear_servicio):
+    servicio, locales = crear_servicio(morir)
+
+    np.testing.assert_array_equal(servicio.encode('hola mundo'), CodificadorHash().encode('hola mundo'))
+    assert locales == [('torch', 'modelo', 'modelo_onnx')]
+
+    # Ya sin proceso: directo al modelo local, sin registrar nada
+    servicio._hilo_respuestas.join(5)
+    assert not servicio.vivo
+    np.testing.assert_array_equal(servicio.encode(['chao']), CodificadorHash().encode(['chao']))
+    assert len(locales) == 1 and servicio._pendientes == {}
+
+
+def test_proceso_sin_respuesta_vence_el_timeout(crear_servicio):
+    servicio, locales = crear_servicio(colgarse, timeout=0.2)
+
+    np.testing.assert_array_equal(servicio.encode(['hola mundo']), CodificadorHash().encode(['hola mundo']))
+    assert len(locales) == 1
+    assert servicio._pendientes == {}
+
+
+def test_error_del_modelo_no_cambia_al_local(crear_servicio):
+    def fallar(conexion, solicitud):
+        conexion.send((solicitud[0], "Error generando embeddings: texto inválido"))
+        return True
+
+    servicio, locales = crear_servicio(fallar)
+
+    with pytest.raises(RuntimeError, match="texto inválido"):
+        servicio.encode('hola')
+    assert locales == [] and servicio.vivo
@@ -0,0 +1,162 @@
+"""
+Sincronización del almacén con cambios hechos por otro proceso
+
+Los id nuevos se leen con id > último visto; los casos editados o borrados
+los anotan los triggers en la bitácora cambios_casos.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import sistema_pqrs_v4_ia
+from conftest import bloque_pqrs
+
+
+def sistema_con_casos(crear_sistema, tmp_path, n=6):
+    sistema = crear_sistema()
+    archivo = tmp_path / 'casos.txt'
+    archivo.write_text(''.join(
+        bloque_pqrs(i, f'Categoria{i % 2}', f'Problema {i} del credito {5800325002950000 + i}', f'SELECT {i}')
+        for i in range(n)
+    ), encoding='utf-8')
+    sistema.cargar_desde_archivo(str(archivo))
+    return sistema
+
+
+def otro_proceso():
+    """Conexión aparte sobre la misma BD, como la de pqrs_sistema.py o un UPDATE manual"""
+    return sqlite3.connect('pqrs_sistema.db', isolation_level=None)
+
+
+def categoria_en_almacen(sistema, caso_id):
+    almacen = sistema.almacen
+    return almacen.categorias[almacen.codigos_categoria[almacen.posicion[caso_id]]]
+
+
+@pytest.fixture
+def sin_sincronizacion_completa(monkeypatch):
+    def fallar(self, posicion):
+        raise AssertionError("se comparó la tabla completa")
+    monkeypatch.setattr(sistema_pqrs_v4_ia.SistemaPQRSIA, 'sincronizar_completo', fallar)
+
+
+def test_sincroniza_solo_lo_que_cambio(crear_sistema, tmp_path, sin_sincronizacion_completa):
+    sistema = sistema_con_casos(crear_sistema, tmp_path)
+    ids = sorted(sistema.almacen.posicion)
+
+    conn = otro_proceso()
+    nuevo = conn.execute("INSERT INTO casos (categoria, problema, sql, respuesta, conceptos_clave, complejidad) "
+                         "VALUES ('Estados', 'Caso nuevo de otro proceso', 'SELECT 99', 'ok', '', 1)").lastrowid
+    conn.execute("UPDATE casos SET problema = 'Problema reescrito por otro proceso' WHERE id = ?", (ids[0],))
+    conn.execute("UPDATE casos SET categoria = 'Reasignada' WHERE id = ?", (ids[1],))
+    conn.execute("DELETE FROM casos WHERE id = ?", (ids[2],))
+    conn.close()
+
+    sistema.sincronizar_almacen()
+
+    assert set(sistema.almacen.posicion) == (set(ids) - {ids[2]}) | {nuevo}
+    assert sistema.almacen.clave(ids[0]) == sistema.clave_texto('Problema reescrito por otro proceso')
+    assert categoria_en_almacen(sistema, ids[1]) == 'Reasignada'
+    assert (sistema.version_casos, sistema.ultimo_id_casos, sistema.ultimo_cambio_casos) == \
+        tuple(sistema.leer_posicion_casos())
+
+    ranking = sistema.buscar_similar_ia('Problema reescrito por otro proceso', top_k=1)
+    assert ranking[0]['id'] == ids[0]
+
+
+def test_cambios_propios_no_resincronizan(crear_sistema, tmp_path, sin_sincronizacion_completa):
+    sistema = sistema_con_casos(crear_sistema, tmp_path)
+    caso_id = sistema.guardar_caso_nuevo('Estados', 'Caso propio', 'SELECT 1', 'ok')
+    sistema.borrar_caso(caso_id)
+
+    assert (sistema.version_casos, sistema.ultimo_id_casos, sistema.ultimo_cambio_casos) == \
+        tuple(sistema.leer_posicion_casos())
+
+
+def test_bitacora_recortada_compara_la_tabla(crear_sistema, tmp_path, monkeypatch):
+    monkeypatch.setattr(sistema_pqrs_v4_ia, 'CAMBIOS_EN_BITACORA', 3)
+    sistema = sistema_con_casos(crear_sistema, tmp_path)
+    ids = sorted(sistema.almacen.posicion)
+    completas = []
+    original = sistema.sincronizar_completo
+    monkeypatch.setattr(sistema, 'sincronizar_completo', lambda posicion: completas.append(posicion) or original(posicion))
+
+    conn = otro_proceso()
+    for caso_id in ids[:5]:
+        conn.execute("DELETE FROM casos WHERE id = ?", (caso_id,))
+    assert conn.execute('SELECT COUNT(*) FROM cambios_casos').fetchone()[0] <= 4
+    conn.close()
+
+    sistema.sincronizar_almacen()
+
+    assert len(completas) == 1
+    assert set(sistema.almacen.posicion) == set(ids[5:])
+
+
+def test_bd_anterior_a_la_bitacora_recrea_los_triggers(crear_sistema):
+    sistema = crear_sistema()
+    sistema.pool.cerrar()
+    conn = otro_proceso()
+    conn.execute('DROP TRIGGER casos_version_delete')
+    conn.execute('''
+        CREATE TRIGGER casos_version_delete AFTER DELETE ON casos
+        BEGIN
+            UPDATE version_casos SET version = version + 1 WHERE id = 1;
+        END
+    ''')
+    conn.close()
+
+    sistema = crear_sistema()
+    sql = sistema.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'casos_version_delete'").fetchone()[0]
+    assert 'cambios_casos' in sql
+
+
+def test_sincronizar_no_se_cruza_con_un_cambio_propio(crear_sistema, tmp_path, monkeypatch):
+    sistema = sistema_con_casos(crear_sistema, tmp_path)
+    conn = otro_proceso()
+    nuevo = conn.execute("INSERT INTO casos (categoria, problema, sql, respuesta, conceptos_clave, complejidad) "
+                         "VALUES ('Estados', 'Caso de otro proceso', 'SELECT 99', 'ok', '', 1)").lastrowid
+    conn.close()
+
+    # La sincronización ya leyó la fila nueva cuando otro hilo la borra
+    borrado = []
+    original = sistema.agregar_al_almacen
+
+    def agregar(caso_id, *args):
+        if caso_id == nuevo and not borrado:
+            hilo = threading.Thread(target=lambda: borrado.append(sistema.borrar_caso(nuevo)))
+            hilo.start()
+            hilo.join(0.3)
+        return original(caso_id, *args)
+
+    monkeypatch.setattr(sistema, 'agregar_al_almacen', agregar)
+    hilo_busqueda = threading.Thread(target=sistema.sincronizar_almacen)
+    hilo_busqueda.start()
+    hilo_busqueda.join()
+    while not borrado:
+        time.sleep(0.01)
+
+    assert borrado == [True]
+    assert nuevo not in sistema.almacen.posicion
+    assert (sistema.version_casos, sistema.ultimo_id_casos, sistema.ultimo_cambio_casos) == \
+        tuple(sistema.leer_posicion_casos())
+
+
+def test_sincronizar_no_espera_a_otro_hilo(crear_sistema, tmp_path, sin_sincronizacion_completa):
+    sistema = sistema_con_casos(crear_sistema, tmp_path)
+    conn = otro_proceso()
+    conn.execute("DELETE FROM casos WHERE id = ?", (sorted(sistema.almacen.posicion)[0],))
+    conn.close()
+
+    with sistema._lock_cambios:
+        hilo = threading.Thread(target=sistema.sincronizar_almacen)
+        hilo.start()
+        hilo.join(1)
+        assert not hilo.is_alive()
+        assert len(sistema.almacen) == 6
+
+    sistema.sincronizar_almacen()
+    assert len(sistema.almacen) == 5
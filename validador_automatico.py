@@ -13,14 +13,22 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import json
 
-# Importar reglas de negocio
+# Importar reglas de negocio (solo lo que usa el validador)
 try:
-    from reglas_negocio import *
+    from reglas_negocio import (
+        ESTADOS_LIQUIDACION,
+        REGLAS_COMISIONES,
+        validar_cambio_estado,
+        validar_cambio_comision,
+        validar_datos_vendedor,
+        validar_sql_seguro,
+    )
 except ImportError:
     print("⚠️ No se encontró reglas_negocio.py - Usando valores por defecto")
-    # Valores por defecto si no existe el archivo
+    # Valores por defecto si no existe el archivo (cada validación cae a su versión básica)
     ESTADOS_LIQUIDACION = {}
     REGLAS_COMISIONES = {}
+    validar_cambio_estado = validar_cambio_comision = validar_datos_vendedor = validar_sql_seguro = None
 
 
 class ValidadorAutomatico: